@@ -124,6 +124,14 @@ def main():
     except Exception as e:
         click.echo(f"❌ 错误: {e}")
         sys.exit(1)
+    finally:
+        # 只有用到性能监控时才会加载该模块
+        performance = sys.modules.get("ai_cli.core.performance")
+        if performance is not None:
+            try:
+                performance.persist_metrics(sys.argv[1] if len(sys.argv) > 1 else None)
+            except (OSError, ValueError):
+                pass  # 统计写入失败不影响命令本身的退出码
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -214,26 +214,26 @@ def chat(model, temperature, system, no_history, multiline):
             # 显示思考中
             with Live(Spinner("dots", text="思考中..."), refresh_per_second=10) as live:
                 try:
-                    # 获取AI响应
-                    response = ai_provider.chat_completion(
+                    # 流式获取AI响应，收到增量即刷新显示
+                    response = ""
+                    for delta in ai_provider.stream_chat_completion(
                         messages=messages,
                         temperature=config['model']['temperature'],
                         max_tokens=config['model'].get('max_tokens', 1000)
-                    )
+                    ):
+                        response += delta
+                        live.update(
+                            Panel(
+                                Markdown(response),
+                                title="🤖 AI",
+                                border_style="blue",
+                                subtitle=f"模型: {config['model']['name']} | Tokens: 估计中..."
+                            )
+                        )
                     
                     # 更新消息历史
                     messages.append({"role": "assistant", "content": response})
                     
-                    # 显示响应
-                    live.update(
-                        Panel(
-                            Markdown(response),
-                            title="🤖 AI",
-                            border_style="blue",
-                            subtitle=f"模型: {config['model']['name']} | Tokens: 估计中..."
-                        )
-                    )
-                    
                 except AIError as e:
                     print_error(f"AI请求失败: {e}")
                     messages.pop()  # 移除失败的用户消息
@@ -29,20 +29,26 @@ def load_history() -> List[Tuple[str, str]]:
     """Load command history from shell history files"""
     history = []
     
+    from ai_cli.core.shell_history import read_recent_entries
+    
     # Try different shell history files
     history_files = [
-        (os.path.expanduser("~/.bash_history"), parse_bash_history),
-        (os.path.expanduser("~/.zsh_history"), parse_zsh_history),
-        (os.path.expanduser("~/.history"), parse_generic_history),
+        (os.path.expanduser("~/.bash_history"), "bash"),
+        (os.path.expanduser("~/.zsh_history"), "zsh"),
+        (os.path.expanduser("~/.history"), None),
     ]
     
-    for hist_file, parser in history_files:
+    now = datetime.now().strftime("%Y-%m-%d %H:%M")
+    for hist_file, fmt in history_files:
         if os.path.exists(hist_file):
             try:
-                with open(hist_file, 'r', encoding='utf-8', errors='ignore') as f:
-                    lines = f.readlines()
-                    parsed = parser(lines[-100:])  # Last 100 lines
-                    history.extend(parsed)
+                # Last 100 entries, read backwards from the end of the file
+                for entry in read_recent_entries(hist_file, 100, fmt):
+                    if entry.timestamp is not None:
+                        timestamp = datetime.fromtimestamp(entry.timestamp).strftime("%Y-%m-%d %H:%M")
+                    else:
+                        timestamp = now
+                    history.append((entry.command, timestamp))
             except:
                 continue
     
@@ -51,60 +57,6 @@ def load_history() -> List[Tuple[str, str]]:
     
     return history
 
-def parse_bash_history(lines: List[str]) -> List[Tuple[str, str]]:
-    """Parse bash history format"""
-    results = []
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M")
-    
-    for line in lines:
-        line = line.strip()
-        if line:
-            results.append((line, timestamp))
-    
-    return results
-
-def parse_zsh_history(lines: List[str]) -> List[Tuple[str, str]]:
-    """Parse zsh history format"""
-    results = []
-    
-    for line in lines:
-        line = line.strip()
-        if not line:
-            continue
-            
-        # ZSH history format: ': 1234567890:0;command'
-        if line.startswith(': '):
-            parts = line.split(';', 1)
-            if len(parts) == 2:
-                timestamp_part = parts[0][2:]  # Remove ': '
-                timestamp_parts = timestamp_part.split(':', 1)
-                if timestamp_parts:
-                    try:
-                        timestamp = datetime.fromtimestamp(int(timestamp_parts[0]))
-                        timestamp_str = timestamp.strftime("%Y-%m-%d %H:%M")
-                        command = parts[1].strip()
-                        results.append((command, timestamp_str))
-                    except:
-                        # Fallback to current time
-                        results.append((parts[1].strip(), datetime.now().strftime("%Y-%m-%d %H:%M")))
-        else:
-            # Plain command
-            results.append((line, datetime.now().strftime("%Y-%m-%d %H:%M")))
-    
-    return results
-
-def parse_generic_history(lines: List[str]) -> List[Tuple[str, str]]:
-    """Parse generic history format"""
-    results = []
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M")
-    
-    for line in lines:
-        line = line.strip()
-        if line:
-            results.append((line, timestamp))
-    
-    return results
-
 def save_command_to_history(command: str):
     """Save a command to AI-CLI's own history"""
     history_file = os.path.expanduser("~/.config/ai-cli/history.json")
@@ -40,9 +40,9 @@ def measure_performance(func):
     from .performance import measure_performance as _measure_performance
     return _measure_performance(func)
 
-def cache_result(ttl=300):
+def cache_result(ttl=300, **options):
     from .performance import cache_result as _cache_result
-    return _cache_result(ttl)
+    return _cache_result(ttl, **options)
 
 # 导出核心功能
 __all__ = [
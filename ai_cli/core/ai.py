@@ -32,6 +32,14 @@ def chat_completion(messages: list, **kwargs) -> str:
     except Exception as e:
         raise AIError(f"聊天补全失败: {e}")
 
+def stream_chat_completion(messages: list, **kwargs):
+    """流式聊天补全，逐段产出文本增量"""
+    try:
+        provider = get_ai_provider()
+        yield from provider.stream_chat_completion(messages, **kwargs)
+    except Exception as e:
+        raise AIError(f"聊天补全失败: {e}")
+
 def test_model_connection() -> bool:
     """测试AI模型连接"""
     try:
@@ -55,6 +63,7 @@ __all__ = [
     'explain_command',
     'suggest_commands',
     'chat_completion',
+    'stream_chat_completion',
     'test_model_connection',
     'get_ai_provider',
     'get_ai_provider_instance',
@@ -5,7 +5,9 @@
 
 import os
 import json
-from typing import Dict, Any, Optional, List
+import asyncio
+import functools
+from typing import Dict, Any, Iterator, Optional, List
 from abc import ABC, abstractmethod
 
 class AIProvider(ABC):
@@ -23,11 +25,43 @@ class AIProvider(ABC):
         """聊天补全"""
         pass
     
+    def _post(self, url: str, **kwargs):
+        """通过共享连接池发送POST请求（跨进程限流，临时故障按重试策略重试）"""
+        from fuling.ratelimit import throttle
+        from fuling.retry import RetryPolicy
+        from fuling.transport import get_transport
+        
+        timeout = kwargs.pop('timeout', self.timeout)
+        transport = get_transport()
+        base_url = getattr(self, 'base_url', None)
+        api_key = getattr(self, 'api_key', None)
+        provider_key = self.__class__.__name__.replace('Provider', '').lower()
+        
+        def send(attempt_timeout):
+            throttle(provider_key, api_key, base_url)
+            return transport.post(url, base_url=base_url, timeout=attempt_timeout, **kwargs)
+        
+        return RetryPolicy.from_config(self.config).call(send, key=provider_key, timeout=timeout)
+    
+    def stream_chat_completion(self, messages: List[Dict], **kwargs) -> Iterator[str]:
+        """流式聊天补全，逐段产出文本增量（默认一次产出完整回复）"""
+        yield self.chat_completion(messages, **kwargs)
+    
+    async def achat_completion(self, messages: List[Dict], **kwargs) -> str:
+        """异步聊天补全（在线程池中执行同步请求）"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(self.chat_completion, messages, **kwargs))
+    
     @abstractmethod
     def explain_command(self, command: str, context: Optional[str] = None) -> str:
         """解释命令"""
         pass
     
+    async def aexplain_command(self, command: str, context: Optional[str] = None) -> str:
+        """异步解释命令"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.explain_command, command, context)
+    
     @abstractmethod
     def suggest_commands(self, context: Optional[str] = None) -> List[Dict]:
         """建议命令"""
@@ -46,8 +80,6 @@ class MoonshotProvider(AIProvider):
     
     def chat_completion(self, messages: List[Dict], **kwargs) -> str:
         """Moonshot聊天补全"""
-        import requests
-        
         url = f"{self.base_url}/chat/completions"
         headers = {
             "Authorization": f"Bearer {self.api_key}",
@@ -62,12 +94,7 @@ class MoonshotProvider(AIProvider):
         }
         
         try:
-            response = requests.post(
-                url,
-                headers=headers,
-                json=data,
-                timeout=self.timeout
-            )
+            response = self._post(url, headers=headers, json=data)
             response.raise_for_status()
             
             result = response.json()
@@ -76,6 +103,31 @@ class MoonshotProvider(AIProvider):
         except Exception as e:
             return f"Moonshot API错误: {e}"
     
+    def stream_chat_completion(self, messages: List[Dict], **kwargs) -> Iterator[str]:
+        """Moonshot流式聊天补全（SSE）"""
+        from fuling.transport import iter_openai_deltas
+        
+        url = f"{self.base_url}/chat/completions"
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+        
+        data = {
+            "model": self.name,
+            "messages": messages,
+            "temperature": kwargs.get('temperature', self.temperature),
+            "max_tokens": kwargs.get('max_tokens', self.max_tokens),
+            "stream": True,
+        }
+        
+        try:
+            with self._post(url, headers=headers, json=data, stream=True) as response:
+                response.raise_for_status()
+                yield from iter_openai_deltas(response)
+        except Exception as e:
+            yield f"Moonshot API错误: {e}"
+    
     def explain_command(self, command: str, context: Optional[str] = None) -> str:
         """解释命令"""
         prompt = f"解释这个shell命令的功能和用法: {command}"
@@ -157,6 +209,33 @@ class OpenAIProvider(AIProvider):
         except Exception as e:
             return f"OpenAI API错误: {e}"
     
+    def stream_chat_completion(self, messages: List[Dict], **kwargs) -> Iterator[str]:
+        """OpenAI流式聊天补全"""
+        try:
+            from openai import OpenAI
+            
+            client = OpenAI(
+                api_key=self.api_key,
+                base_url=self.base_url
+            )
+            
+            stream = client.chat.completions.create(
+                model=self.name,
+                messages=messages,
+                temperature=kwargs.get('temperature', self.temperature),
+                max_tokens=kwargs.get('max_tokens', self.max_tokens),
+                stream=True,
+            )
+            
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+                    
+        except ImportError:
+            yield "错误: 未安装openai库，运行: pip install openai"
+        except Exception as e:
+            yield f"OpenAI API错误: {e}"
+    
     def explain_command(self, command: str, context: Optional[str] = None) -> str:
         """解释命令"""
         prompt = f"Explain this shell command: {command}"
@@ -184,8 +263,6 @@ class OllamaProvider(AIProvider):
     
     def chat_completion(self, messages: List[Dict], **kwargs) -> str:
         """Ollama聊天补全"""
-        import requests
-        
         url = f"{self.base_url}/api/chat"
         
         # 转换消息格式
@@ -199,6 +276,7 @@ class OllamaProvider(AIProvider):
         data = {
             "model": self.name,
             "messages": ollama_messages,
+            "stream": False,  # Ollama默认返回NDJSON流
             "options": {
                 "temperature": kwargs.get('temperature', self.temperature),
                 "num_predict": kwargs.get('max_tokens', self.max_tokens),
@@ -206,11 +284,7 @@ class OllamaProvider(AIProvider):
         }
         
         try:
-            response = requests.post(
-                url,
-                json=data,
-                timeout=self.timeout
-            )
+            response = self._post(url, json=data)
             response.raise_for_status()
             
             result = response.json()
@@ -219,6 +293,34 @@ class OllamaProvider(AIProvider):
         except Exception as e:
             return f"Ollama API错误: {e} (确保Ollama服务正在运行: ollama serve)"
     
+    def stream_chat_completion(self, messages: List[Dict], **kwargs) -> Iterator[str]:
+        """Ollama流式聊天补全（NDJSON）"""
+        from fuling.transport import iter_ndjson
+        
+        url = f"{self.base_url}/api/chat"
+        
+        data = {
+            "model": self.name,
+            "messages": [{"role": msg["role"], "content": msg["content"]} for msg in messages],
+            "stream": True,
+            "options": {
+                "temperature": kwargs.get('temperature', self.temperature),
+                "num_predict": kwargs.get('max_tokens', self.max_tokens),
+            }
+        }
+        
+        try:
+            with self._post(url, json=data, stream=True) as response:
+                response.raise_for_status()
+                for chunk in iter_ndjson(response):
+                    content = chunk.get('message', {}).get('content')
+                    if content:
+                        yield content
+                    if chunk.get('done'):
+                        break
+        except Exception as e:
+            yield f"Ollama API错误: {e} (确保Ollama服务正在运行: ollama serve)"
+    
     def explain_command(self, command: str, context: Optional[str] = None) -> str:
         """解释命令"""
         prompt = f"解释这个shell命令: {command}"
@@ -269,7 +371,7 @@ class LocalProvider(AIProvider):
             "ssh": "安全shell连接",
             "scp": "安全复制文件",
             "wget": "下载文件",
-            "curl":传输数据",
+            "curl": "传输数据",
             "git": "版本控制",
         }
     
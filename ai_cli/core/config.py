@@ -25,6 +25,10 @@ DEFAULT_CONFIG = {
         "cleanup": "find . -name '*.pyc' -delete",
         "stats": "git log --oneline | wc -l",
     },
+    "context": {
+        "max_untracked": 200,  # untracked paths listed per git status; 0 skips the scan
+        "git_ttl": 5,  # seconds before cached git status is refreshed despite an unchanged index
+    },
     "paths": {
         "history_file": str(CONFIG_DIR / "history.json"),
         "learning_data": str(CONFIG_DIR / "learning.json"),
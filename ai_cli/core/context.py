@@ -4,77 +4,250 @@ Context awareness for AI-CLI
 
 import os
 import subprocess
+import threading
+import time
+from collections.abc import Mapping
 from pathlib import Path
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Callable, Hashable, List, Optional
 import json
 
+from fuling.lru import LRUCache
+
 def get_current_directory() -> str:
     """Get current working directory"""
     return os.getcwd()
 
-def get_directory_contents() -> List[str]:
+def get_directory_contents(path: str = '.') -> List[str]:
     """Get contents of current directory"""
     try:
-        return os.listdir('.')
+        return os.listdir(path)
     except:
         return []
 
-def get_git_status() -> Dict[str, Any]:
-    """Get git repository status"""
-    status = {
+# Cap on untracked paths collected per status call; 0 skips the untracked scan
+DEFAULT_MAX_UNTRACKED = 200
+
+def _empty_git_status() -> Dict[str, Any]:
+    return {
         "is_repo": False,
         "branch": None,
+        "oid": None,
         "status": None,
         "staged": [],
         "unstaged": [],
         "untracked": [],
+        "conflicted": [],
+        "detached": False,
+        "upstream": None,
+        "ahead": 0,
+        "behind": 0,
+        "untracked_truncated": False,
+        "detailed": True,  # False when only is_repo/branch/oid were read
     }
-    
-    try:
-        # Check if we're in a git repo
-        result = subprocess.run(
-            ["git", "rev-parse", "--is-inside-work-tree"],
-            capture_output=True,
-            text=True
-        )
-        
-        if result.returncode != 0:
-            return status
-        
-        status["is_repo"] = True
+
+def _read_records(stream, chunk_size: int = 65536):
+    """Yield NUL-terminated records from a binary stream as they arrive"""
+    pending = b""
+    while True:
+        chunk = stream.read1(chunk_size) if hasattr(stream, "read1") else stream.read(chunk_size)
+        if not chunk:
+            break
+        pending += chunk
+        *records, pending = pending.split(b"\0")
+        for record in records:
+            yield record.decode("utf-8", "surrogateescape")
+    if pending:
+        yield pending.decode("utf-8", "surrogateescape")
+
+def parse_porcelain_v2(records, status: Dict[str, Any], max_untracked: Optional[int] = None) -> bool:
+    """Parse `git status --porcelain=v2 --branch -z` records into status.
+
+    Returns False if parsing stopped early because the untracked cap was hit.
+    """
+    records = iter(records)
+    for record in records:
+        if not record:
+            continue
+        kind = record[0]
         
-        # Get current branch
-        result = subprocess.run(
-            ["git", "branch", "--show-current"],
-            capture_output=True,
-            text=True
-        )
-        if result.returncode == 0:
-            status["branch"] = result.stdout.strip()
+        if kind == "#":
+            key, _, value = record[2:].partition(" ")
+            if key == "branch.oid":
+                status["is_repo"] = True
+                status["oid"] = None if value == "(initial)" else value
+            elif key == "branch.head":
+                status["detached"] = value == "(detached)"
+                status["branch"] = None if status["detached"] else value
+            elif key == "branch.upstream":
+                status["upstream"] = value
+            elif key == "branch.ab":
+                ahead, _, behind = value.partition(" ")
+                status["ahead"] = int(ahead.lstrip("+") or 0)
+                status["behind"] = int(behind.lstrip("-") or 0)
+        elif kind in "12":
+            # 1 XY sub mH mI mW hH hI path / 2 ... Xscore path, then origPath
+            fields = record.split(" ", 8 if kind == "1" else 9)
+            xy, path = fields[1], fields[-1]
+            if kind == "2":
+                next(records, None)
+            if xy[0] != ".":
+                status["staged"].append(path)
+            if xy[1] != ".":
+                status["unstaged"].append(path)
+        elif kind == "u":
+            status["conflicted"].append(record.split(" ", 10)[-1])
+        elif kind == "?":
+            if max_untracked is not None and len(status["untracked"]) >= max_untracked:
+                status["untracked_truncated"] = True
+                return False
+            status["untracked"].append(record[2:])
+    return True
+
+def find_git_dir(start: Optional[str] = None) -> Optional[Dict[str, str]]:
+    """Walk up from start to the enclosing work tree without running git.
+
+    Returns {"work_tree", "git_dir", "common_dir"}, an empty dict when there is
+    no repository, or None when the layout is one this reader does not handle
+    (GIT_DIR/GIT_WORK_TREE overrides, bare repositories, unreadable files).
+    """
+    if os.environ.get("GIT_DIR") or os.environ.get("GIT_WORK_TREE"):
+        return None
+    
+    ceilings = {
+        os.path.realpath(path)
+        for path in os.environ.get("GIT_CEILING_DIRECTORIES", "").split(os.pathsep) if path
+    }
+    current = os.path.realpath(start or os.getcwd())
+    while True:
+        dot_git = os.path.join(current, ".git")
+        try:
+            if os.path.isdir(dot_git):
+                git_dir = dot_git
+            elif os.path.isfile(dot_git):
+                # Linked worktrees and submodules: "gitdir: <path>"
+                with open(dot_git, "r", encoding="utf-8") as f:
+                    content = f.read().strip()
+                if not content.startswith("gitdir:"):
+                    return None
+                git_dir = os.path.realpath(os.path.join(current, content[len("gitdir:"):].strip()))
+            else:
+                git_dir = None
+            
+            if git_dir is not None:
+                if not os.path.isfile(os.path.join(git_dir, "HEAD")):
+                    return None
+                common_dir = git_dir
+                commondir_file = os.path.join(git_dir, "commondir")
+                if os.path.isfile(commondir_file):
+                    with open(commondir_file, "r", encoding="utf-8") as f:
+                        common_dir = os.path.realpath(os.path.join(git_dir, f.read().strip()))
+                return {"work_tree": current, "git_dir": git_dir, "common_dir": common_dir}
+        except OSError:
+            return None
         
-        # Get git status
-        result = subprocess.run(
-            ["git", "status", "--porcelain"],
-            capture_output=True,
-            text=True
+        parent = os.path.dirname(current)
+        if parent == current or parent in ceilings:
+            return {}
+        current = parent
+
+def read_ref(common_dir: str, ref: str) -> Optional[str]:
+    """Resolve a ref to an object id from loose refs, then packed-refs"""
+    try:
+        with open(os.path.join(common_dir, ref), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        pass
+    try:
+        with open(os.path.join(common_dir, "packed-refs"), "r", encoding="utf-8") as f:
+            for line in f:
+                if line[:1] in ("#", "^"):
+                    continue
+                oid, _, name = line.rstrip("\n").partition(" ")
+                if name == ref:
+                    return oid
+    except OSError:
+        pass
+    return None
+
+def get_git_head(start: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Repository and branch detection by reading .git/HEAD directly (no fork).
+
+    Returns None when the answer needs git itself, e.g. reftable repositories
+    or symbolic refs that point at other symbolic refs.
+    """
+    location = find_git_dir(start)
+    if location is None:
+        return None
+    
+    head = _empty_git_status()
+    head["detailed"] = False
+    if not location:
+        return head
+    
+    try:
+        with open(os.path.join(location["git_dir"], "HEAD"), "r", encoding="utf-8") as f:
+            content = f.read().strip()
+    except OSError:
+        return None
+    
+    head["is_repo"] = True
+    if content.startswith("ref:"):
+        ref = content[len("ref:"):].strip()
+        if not ref.startswith("refs/heads/") or ref == "refs/heads/.invalid":
+            return None  # reftable or an unusual symref
+        head["branch"] = ref[len("refs/heads/"):]
+        # None on an unborn branch (no commits yet)
+        head["oid"] = read_ref(location["common_dir"], ref)
+    else:
+        head["detached"] = True
+        head["oid"] = content
+    return head
+
+def get_git_status(max_untracked: Optional[int] = DEFAULT_MAX_UNTRACKED, detail: bool = True,
+                   path: Optional[str] = None) -> Dict[str, Any]:
+    """Get git repository status from a single `git status --porcelain=v2` call.
+
+    Untracked entries come last in the output, so once max_untracked of them
+    have been read git is stopped instead of finishing the scan.
+    Pass None to collect every untracked path, 0 to skip the untracked scan.
+    With detail=False only repository and branch are needed; they are read
+    from .git directly and git is run only if that is not possible.
+    """
+    if not detail:
+        head = get_git_head(path)
+        if head is not None:
+            return head
+    
+    status = _empty_git_status()
+    command = ["git", "--no-optional-locks", "status", "--porcelain=v2", "--branch", "-z"]
+    if max_untracked == 0:
+        command.append("--untracked-files=no")
+    
+    try:
+        process = subprocess.Popen(
+            command,
+            cwd=path,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
         )
-        if result.returncode == 0:
-            lines = result.stdout.strip().split('\n')
-            for line in lines:
-                if line:
-                    code = line[:2]
-                    file = line[3:]
-                    
-                    if code == '??':
-                        status["untracked"].append(file)
-                    elif code[0] != ' ':
-                        status["staged"].append(file)
-                    elif code[1] != ' ':
-                        status["unstaged"].append(file)
-        
-        return status
-    except:
+    except OSError:
         return status
+    
+    try:
+        complete = parse_porcelain_v2(_read_records(process.stdout), status, max_untracked)
+        if not complete:
+            process.kill()
+    except Exception:
+        process.kill()
+        return _empty_git_status()
+    finally:
+        process.stdout.close()
+        returncode = process.wait()
+    
+    if complete and returncode != 0:
+        return _empty_git_status()
+    return status
 
 def get_system_info() -> Dict[str, Any]:
     """Get basic system information"""
@@ -96,35 +269,40 @@ def get_system_info() -> Dict[str, Any]:
     
     return info
 
-def get_recent_commands(count: int = 10) -> List[str]:
-    """Get recent shell commands from history"""
-    commands = []
-    
-    # Try different shell history files
-    history_files = [
+def get_history_files() -> List[str]:
+    """Candidate shell history files, in order of preference"""
+    return [
         os.path.expanduser("~/.bash_history"),
         os.path.expanduser("~/.zsh_history"),
         os.path.expanduser("~/.history"),
     ]
+
+def get_recent_commands(count: int = 10) -> List[str]:
+    """Get recent shell commands from history"""
+    commands = []
+    
+    from .shell_history import read_recent_entries
     
-    for hist_file in history_files:
+    # Try different shell history files
+    for hist_file in get_history_files():
         if os.path.exists(hist_file):
             try:
-                with open(hist_file, 'r', encoding='utf-8', errors='ignore') as f:
-                    lines = f.readlines()
-                    commands.extend(line.strip() for line in lines[-count:] if line.strip())
+                # Reads backwards from the end, so cost depends on count, not file size
+                fmt = "zsh" if hist_file.endswith("zsh_history") else None
+                commands.extend(entry.command for entry in read_recent_entries(hist_file, count, fmt))
                 break
             except:
                 continue
     
     return commands[-count:]
 
-def get_file_types() -> Dict[str, int]:
+def get_file_types(path: str = '.') -> Dict[str, int]:
     """Analyze file types in current directory"""
     file_types = {}
     
     try:
-        for item in os.listdir('.'):
+        for name in os.listdir(path):
+            item = os.path.join(path, name)
             if os.path.isfile(item):
                 ext = os.path.splitext(item)[1]
                 if ext:
@@ -138,24 +316,277 @@ def get_file_types() -> Dict[str, int]:
     
     return file_types
 
-def get_context() -> Dict[str, Any]:
-    """Get comprehensive context information"""
+def _load_context_options() -> Dict[str, Any]:
+    from .config import load_config
+    
+    options = {"max_untracked": DEFAULT_MAX_UNTRACKED, "git_ttl": DEFAULT_GIT_TTL}
+    options.update(load_config().get("context") or {})
+    return options
+
+def stat_signature(path: str) -> Optional[tuple]:
+    """Cheap change detector for a file or directory; None if it does not exist"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+# Worktree edits do not touch .git/index, so git status is also re-run after this many seconds
+DEFAULT_GIT_TTL = 5.0
+
+class ContextCache:
+    """Context snapshots keyed by directory, each field revalidated separately.
+
+    A field is recomputed only when the signature of its source changes:
+    the directory's stat for contents and file types, .git/index and HEAD for
+    git, the history file for recent commands. System info lives for the
+    whole process. A hit costs one stat per source. Cached values are shared
+    between callers and must not be modified.
+    """
+    
+    def __init__(self, max_entries: int = 512):
+        self._entries = LRUCache(max_entries=max_entries, shards=4)
+    
+    def get(self, key: Hashable, signature: Hashable, compute: Callable[[], Any],
+            ttl: Optional[float] = None) -> Any:
+        """Return the cached value if its signature still matches, else recompute"""
+        entry = self._entries.get(key)
+        now = time.monotonic()
+        if entry is not None and entry[0] == signature and now < entry[2]:
+            return entry[1]
+        value = compute()
+        self._entries.put(key, (signature, value, now + ttl if ttl is not None else float("inf")))
+        return value
+    
+    def clear(self):
+        """Drop all snapshots"""
+        self._entries.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        return self._entries.stats()
+
+_context_cache = ContextCache()
+
+def clear_context_cache():
+    """Forget cached context (e.g. after running a command that changes the tree)"""
+    _context_cache.clear()
+
+def get_context_options() -> Dict[str, Any]:
+    """Get the `context` section of the configuration"""
+    from .config import CONFIG_FILE
+    
+    return _context_cache.get(("options",), stat_signature(str(CONFIG_FILE)), _load_context_options)
+
+def _git_signature(cwd: str, cwd_signature: Optional[tuple]) -> Optional[tuple]:
+    # Locating .git walks up the tree, so the location is cached per directory
+    location = _context_cache.get((cwd, "git_dir"), cwd_signature, lambda: find_git_dir(cwd))
+    if not location:
+        return (location, cwd_signature)
+    return (
+        stat_signature(os.path.join(location["git_dir"], "index")),
+        stat_signature(os.path.join(location["git_dir"], "HEAD")),
+    )
+
+def _history_signature() -> Optional[tuple]:
+    for hist_file in get_history_files():
+        signature = stat_signature(hist_file)
+        if signature is not None:
+            return (hist_file, signature)
+    return None
+
+_UNSET = object()
+_executor = None
+_executor_lock = threading.Lock()
+
+def _get_executor():
+    """Small shared pool for computing context fields in parallel"""
+    global _executor
+    
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                from concurrent.futures import ThreadPoolExecutor
+                _executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="ai-cli-context")
+    return _executor
+
+class LazyContext(Mapping):
+    """Read-only mapping whose fields are computed on first access.
+
+    Behaves like the dict get_context() used to return; prefetch() computes
+    several fields at once on a small thread pool.
+    """
+    
+    def __init__(self, loaders: Dict[str, Callable[[], Any]], values: Optional[Dict[str, Any]] = None):
+        self._loaders = dict(loaders)
+        self._values = dict(values or {})
+        self._locks = {name: threading.Lock() for name in self._loaders}
+    
+    def __getitem__(self, name: str) -> Any:
+        try:
+            return self._values[name]
+        except KeyError:
+            pass
+        lock = self._locks[name]
+        with lock:
+            if name not in self._values:
+                self._values[name] = self._loaders[name]()
+        return self._values[name]
+    
+    def __iter__(self):
+        return iter(list(self._values) + [name for name in self._loaders if name not in self._values])
+    
+    def __len__(self) -> int:
+        return len(set(self._values) | set(self._loaders))
+    
+    def __repr__(self) -> str:
+        pending = [name for name in self._loaders if name not in self._values]
+        return f"LazyContext(computed={sorted(self._values)}, pending={pending})"
+    
+    def computed(self) -> List[str]:
+        """Names of the fields computed so far"""
+        return list(self._values)
+    
+    def _warm(self, name: str) -> None:
+        value = self[name]
+        if isinstance(value, LazyContext):
+            value.prefetch(parallel=False)
+        elif isinstance(value, LazyGitStatus):
+            value.load()
+    
+    def prefetch(self, *names: str, parallel: bool = True) -> "LazyContext":
+        """Compute the given fields (all by default), concurrently when there are several"""
+        pending = [name for name in (names or self._loaders) if name in self._loaders]
+        if parallel and len(pending) > 1:
+            for future in [_get_executor().submit(self._warm, name) for name in pending]:
+                future.result()
+        else:
+            for name in pending:
+                self._warm(name)
+        return self
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Compute everything and return plain dicts (e.g. for JSON)"""
+        self.prefetch()
+        return {name: _plain(value) for name, value in self.items()}
+
+class LazyGitStatus(Mapping):
+    """Git status that answers repo/branch questions without running git.
+
+    is_repo, branch, oid and detached come from reading .git directly; the
+    first access to any other key (file lists, upstream, ...) runs git status.
+    """
+    
+    HEAD_FIELDS = frozenset({"is_repo", "branch", "oid", "detached"})
+    
+    def __init__(self, head_loader: Callable[[], Optional[Dict[str, Any]]],
+                 status_loader: Callable[[], Dict[str, Any]]):
+        self._head_loader = head_loader
+        self._status_loader = status_loader
+        self._head = _UNSET
+        self._status = None
+        self._head_lock = threading.Lock()
+        self._status_lock = threading.Lock()
+    
+    def _load_head(self) -> Optional[Dict[str, Any]]:
+        if self._head is _UNSET:
+            with self._head_lock:
+                if self._head is _UNSET:
+                    self._head = self._head_loader()
+        return self._head
+    
+    def load(self) -> Dict[str, Any]:
+        """Run git status (once) and return the full result"""
+        if self._status is None:
+            with self._status_lock:
+                if self._status is None:
+                    head = self._load_head()
+                    # Not a repository: nothing for git status to add
+                    self._status = _empty_git_status() if head is not None and not head["is_repo"] \
+                        else self._status_loader()
+        return self._status
+    
+    def __getitem__(self, key: str) -> Any:
+        if key not in _GIT_STATUS_KEYS:
+            raise KeyError(key)
+        if self._status is None and key in self.HEAD_FIELDS:
+            head = self._load_head()
+            if head is not None:
+                return head[key]
+        return self.load()[key]
+    
+    def __iter__(self):
+        return iter(_GIT_STATUS_KEYS)
+    
+    def __len__(self) -> int:
+        return len(_GIT_STATUS_KEYS)
+    
+    def __repr__(self) -> str:
+        return f"LazyGitStatus(loaded={self._status is not None})"
+
+_GIT_STATUS_KEYS = tuple(_empty_git_status())
+
+def _plain(value: Any) -> Any:
+    if isinstance(value, LazyContext):
+        return value.to_dict()
+    if isinstance(value, Mapping) and not isinstance(value, dict):
+        return {key: _plain(item) for key, item in value.items()}
+    return value
+
+def _get_environment() -> Dict[str, Any]:
     return {
-        "directory": get_current_directory(),
-        "contents": get_directory_contents(),
-        "git": get_git_status(),
-        "system": get_system_info(),
-        "recent_commands": get_recent_commands(5),
-        "file_types": get_file_types(),
-        "environment": {
-            "path": os.environ.get("PATH", "").split(':'),
-            "editor": os.environ.get("EDITOR", ""),
-            "lang": os.environ.get("LANG", ""),
-        }
+        "path": os.environ.get("PATH", "").split(':'),
+        "editor": os.environ.get("EDITOR", ""),
+        "lang": os.environ.get("LANG", ""),
+    }
+
+def get_context(use_cache: bool = True) -> LazyContext:
+    """Get comprehensive context information.
+
+    Fields are computed on first access (and cached per directory, see
+    ContextCache), so callers only pay for what they read.
+    """
+    cwd = get_current_directory()
+    
+    if use_cache:
+        cache = _context_cache
+        
+        def cached(field, signature, compute, ttl=None):
+            return lambda: cache.get((cwd, *field), signature(), compute, ttl)
+    else:
+        def cached(field, signature, compute, ttl=None):
+            return compute
+    
+    def cwd_signature():
+        return stat_signature(cwd)
+    
+    def git_status():
+        settings = get_context_options()
+        load = cached(
+            ("git", settings["max_untracked"]),
+            lambda: _git_signature(cwd, cwd_signature()),
+            lambda: get_git_status(settings["max_untracked"], path=cwd),
+            ttl=settings["git_ttl"],
+        )
+        return load()
+    
+    loaders = {
+        "contents": cached(("contents",), cwd_signature, lambda: get_directory_contents(cwd)),
+        "git": lambda: LazyGitStatus(lambda: get_git_head(cwd), git_status),
+        "system": (lambda: _context_cache.get(("system",), None, get_system_info)) if use_cache else get_system_info,
+        "recent_commands": (
+            (lambda: _context_cache.get(("recent_commands",), _history_signature(), lambda: get_recent_commands(5)))
+            if use_cache else (lambda: get_recent_commands(5))
+        ),
+        "file_types": cached(("file_types",), cwd_signature, lambda: get_file_types(cwd)),
+        "environment": _get_environment,
     }
+    return LazyContext(loaders, {"directory": cwd})
 
 def format_context_for_prompt(context: Dict[str, Any]) -> str:
     """Format context information for AI prompt"""
+    if isinstance(context, LazyContext):
+        # git status and the history scan run concurrently
+        context.prefetch("git", "file_types", "recent_commands")
     lines = []
     
     # Current directory
@@ -164,13 +595,18 @@ def format_context_for_prompt(context: Dict[str, Any]) -> str:
     # Git status
     git = context['git']
     if git['is_repo']:
-        lines.append(f"Git repository: {git['branch']}")
+        lines.append(f"Git repository: {git['branch'] or '(detached HEAD)'}")
+        if git.get('upstream') and (git.get('ahead') or git.get('behind')):
+            lines.append(f"Upstream {git['upstream']}: ahead {git['ahead']}, behind {git['behind']}")
+        if git.get('conflicted'):
+            lines.append(f"Merge conflicts: {len(git['conflicted'])} files")
         if git['staged']:
             lines.append(f"Staged changes: {len(git['staged'])} files")
         if git['unstaged']:
             lines.append(f"Unstaged changes: {len(git['unstaged'])} files")
         if git['untracked']:
-            lines.append(f"Untracked files: {len(git['untracked'])}")
+            more = "+" if git.get('untracked_truncated') else ""
+            lines.append(f"Untracked files: {len(git['untracked'])}{more}")
     
     # File types
     file_types = context['file_types']
@@ -8,20 +8,28 @@ import sys
 import os
 from typing import Dict, Any, Callable, Optional
 from collections import defaultdict
+from contextlib import contextmanager
 import threading
+import weakref
 from rich.console import Console
 from rich.table import Table
 from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn
 
+from fuling.lru import LRUCache, make_key
+from fuling.metrics import LogHistogram
+from fuling.tracing import span as trace_span
+
 console = Console()
 
 class PerformanceMonitor:
-    """性能监控器"""
+    """性能监控器（每个指标一个固定内存的直方图）"""
     
     def __init__(self):
-        self.metrics = defaultdict(list)
+        self.metrics = defaultdict(LogHistogram)
         self.start_times = {}
         self.lock = threading.Lock()
+        # 弱引用：被装饰函数释放后其缓存也随之释放
+        self.caches = weakref.WeakValueDictionary()
         
     def start_timer(self, name: str):
         """开始计时"""
@@ -34,37 +42,72 @@ class PerformanceMonitor:
             
         elapsed = time.perf_counter() - self.start_times[name]
         with self.lock:
-            self.metrics[name].append(elapsed)
+            self.metrics[name].record(elapsed)
         del self.start_times[name]
         return elapsed
     
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """计时一段代码：作为调用链中的嵌套 span，结束时记录耗时"""
+        with trace_span(name, **attributes) as item:
+            try:
+                yield item
+            finally:
+                item.end = time.perf_counter()
+                self.record_metric(name, item.duration)
+    
     def record_metric(self, name: str, value: float):
         """记录指标"""
         with self.lock:
-            self.metrics[name].append(value)
+            self.metrics[name].record(value)
     
     def get_stats(self, name: str) -> Dict[str, float]:
         """获取统计信息"""
-        if name not in self.metrics or not self.metrics[name]:
-            return {}
-            
-        values = self.metrics[name]
-        return {
-            'count': len(values),
-            'total': sum(values),
-            'mean': sum(values) / len(values),
-            'min': min(values),
-            'max': max(values),
-            'last': values[-1] if values else 0,
-        }
+        with self.lock:
+            histogram = self.metrics.get(name)
+            if not histogram:
+                return {}
+            return {
+                'count': histogram.count,
+                'total': histogram.total,
+                'mean': histogram.mean,
+                'min': histogram.min,
+                'max': histogram.max,
+                'last': histogram.last,
+                'p50': histogram.percentile(50),
+                'p90': histogram.percentile(90),
+                'p99': histogram.percentile(99),
+            }
     
     def get_all_stats(self) -> Dict[str, Dict[str, float]]:
         """获取所有指标的统计信息"""
         stats = {}
-        for name in self.metrics:
+        for name in list(self.metrics):
             stats[name] = self.get_stats(name)
         return stats
     
+    def snapshot(self) -> Dict[str, LogHistogram]:
+        """导出各指标直方图的副本（可与其他进程的快照合并）"""
+        with self.lock:
+            return {name: histogram.copy() for name, histogram in self.metrics.items()}
+    
+    def merge(self, snapshot: Dict[str, LogHistogram]):
+        """合并另一份快照"""
+        with self.lock:
+            for name, histogram in snapshot.items():
+                self.metrics[name].merge(histogram)
+    
+    def register_cache(self, name: str, cache: LRUCache):
+        """登记缓存，其命中/淘汰统计会出现在性能报告中"""
+        with self.lock:
+            self.caches[name] = cache
+    
+    def get_cache_stats(self) -> Dict[str, Dict[str, Any]]:
+        """获取所有已登记缓存的统计信息"""
+        with self.lock:
+            caches = dict(self.caches)
+        return {name: cache.stats() for name, cache in caches.items()}
+    
     def reset(self):
         """重置所有指标"""
         with self.lock:
@@ -79,25 +122,31 @@ def measure_performance(name: str):
     def decorator(func):
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            monitor.start_timer(name)
-            try:
-                result = func(*args, **kwargs)
-                return result
-            finally:
-                elapsed = monitor.stop_timer(name)
-                if elapsed > 0.1:  # 只记录耗时较长的操作
-                    console.print(f"[dim]⏱️  {name}: {elapsed:.3f}s[/]")
+            # 用 span 计时：并发/递归调用各自独立，且会出现在 fl --trace 的调用链中
+            with monitor.span(name) as item:
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    elapsed = time.perf_counter() - item.start
+                    if elapsed > 0.1:  # 只记录耗时较长的操作
+                        console.print(f"[dim]⏱️  {name}: {elapsed:.3f}s[/]")
         return wrapper
     return decorator
 
 def show_performance_report():
     """显示性能报告"""
     stats = monitor.get_all_stats()
+    cache_stats = monitor.get_cache_stats()
     
-    if not stats:
+    if not stats and not cache_stats:
         console.print("[dim]No performance data available[/]")
         return
     
+    if cache_stats:
+        show_cache_report(cache_stats)
+    if not stats:
+        return
+    
     table = Table(title="Performance Report")
     table.add_column("Metric", style="cyan")
     table.add_column("Count", style="green")
@@ -105,6 +154,9 @@ def show_performance_report():
     table.add_column("Avg", style="yellow")
     table.add_column("Min", style="dim")
     table.add_column("Max", style="dim")
+    table.add_column("p50", style="yellow")
+    table.add_column("p90", style="yellow")
+    table.add_column("p99", style="yellow")
     table.add_column("Last", style="bold")
     
     for name, metric_stats in sorted(stats.items()):
@@ -115,19 +167,55 @@ def show_performance_report():
             f"{metric_stats['mean']:.3f}s",
             f"{metric_stats['min']:.3f}s",
             f"{metric_stats['max']:.3f}s",
+            f"{metric_stats['p50']:.3f}s",
+            f"{metric_stats['p90']:.3f}s",
+            f"{metric_stats['p99']:.3f}s",
             f"{metric_stats['last']:.3f}s",
         )
     
     console.print(table)
 
+def persist_metrics(command: Optional[str] = None) -> bool:
+    """把本进程的指标快照追加到跨调用的环形文件（fl perf report 汇总）"""
+    from fuling.perf import append_snapshot
+    
+    snapshot = monitor.snapshot()
+    if not snapshot:
+        return False
+    return append_snapshot(snapshot, command)
+
+def show_cache_report(cache_stats: Dict[str, Dict[str, Any]]):
+    """显示缓存统计"""
+    table = Table(title="Cache Report")
+    table.add_column("Cache", style="cyan")
+    table.add_column("Hits", style="green")
+    table.add_column("Misses", style="yellow")
+    table.add_column("Hit Rate", style="bold")
+    table.add_column("Evictions", style="dim")
+    table.add_column("Expired", style="dim")
+    table.add_column("Entries", style="dim")
+    table.add_column("Size", style="dim")
+    
+    for name, item in sorted(cache_stats.items()):
+        table.add_row(
+            name,
+            str(item['hits']),
+            str(item['misses']),
+            f"{item['hit_rate']:.0%}",
+            str(item['evictions']),
+            str(item['expirations']),
+            str(item['entries']),
+            f"{item['bytes'] / 1024:.1f}KB",
+        )
+    
+    console.print(table)
+
 def optimize_startup():
-    """优化启动性能"""
+    """测量启动性能（每个模块在全新的解释器中导入，避免 sys.modules 缓存）"""
+    from fuling.bench import measure_imports
     
     startup_metrics = {}
     
-    # 测量导入时间
-    import_times = {}
-    
     # 关键模块导入
     modules_to_import = [
         'click',
@@ -137,18 +225,11 @@ def optimize_startup():
         'ai_cli.core.context',
     ]
     
-    for module_name in modules_to_import:
-        start = time.perf_counter()
-        try:
-            __import__(module_name)
-            import_times[module_name] = time.perf_counter() - start
-        except ImportError:
-            import_times[module_name] = -1
-    
+    import_times = measure_imports(modules_to_import)
     startup_metrics['import_times'] = import_times
     
     # 总启动时间
-    total_startup = sum(t for t in import_times.values() if t > 0)
+    total_startup = float(sum(t for t in import_times.values() if t > 0))
     startup_metrics['total_startup'] = total_startup
     
     return startup_metrics
@@ -216,33 +297,38 @@ def with_progress(description: str):
         return wrapper
     return decorator
 
-def cache_result(ttl: int = 300):  # 5分钟缓存
-    """缓存结果装饰器"""
+_MISSING = object()
+
+def cache_result(ttl: float = 300, maxsize: int = 256, max_bytes: int = 16 * 1024 * 1024,
+                 disk: bool = False):  # 默认5分钟缓存
+    """缓存结果装饰器（有界 LRU，过期条目自动清理，线程安全）
+    
+    disk=True 时同时缓存到 paths.cache_dir/memo 下，跨进程复用（结果须可JSON序列化）。
+    被装饰的函数带有 cache、cache_clear()、cache_info() 属性。
+    """
     def decorator(func):
-        cache = {}
-        cache_times = {}
+        name = f"{func.__module__}.{func.__qualname__}"
+        disk_dir = None
+        if disk:
+            from fuling.fuling_core import get_cache_dir
+            disk_dir = get_cache_dir() / "memo" / name
+        cache = LRUCache(max_entries=maxsize, max_bytes=max_bytes, ttl=ttl, disk_dir=disk_dir)
+        monitor.register_cache(name, cache)
         
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            # 创建缓存键
-            key = (func.__name__, args, frozenset(kwargs.items()))
-            
-            current_time = time.time()
-            
-            # 检查缓存是否有效
-            if key in cache:
-                cache_time = cache_times[key]
-                if current_time - cache_time < ttl:
-                    console.print(f"[dim]📦 Using cached result for {func.__name__}[/]")
-                    return cache[key]
+            key = make_key(args, kwargs)
+            result = cache.get(key, _MISSING)
+            if result is not _MISSING:
+                return result
             
-            # 执行函数并缓存结果
             result = func(*args, **kwargs)
-            cache[key] = result
-            cache_times[key] = current_time
-            
+            cache.put(key, result)
             return result
         
+        wrapper.cache = cache
+        wrapper.cache_clear = cache.clear
+        wrapper.cache_info = cache.stats
         return wrapper
     return decorator
 
@@ -0,0 +1,182 @@
+"""
+Shell history reader that seeks from the end of the file
+"""
+
+import os
+import re
+from typing import Iterator, List, NamedTuple, Optional
+
+BLOCK_SIZE = 64 * 1024
+
+# zsh EXTENDED_HISTORY: ": <start>:<elapsed>;<command>"
+ZSH_EXTENDED = re.compile(rb"^: *(\d+):\d+;")
+# bash with HISTTIMEFORMAT set writes "#<epoch>" before each entry
+BASH_TIMESTAMP = re.compile(rb"^#(\d{9,})$")
+
+# zsh stores bytes >= 0x83 as META followed by the byte xor 0x20
+ZSH_META = 0x83
+
+# Lines inspected at the end of the file to detect its format
+DETECT_LINES = 64
+# A timestamped bash entry longer than this is taken to be the untimestamped
+# part of a file whose timestamps were enabled later
+MAX_ENTRY_LINES = 200
+
+
+class HistoryEntry(NamedTuple):
+    """One command from a history file"""
+    command: str
+    timestamp: Optional[int] = None
+
+
+def iter_lines_reverse(path: str, block_size: int = BLOCK_SIZE) -> Iterator[bytes]:
+    """Yield the lines of a file from last to first, reading blocks backwards"""
+    with open(path, "rb") as f:
+        position = f.seek(0, os.SEEK_END)
+        if position == 0:
+            return
+        pending = b""
+        first = True
+        while position > 0:
+            size = min(block_size, position)
+            position -= size
+            f.seek(position)
+            lines = (f.read(size) + pending).split(b"\n")
+            # The first piece may continue in the previous block
+            pending = lines.pop(0)
+            if first and lines and lines[-1] == b"":
+                lines.pop()  # the file's trailing newline
+            first = False
+            for line in reversed(lines):
+                yield line.rstrip(b"\r")
+        yield pending.rstrip(b"\r")
+
+
+def unmetafy(data: bytes) -> bytes:
+    """Undo zsh's metafication of non-ASCII bytes"""
+    if ZSH_META not in data:
+        return data
+    result = bytearray()
+    meta = False
+    for byte in data:
+        if meta:
+            result.append(byte ^ 0x20)
+            meta = False
+        elif byte == ZSH_META:
+            meta = True
+        else:
+            result.append(byte)
+    return bytes(result)
+
+
+def detect_format(lines: List[bytes]) -> str:
+    """Guess the history format from a few lines at the end of the file"""
+    if any(ZSH_EXTENDED.match(line) for line in lines):
+        return "zsh"
+    if any(BASH_TIMESTAMP.match(line) for line in lines):
+        return "bash"
+    return "plain"
+
+
+def _decode(lines: List[bytes], zsh: bool) -> str:
+    data = b"\n".join(lines)
+    if zsh:
+        data = unmetafy(data)
+    return data.decode("utf-8", errors="ignore").strip()
+
+
+def _zsh_entries(lines: Iterator[bytes]) -> Iterator[HistoryEntry]:
+    """Multi-line zsh entries end every line but the last with a backslash"""
+    pending: List[bytes] = []
+    for line in lines:
+        if pending and not line.endswith(b"\\"):
+            yield _zsh_entry(pending)
+            pending = []
+        if pending:
+            line = line[:-1]  # drop the continuation backslash
+        pending.insert(0, line)
+    if pending:
+        yield _zsh_entry(pending)
+
+
+def _zsh_entry(lines: List[bytes]) -> HistoryEntry:
+    match = ZSH_EXTENDED.match(lines[0])
+    if match:
+        lines = [lines[0][match.end():]] + lines[1:]
+        return HistoryEntry(_decode(lines, zsh=True), int(match.group(1)))
+    return HistoryEntry(_decode(lines, zsh=True))
+
+
+def _bash_entries(lines: Iterator[bytes]) -> Iterator[HistoryEntry]:
+    """Timestamp lines separate entries, so an entry may span several lines"""
+    pending: List[bytes] = []
+    for line in lines:
+        match = BASH_TIMESTAMP.match(line)
+        if match:
+            if pending:
+                yield HistoryEntry(_decode(pending, zsh=False), int(match.group(1)))
+            pending = []
+            continue
+        pending.insert(0, line)
+        if len(pending) > MAX_ENTRY_LINES:
+            # Older lines written without timestamps: one command per line
+            for older in reversed(pending):
+                yield HistoryEntry(_decode([older], zsh=False))
+            yield from _plain_entries(lines, zsh=False)
+            return
+    # No timestamp line before the oldest lines: written one command per line
+    # before HISTTIMEFORMAT was set
+    for older in reversed(pending):
+        yield HistoryEntry(_decode([older], zsh=False))
+
+
+def _plain_entries(lines: Iterator[bytes], zsh: bool) -> Iterator[HistoryEntry]:
+    for line in lines:
+        yield HistoryEntry(_decode([line], zsh=zsh))
+
+
+def iter_entries_reverse(path: str, fmt: Optional[str] = None,
+                         block_size: int = BLOCK_SIZE) -> Iterator[HistoryEntry]:
+    """Yield history entries newest first.
+
+    fmt is "zsh", "bash" or "plain"; by default it is detected from the end
+    of the file. A "zsh" hint for a file without extended timestamps still
+    handles multi-line entries and metafied bytes.
+    """
+    lines = iter_lines_reverse(path, block_size)
+    head = []
+    for line in lines:
+        head.append(line)
+        if len(head) >= DETECT_LINES:
+            break
+    detected = detect_format(head)
+    # Plain zsh history still has multi-line entries and metafied bytes
+    if not (detected == "plain" and fmt == "zsh"):
+        fmt = detected
+
+    def replay() -> Iterator[bytes]:
+        yield from head
+        yield from lines
+
+    if fmt == "zsh":
+        entries = _zsh_entries(replay())
+    elif fmt == "bash":
+        entries = _bash_entries(replay())
+    else:
+        entries = _plain_entries(replay(), zsh=False)
+    for entry in entries:
+        if entry.command:
+            yield entry
+
+
+def read_recent_entries(path: str, count: int, fmt: Optional[str] = None) -> List[HistoryEntry]:
+    """Last count entries of a history file, oldest first; reads only the tail"""
+    entries = []
+    if count <= 0:
+        return entries
+    for entry in iter_entries_reverse(path, fmt):
+        entries.append(entry)
+        if len(entries) >= count:
+            break
+    entries.reverse()
+    return entries
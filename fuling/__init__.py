@@ -7,24 +7,47 @@ __version__ = "0.1.0"
 __author__ = "符灵开发者"
 __description__ = "符灵 (Fú Líng) - 智能命令行助手"
 
-from .fuling_core import config, get_config, get_model_config
-from .fuling_ai import (
-    explain_command, 
-    chat_completion, 
-    test_ai_connection,
-    get_ai_provider,
-)
-from .fuling_theme import (
-    get_theme,
-    format_text,
-    show_banner,
-)
+import importlib
 
-# 导出主CLI
-try:
-    from .fuling_cli_enhanced import cli, main
-except ImportError:
-    from .fuling_cli import cli, main
+# 公开名称 -> 所在模块，首次访问时才导入（保持 `fl --help` 和守护进程客户端的启动速度）
+_LAZY_EXPORTS = {
+    # 核心模块
+    "config": ".fuling_core",
+    "get_config": ".fuling_core",
+    "get_model_config": ".fuling_core",
+    
+    # AI模块
+    "explain_command": ".fuling_ai",
+    "chat_completion": ".fuling_ai",
+    "test_ai_connection": ".fuling_ai",
+    "get_ai_provider": ".fuling_ai",
+    
+    # 主题模块
+    "get_theme": ".fuling_theme",
+    "format_text": ".fuling_theme",
+    "show_banner": ".fuling_theme",
+    
+    # CLI
+    "cli": ".fuling_cli_enhanced",
+    "main": ".fuling_cli_enhanced",
+}
+
+def __getattr__(name):
+    module_name = _LAZY_EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    try:
+        module = importlib.import_module(module_name, __name__)
+    except ImportError:
+        if module_name != ".fuling_cli_enhanced":
+            raise
+        module = importlib.import_module(".fuling_cli", __name__)
+    value = getattr(module, name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_EXPORTS))
 
 __all__ = [
     # 版本信息
@@ -0,0 +1,538 @@
+"""
+符灵基准测试 - fl bench 命令
+
+startup: 为每个顶层命令启动全新的解释器，用 -X importtime 解析导入树，
+报告冷/热启动耗时、最慢的模块，并与保存的基线比较。
+load: 多个虚拟用户并发执行 explain/generate/chat，报告吞吐量、错误率和延迟分位数。
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+import click
+
+from .fuling_theme import format_text
+
+PACKAGE_ROOT = Path(__file__).resolve().parent.parent
+
+# 与 fl 入口相同的启动路径（经过守护进程客户端）
+ENTRY_SCRIPT = "import sys; sys.argv = {argv!r}; from fuling.daemon_client import main; main()"
+
+DEFAULT_BENCH_CONFIG = {
+    "runs": 5,
+    "startup_threshold": 0.2,
+    "min_regression_ms": 5,
+}
+
+
+def get_bench_config() -> Dict[str, Any]:
+    """获取基准测试配置"""
+    from .fuling_core import get_config
+    return {**DEFAULT_BENCH_CONFIG, **(get_config().get("bench") or {})}
+
+
+def default_baseline_path() -> Path:
+    """默认的启动基线文件"""
+    from .fuling_core import get_cache_dir
+    return get_cache_dir() / "bench" / "startup.json"
+
+
+def parse_importtime(text: str) -> List[Dict[str, Any]]:
+    """解析 -X importtime 输出，返回 [{module, self_us, cumulative_us, depth}]"""
+    records = []
+    for line in text.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        try:
+            self_us, cumulative_us = int(parts[0]), int(parts[1])
+        except ValueError:
+            continue  # 表头
+        name = parts[2].rstrip()
+        stripped = name.lstrip()
+        records.append({
+            "module": stripped,
+            "self_us": self_us,
+            "cumulative_us": cumulative_us,
+            "depth": (len(name) - len(stripped) - 1) // 2,
+        })
+    return records
+
+
+def _subprocess_env() -> Dict[str, str]:
+    """子进程环境：可导入当前源码树，且不转发给守护进程"""
+    env = dict(os.environ)
+    env["FULING_NO_DAEMON"] = "1"
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(PACKAGE_ROOT), env.get("PYTHONPATH")]))
+    return env
+
+
+def _run(code: str, flags: Tuple[str, ...] = ()) -> Tuple[float, subprocess.CompletedProcess]:
+    """在全新解释器中执行代码，返回 (墙钟耗时秒数, 进程结果)"""
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, *flags, "-c", code],
+        stdin=subprocess.DEVNULL, capture_output=True, text=True,
+        env=_subprocess_env(), cwd=str(PACKAGE_ROOT),
+    )
+    return time.perf_counter() - start, result
+
+
+def startup_targets(names: Optional[List[str]] = None) -> List[List[str]]:
+    """要测量的命令行：fl --help 以及每个顶层命令的 --help"""
+    from .fuling_cli_enhanced import cli
+
+    commands = names or cli.list_commands(click.Context(cli))
+    return [["--help"]] + [[name, "--help"] for name in commands]
+
+
+def profile_command(args: List[str], runs: int, top: int = 10) -> Dict[str, Any]:
+    """测量一条命令的冷启动、热启动耗时和导入树"""
+    code = ENTRY_SCRIPT.format(argv=["fl", *args])
+
+    # 冷启动：使用空的字节码缓存目录，所有模块都要重新编译（操作系统页缓存无法在此清空）
+    with tempfile.TemporaryDirectory(prefix="fl-pycache-") as pycache:
+        cold, _ = _run(code, ("-X", f"pycache_prefix={pycache}"))
+
+    _run(code)  # 预热
+    warm = sorted(_run(code)[0] for _ in range(runs))
+
+    _, traced = _run(code, ("-X", "importtime"))
+    records = parse_importtime(traced.stderr)
+    slowest = sorted(records, key=lambda r: r["self_us"], reverse=True)[:top]
+
+    return {
+        "argv": args,
+        "exit_code": traced.returncode,
+        "cold_ms": cold * 1000,
+        "warm_ms": warm[len(warm) // 2] * 1000,
+        "warm_min_ms": warm[0] * 1000,
+        "import_ms": sum(r["cumulative_us"] for r in records if r["depth"] == 0) / 1000,
+        "modules": len(records),
+        "top": [
+            {"module": r["module"], "self_ms": r["self_us"] / 1000, "cumulative_ms": r["cumulative_us"] / 1000}
+            for r in slowest
+        ],
+    }
+
+
+def bench_startup(targets: List[List[str]], runs: int, top: int = 10) -> Dict[str, Any]:
+    """测量所有命令的启动耗时"""
+    import platform
+
+    return {
+        "python": platform.python_version(),
+        "timestamp": time.time(),
+        "runs": runs,
+        "commands": {" ".join(["fl", *args]): profile_command(args, runs, top) for args in targets},
+    }
+
+
+def top_modules(report: Dict[str, Any], limit: int = 10) -> List[Dict[str, Any]]:
+    """汇总各命令中自身导入耗时最多的模块"""
+    worst: Dict[str, Dict[str, Any]] = {}
+    for result in report["commands"].values():
+        for entry in result["top"]:
+            current = worst.get(entry["module"])
+            if current is None or entry["self_ms"] > current["self_ms"]:
+                worst[entry["module"]] = entry
+    return sorted(worst.values(), key=lambda e: e["self_ms"], reverse=True)[:limit]
+
+
+def compare_startup(report: Dict[str, Any], baseline: Dict[str, Any],
+                    threshold: float, min_regression_ms: float) -> List[Dict[str, Any]]:
+    """逐条命令与基线比较热启动耗时"""
+    rows = []
+    for label, result in report["commands"].items():
+        base = baseline.get("commands", {}).get(label)
+        if base is None:
+            continue
+        delta = result["warm_ms"] - base["warm_ms"]
+        ratio = delta / base["warm_ms"] if base["warm_ms"] else 0.0
+        rows.append({
+            "command": label,
+            "baseline_ms": base["warm_ms"],
+            "warm_ms": result["warm_ms"],
+            "delta_ms": delta,
+            "ratio": ratio,
+            "regressed": delta > min_regression_ms and ratio > threshold,
+        })
+    return rows
+
+
+def measure_imports(modules: List[str]) -> Dict[str, float]:
+    """在全新解释器中分别导入各模块，返回累计导入耗时（秒），导入失败为 -1"""
+    times = {}
+    for module in modules:
+        _, result = _run(f"import {module}", ("-X", "importtime"))
+        record = next((r for r in reversed(parse_importtime(result.stderr)) if r["module"] == module), None)
+        times[module] = record["cumulative_us"] / 1e6 if result.returncode == 0 and record else -1
+    return times
+
+
+# 负载测试的请求样本
+LOAD_EXPLAIN_COMMANDS = [
+    "ls -la",
+    "tar -xzf archive.tar.gz",
+    "grep -rn TODO src",
+    "find . -name '*.py' -mtime -1",
+    "ps aux --sort=-%mem",
+    "docker ps -a",
+    "git log --oneline -10",
+    "du -sh *",
+]
+
+DEFAULT_LOAD_MIX = "explain=6,generate=2,chat=2"
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    """解析请求配比，如 explain=6,generate=2,chat=2"""
+    mix = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in LOAD_OPERATIONS:
+            raise ValueError(f"未知的请求类型: {name}（可选 {', '.join(LOAD_OPERATIONS)}）")
+        try:
+            mix[name] = float(weight) if weight else 1.0
+        except ValueError:
+            raise ValueError(f"无效的权重: {part}")
+    if not mix or sum(mix.values()) <= 0:
+        raise ValueError(f"无效的请求配比: {spec}")
+    return mix
+
+
+def _sample(op: str, start: float, result: str, ttft: Optional[float] = None) -> Dict[str, Any]:
+    from .fuling_ai import is_error_response
+    return {
+        "op": op,
+        "seconds": time.perf_counter() - start,
+        "ok": bool(result) and not is_error_response(result),
+        "ttft": ttft,
+    }
+
+
+def _load_explain(index: int, rng) -> Dict[str, Any]:
+    from .fuling_ai import explain_command
+    start = time.perf_counter()
+    return _sample("explain", start, explain_command(rng.choice(LOAD_EXPLAIN_COMMANDS)))
+
+
+def _load_generate(index: int, rng) -> Dict[str, Any]:
+    from .fuling_ai import chat_completion
+    messages = [
+        {"role": "system", "content": "你是一个python开发专家，也是符灵助手。"},
+        {"role": "user", "content": f"生成python代码: 负载测试任务 {index}"},
+    ]
+    start = time.perf_counter()
+    return _sample("generate", start, chat_completion(messages))
+
+
+def _load_chat(index: int, rng) -> Dict[str, Any]:
+    from .fuling_ai import stream_chat_completion
+    messages = [
+        {"role": "system", "content": "你是符灵，一个融合古代符咒文化与现代AI技术的智能助手。"},
+        {"role": "user", "content": f"负载测试对话 {index}"},
+    ]
+    start = time.perf_counter()
+    ttft = None
+    parts = []
+    for delta in stream_chat_completion(messages):
+        if ttft is None:
+            ttft = time.perf_counter() - start
+        parts.append(delta)
+    return _sample("chat", start, "".join(parts), ttft)
+
+
+# 请求类型 -> 执行函数，均走 fuling.fuling_ai 的真实调用路径
+LOAD_OPERATIONS = {
+    "explain": _load_explain,
+    "generate": _load_generate,
+    "chat": _load_chat,
+}
+
+
+def latency_summary(values: List[float]) -> Dict[str, Any]:
+    """延迟分位数汇总（毫秒）"""
+    from .metrics import percentile
+
+    ordered = sorted(values)
+    summary = {"count": len(ordered)}
+    if not ordered:
+        return summary
+    summary["mean_ms"] = sum(ordered) / len(ordered) * 1000
+    for q in (50, 90, 99, 99.9):
+        summary[f"p{q:g}_ms"] = percentile(ordered, q) * 1000
+    summary["max_ms"] = ordered[-1] * 1000
+    return summary
+
+
+def summarize_load(samples: List[Dict[str, Any]], elapsed: float, users: int) -> Dict[str, Any]:
+    """汇总负载测试结果"""
+    errors = sum(1 for s in samples if not s["ok"])
+    by_op = {}
+    for op in sorted({s["op"] for s in samples}):
+        op_samples = [s for s in samples if s["op"] == op]
+        by_op[op] = {
+            **latency_summary([s["seconds"] for s in op_samples]),
+            "errors": sum(1 for s in op_samples if not s["ok"]),
+        }
+    ttfts = [s["ttft"] for s in samples if s.get("ttft") is not None]
+    return {
+        "users": users,
+        "duration_s": elapsed,
+        "requests": len(samples),
+        "errors": errors,
+        "error_rate": errors / len(samples) if samples else 0.0,
+        "throughput_rps": len(samples) / elapsed if elapsed > 0 else 0.0,
+        "latency": latency_summary([s["seconds"] for s in samples]),
+        "ttft": latency_summary(ttfts),
+        "by_op": by_op,
+    }
+
+
+def run_load(users: int, mix: Dict[str, float], total: Optional[int] = None,
+             duration: Optional[float] = None, seed: Optional[int] = None) -> Dict[str, Any]:
+    """启动 users 个虚拟用户并发请求，直到完成 total 个请求或到达 duration 秒"""
+    import random
+    import threading
+
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    seeds = random.Random(seed)
+    lock = threading.Lock()
+    samples: List[Dict[str, Any]] = []
+    issued = [0]
+    start = time.perf_counter()
+    deadline = start + duration if duration else None
+
+    def claim() -> Optional[int]:
+        with lock:
+            if deadline is not None:
+                if time.perf_counter() >= deadline:
+                    return None
+            elif issued[0] >= total:
+                return None
+            issued[0] += 1
+            return issued[0]
+
+    def user(rng) -> None:
+        while True:
+            index = claim()
+            if index is None:
+                return
+            op = rng.choices(names, weights)[0]
+            try:
+                sample = LOAD_OPERATIONS[op](index, rng)
+            except Exception:
+                sample = {"op": op, "seconds": 0.0, "ok": False, "ttft": None}
+            with lock:
+                samples.append(sample)
+
+    threads = [
+        threading.Thread(target=user, args=(random.Random(seeds.random()),), name=f"fuling-load-{i}", daemon=True)
+        for i in range(users)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize_load(samples, time.perf_counter() - start, users)
+
+
+@contextmanager
+def load_target(provider: Optional[str], base_url: Optional[str], cache: bool):
+    """负载测试期间临时改写进程内配置：指向目标服务，关闭限流、对冲和故障转移"""
+    import copy
+    from .fuling_core import config, expand_env
+    from .fuling_ai import KEYLESS_PROVIDERS, reset_provider_registry
+
+    original = config._config
+    current = copy.deepcopy(config.load_config())
+    model = current.setdefault("model", {})
+    if base_url:
+        model["provider"] = provider
+        model["base_url"] = base_url.rstrip("/")
+        model["failover"] = []
+        if provider not in KEYLESS_PROVIDERS and not expand_env(model.get("api_key", "")):
+            model["api_key"] = "fuling-bench"
+    current.setdefault("features", {})["enable_cache"] = cache
+    current.setdefault("rate_limit", {})["enabled"] = False
+    current.setdefault("hedge", {})["enabled"] = False
+
+    config._config = current
+    reset_provider_registry()
+    try:
+        yield model
+    finally:
+        config._config = original
+        reset_provider_registry()
+
+
+def _display_width(text: str) -> int:
+    import unicodedata
+    return sum(2 if unicodedata.east_asian_width(c) in "WF" else 1 for c in text)
+
+
+def _ljust(text: str, width: int) -> str:
+    """按终端显示宽度左对齐（汉字占两列）"""
+    return text + " " * max(0, width - _display_width(text))
+
+
+def _rjust(text: str, width: int) -> str:
+    """按终端显示宽度右对齐"""
+    return " " * max(0, width - _display_width(text)) + text
+
+
+@click.group()
+def bench():
+    """性能基准测试"""
+
+
+@bench.command()
+@click.option('--runs', '-n', type=click.IntRange(min=1), default=None, help='每条命令的热启动测量次数')
+@click.option('--command', '-c', 'commands', multiple=True, help='只测量指定的子命令（可重复）')
+@click.option('--baseline', type=click.Path(dir_okay=False), default=None,
+              help='基线JSON文件（默认 缓存目录/bench/startup.json）')
+@click.option('--save-baseline', is_flag=True, help='把本次结果保存为基线')
+@click.option('--threshold', type=float, default=None, help='退化阈值（比例，如 0.2 表示慢 20%）')
+@click.option('--top', type=click.IntRange(min=1), default=10, help='显示最慢模块的数量')
+@click.option('--json', 'as_json', is_flag=True, help='以JSON输出结果')
+def startup(runs, commands, baseline, save_baseline, threshold, top, as_json):
+    """测量各命令的启动与导入耗时"""
+    from .fuling_core import write_json_atomic
+
+    options = get_bench_config()
+    runs = runs or int(options["runs"])
+    threshold = float(options["startup_threshold"]) if threshold is None else threshold
+    baseline_path = Path(baseline) if baseline else default_baseline_path()
+
+    targets = startup_targets(list(commands) or None)
+    if not as_json:
+        click.echo(format_text(f"测量 {len(targets)} 条命令的启动耗时 (每条 {runs} 次)...", "prompt"))
+    report = bench_startup(targets, runs, top)
+
+    previous = None
+    if baseline_path.exists():
+        try:
+            previous = json.loads(baseline_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            click.echo(format_text(f"基线文件无法读取: {e}", "warning"), err=True)
+    rows = compare_startup(report, previous, threshold, float(options["min_regression_ms"])) if previous else []
+    regressions = [row for row in rows if row["regressed"]]
+
+    if as_json:
+        click.echo(json.dumps({**report, "comparison": rows}, ensure_ascii=False, indent=2))
+    else:
+        deltas = {row["command"]: row for row in rows}
+        click.echo(f"\n{'命令':<28}{'冷启动':>8}{'热启动':>8}{'导入':>9}  对比基线")
+        for label, result in report["commands"].items():
+            row = deltas.get(label)
+            delta = f"{row['delta_ms']:+.1f}ms{' ❗' if row['regressed'] else ''}" if row else "-"
+            click.echo(f"{label:<30}{result['cold_ms']:>9.1f}ms{result['warm_ms']:>9.1f}ms"
+                       f"{result['import_ms']:>9.1f}ms  {delta}")
+            if result["exit_code"] != 0:
+                click.echo(format_text(f"  {label} 退出码 {result['exit_code']}", "warning"))
+
+        click.echo("\n" + format_text("导入最慢的模块:", "info"))
+        for entry in top_modules(report, top):
+            click.echo(f"  {entry['module']:<40}{entry['self_ms']:>8.1f}ms 自身 "
+                       f"{entry['cumulative_ms']:>8.1f}ms 累计")
+
+        if previous is None:
+            click.echo("\n" + format_text(f"尚无基线，可用 --save-baseline 保存到 {baseline_path}", "info"))
+        elif regressions:
+            click.echo("\n" + format_text(
+                f"{len(regressions)} 条命令启动变慢超过 {threshold:.0%}", "error"))
+        else:
+            click.echo("\n" + format_text("启动耗时未超过基线阈值", "success"))
+
+    if save_baseline:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        write_json_atomic(baseline_path, report)
+        if not as_json:
+            click.echo(format_text(f"基线已保存: {baseline_path}", "success"))
+
+    if regressions:
+        sys.exit(1)
+
+
+@bench.command()
+@click.option('--users', '-u', type=click.IntRange(min=1), default=8, show_default=True, help='并发虚拟用户数')
+@click.option('--requests', '-n', 'total', type=click.IntRange(min=1), default=200, show_default=True,
+              help='总请求数')
+@click.option('--duration', '-d', type=click.FloatRange(min=0, min_open=True), default=None,
+              help='按时长运行（秒），优先于 --requests')
+@click.option('--mix', default=DEFAULT_LOAD_MIX, show_default=True, help='请求配比')
+@click.option('--base-url', default=None, help='目标服务地址（如模拟服务器 http://127.0.0.1:8765/v1）')
+@click.option('--provider', '-p', default='moonshot', show_default=True,
+              type=click.Choice(['moonshot', 'deepseek', 'openai', 'ollama']), help='配合 --base-url 使用的协议')
+@click.option('--mock', is_flag=True, help='在本进程内启动模拟服务器作为目标')
+@click.option('--mock-latency', default='lognormal:0.2,0.5', show_default=True, help='模拟服务器的延迟分布')
+@click.option('--cache/--no-cache', default=False, show_default=True, help='是否启用响应缓存')
+@click.option('--seed', type=int, default=None, help='随机种子（请求配比可复现）')
+@click.option('--output', '-o', type=click.Path(dir_okay=False), default=None, help='结果写入JSON文件')
+def load(users, total, duration, mix, base_url, provider, mock, mock_latency, cache, seed, output):
+    """并发负载测试（吞吐量、错误率、延迟分位数）
+
+    请求经过 fuling.fuling_ai 的完整调用路径（规范化、缓存、合并、重试、连接池）。
+    --mock 与客户端共享进程和GIL，精确测量时请单独运行 python -m fuling.mockserver。
+    """
+    from .fuling_core import write_json_atomic
+
+    try:
+        weights = parse_mix(mix)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="--mix")
+
+    server = None
+    if mock:
+        from .mockserver import MockOptions, serve_in_background
+        try:
+            server = serve_in_background(MockOptions(latency=mock_latency, seed=seed))
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint="--mock-latency")
+        base_url = server.url if provider == "ollama" else f"{server.url}/v1"
+
+    try:
+        with load_target(provider, base_url, cache) as model:
+            target = model.get("base_url") or model.get("provider")
+            amount = f"{duration:g} 秒" if duration else f"{total} 个请求"
+            click.echo(format_text(f"负载测试: {users} 个并发用户, {amount}, 目标 {target}", "prompt"))
+            if not base_url:
+                click.echo(format_text("未指定 --base-url 或 --mock，将请求当前配置的真实提供商", "warning"))
+            report = run_load(users, weights, total=total, duration=duration, seed=seed)
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+
+    report["config"] = {"target": target, "provider": model.get("provider"), "mix": weights,
+                        "cache": cache, "mock": mock, "seed": seed}
+
+    latency = report["latency"]
+    click.echo(f"\n  请求数: {report['requests']}  错误: {report['errors']} ({report['error_rate']:.1%})")
+    click.echo(f"  吞吐量: {report['throughput_rps']:.1f} 请求/秒  耗时: {report['duration_s']:.2f} 秒")
+    if latency["count"]:
+        click.echo(f"\n  {_ljust('类型', 12)}{_rjust('数量', 6)}{_rjust('错误', 6)}"
+                   f"{'p50':>10}{'p90':>10}{'p99':>10}{'p99.9':>10}")
+        rows = [("全部", {**latency, "errors": report["errors"]})] + list(report["by_op"].items())
+        for name, stats in rows:
+            click.echo(f"  {_ljust(name, 12)}{stats['count']:>6}{stats['errors']:>6}"
+                       f"{stats['p50_ms']:>8.1f}ms{stats['p90_ms']:>8.1f}ms"
+                       f"{stats['p99_ms']:>8.1f}ms{stats['p99.9_ms']:>8.1f}ms")
+        if report["ttft"]["count"]:
+            click.echo(f"\n  首个token (chat): p50 {report['ttft']['p50_ms']:.1f}ms  p99 {report['ttft']['p99_ms']:.1f}ms")
+
+    if output:
+        write_json_atomic(Path(output), report)
+        click.echo("\n" + format_text(f"结果已保存: {output}", "success"))
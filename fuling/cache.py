@@ -0,0 +1,189 @@
+"""
+符灵响应缓存 - 内容寻址的磁盘缓存（TTL + LRU容量限制）
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+from .fuling_core import get_config, get_cache_dir, write_json_atomic
+
+DEFAULT_CACHE_CONFIG = {
+    "ttl": 7 * 24 * 3600,           # 缓存有效期（秒）
+    "max_entries": 5000,            # 最多缓存条目数
+    "max_bytes": 50 * 1024 * 1024,  # 缓存总大小上限
+}
+
+
+class ResponseCache:
+    """磁盘响应缓存，每条回复一个JSON文件，文件名为请求内容的哈希"""
+
+    def __init__(self, directory: Path, ttl: float = DEFAULT_CACHE_CONFIG["ttl"],
+                 max_entries: int = DEFAULT_CACHE_CONFIG["max_entries"],
+                 max_bytes: int = DEFAULT_CACHE_CONFIG["max_bytes"]):
+        self.directory = Path(directory)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(provider: str, model: str, messages: List[Dict],
+                 temperature: Any = None, max_tokens: Any = None) -> str:
+        """根据提供商、模型、规范化消息和采样参数生成缓存键"""
+        normalized = [
+            {
+                "role": msg.get("role", ""),
+                "content": " ".join(str(msg.get("content", "")).split()),
+            }
+            for msg in messages
+        ]
+        raw = json.dumps({
+            "provider": provider,
+            "model": model,
+            "messages": normalized,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+        }, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def get(self, key: str) -> Optional[str]:
+        """读取缓存，未命中或已过期返回None"""
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            self._count("misses")
+            return None
+
+        if time.time() - entry.get("created_at", 0) > self.ttl:
+            self._remove(path)
+            self._count("misses")
+            return None
+
+        # 更新修改时间作为LRU的最近访问时间
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+
+        self._count("hits")
+        return entry.get("response")
+
+    def put(self, key: str, response: str) -> None:
+        """写入缓存（原子替换），必要时按LRU淘汰"""
+        try:
+            write_json_atomic(self._path(key), {
+                "created_at": time.time(),
+                "response": response,
+            })
+            self._evict()
+        except OSError:
+            pass  # 缓存失败不影响主要功能
+
+    def _evict(self) -> None:
+        """超过条目数或总大小上限时，删除最久未访问的条目"""
+        entries = []
+        total_bytes = 0
+        now = time.time()
+
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not entry.name.endswith(".json"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total_bytes += stat.st_size
+
+        entries.sort()
+        remaining = len(entries)
+        for mtime, size, path in entries:
+            expired = now - mtime > self.ttl
+            if not expired and remaining <= self.max_entries and total_bytes <= self.max_bytes:
+                break
+            if self._remove(path):
+                self._count("evictions")
+            remaining -= 1
+            total_bytes -= size
+
+    def _remove(self, path) -> bool:
+        try:
+            os.unlink(path)
+            return True
+        except OSError:
+            return False
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def stats(self) -> Dict[str, Any]:
+        """命中统计和磁盘占用"""
+        entries = 0
+        total_bytes = 0
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if entry.name.endswith(".json"):
+                        entries += 1
+                        total_bytes += entry.stat().st_size
+        except OSError:
+            pass
+
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": total_bytes,
+        }
+
+    def clear(self) -> None:
+        """清空缓存"""
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if entry.name.endswith(".json"):
+                        self._remove(entry.path)
+        except OSError:
+            pass
+
+
+_response_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """获取全局响应缓存；features.enable_cache 关闭时返回None"""
+    global _response_cache
+
+    config = get_config()
+    if not config.get("features", {}).get("enable_cache", True):
+        return None
+
+    if _response_cache is None:
+        with _cache_lock:
+            if _response_cache is None:
+                options = dict(DEFAULT_CACHE_CONFIG)
+                options.update({
+                    k: v for k, v in (config.get("cache", {}) or {}).items()
+                    if k in DEFAULT_CACHE_CONFIG
+                })
+                _response_cache = ResponseCache(get_cache_dir() / "responses", **options)
+    return _response_cache
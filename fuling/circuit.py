@@ -0,0 +1,134 @@
+"""
+提供商熔断器 - 状态保存在 ~/.cache/fuling/circuits.json，多个fl进程共享
+"""
+
+import json
+import threading
+import time
+from typing import Dict, Any, Callable, Optional
+
+from .fuling_core import get_cache_dir, write_json_atomic
+
+CIRCUITS_FILE = "circuits.json"
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+DEFAULT_CIRCUIT_CONFIG = {
+    "failure_threshold": 3,  # 连续失败多少次后熔断
+    "reset_timeout": 60,     # 熔断多久后开始半开探测（秒）
+}
+
+_file_lock = threading.Lock()
+
+
+def _load() -> Dict[str, Any]:
+    """读取所有熔断器状态"""
+    try:
+        with open(get_cache_dir() / CIRCUITS_FILE, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except Exception:
+        return {}
+
+
+def _update(key: str, state: Dict[str, Any]) -> None:
+    """保存单个熔断器状态"""
+    with _file_lock:
+        try:
+            data = _load()
+            data[key] = state
+            write_json_atomic(get_cache_dir() / CIRCUITS_FILE, data)
+        except Exception:
+            pass  # 状态保存失败不影响主要功能
+
+
+class CircuitBreaker:
+    """单个提供商的熔断器
+
+    closed: 正常放行，连续失败达到阈值后转为 open；
+    open: 直接跳过，超过 reset_timeout 后在后台发起半开探测；
+    half_open: 探测进行中，仍然跳过；探测成功转为 closed，失败重新 open。
+    """
+
+    def __init__(self, key: str, probe: Optional[Callable[[], bool]] = None,
+                 failure_threshold: int = 3, reset_timeout: float = 60,
+                 clock: Callable[[], float] = time.time):
+        self.key = key
+        self.probe = probe
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._probe_thread: Optional[threading.Thread] = None
+
+    def _state(self) -> Dict[str, Any]:
+        return _load().get(self.key) or {"state": CLOSED, "failures": 0}
+
+    @property
+    def state(self) -> str:
+        """当前状态"""
+        return self._state().get("state", CLOSED)
+
+    def allow(self) -> bool:
+        """是否放行请求；熔断到期时顺带启动后台探测"""
+        current = self._state()
+        if current.get("state", CLOSED) == CLOSED:
+            return True
+
+        # open 到期，或半开探测的进程已退出（探测超时），重新探测
+        since = current.get("changed_at", 0)
+        if self._clock() - since >= self.reset_timeout:
+            self._start_probe()
+        return False
+
+    def record_success(self) -> None:
+        """请求成功，关闭熔断器"""
+        current = self._state()
+        if current.get("state") != CLOSED or current.get("failures"):
+            _update(self.key, {"state": CLOSED, "failures": 0, "changed_at": self._clock()})
+
+    def record_failure(self) -> None:
+        """请求失败，连续失败达到阈值时熔断"""
+        current = self._state()
+        failures = current.get("failures", 0) + 1
+        if current.get("state", CLOSED) != CLOSED or failures >= self.failure_threshold:
+            _update(self.key, {"state": OPEN, "failures": failures, "changed_at": self._clock()})
+        else:
+            _update(self.key, {"state": CLOSED, "failures": failures,
+                               "changed_at": current.get("changed_at", self._clock())})
+
+    def _start_probe(self) -> None:
+        """在后台线程中做一次半开探测"""
+        if self.probe is None:
+            # 没有探测手段时直接半开，放行下一次真实请求
+            _update(self.key, {"state": CLOSED, "failures": self.failure_threshold - 1,
+                               "changed_at": self._clock()})
+            return
+        if self._probe_thread is not None and self._probe_thread.is_alive():
+            return
+
+        _update(self.key, {"state": HALF_OPEN, "failures": self._state().get("failures", 0),
+                           "changed_at": self._clock()})
+        self._probe_thread = threading.Thread(target=self._run_probe, daemon=True)
+        self._probe_thread.start()
+
+    def _run_probe(self) -> None:
+        try:
+            ok = bool(self.probe())
+        except Exception:
+            ok = False
+        if ok:
+            self.record_success()
+        else:
+            self.record_failure()
+
+    def wait_probe(self, timeout: Optional[float] = None) -> None:
+        """等待后台探测结束（测试和退出前使用）"""
+        if self._probe_thread is not None:
+            self._probe_thread.join(timeout)
+
+
+def get_circuit_states() -> Dict[str, Dict[str, Any]]:
+    """所有熔断器的状态"""
+    return _load()
@@ -0,0 +1,318 @@
+"""
+符灵守护进程 - 常驻进程保持配置、提供商、连接池和缓存处于预热状态
+
+每个连接在独立线程中执行一条 fl 命令，命令的标准输入输出通过套接字转发给客户端。
+"""
+
+import io
+import json
+import os
+import socketserver
+import sys
+import threading
+from typing import Any, Dict, List, Optional
+
+import click
+
+from .daemon_client import DAEMON_COMMANDS, socket_path
+
+
+class _ThreadLocalStream(io.TextIOBase):
+    """按线程分发的标准流：处理请求的线程写入各自的套接字，其余线程写入原始流"""
+
+    def __init__(self, fallback):
+        self._fallback = fallback
+        self._local = threading.local()
+
+    def bind(self, stream) -> None:
+        self._local.stream = stream
+
+    def unbind(self) -> None:
+        self._local.stream = None
+
+    def _target(self):
+        return getattr(self._local, "stream", None) or self._fallback
+
+    @property
+    def encoding(self) -> str:
+        return "utf-8"
+
+    @property
+    def errors(self) -> str:
+        return "strict"
+
+    def writable(self) -> bool:
+        return True
+
+    def readable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        return self._target().write(text)
+
+    def flush(self) -> None:
+        self._target().flush()
+
+    def readline(self, size: int = -1) -> str:
+        return self._target().readline(size)
+
+    def isatty(self) -> bool:
+        return self._target().isatty()
+
+    def fileno(self) -> int:
+        target = self._target()
+        if target is self._fallback:
+            return self._fallback.fileno()
+        raise io.UnsupportedOperation("fileno")
+
+
+class _RemoteStream(io.TextIOBase):
+    """把一个连接包装成文本流：写入转为 out/err 消息，读取向客户端请求一行输入"""
+
+    def __init__(self, connection: "_Connection", kind: str, tty: bool):
+        self._connection = connection
+        self._kind = kind
+        self._tty = tty
+
+    @property
+    def encoding(self) -> str:
+        return "utf-8"
+
+    def writable(self) -> bool:
+        return self._kind != "in"
+
+    def readable(self) -> bool:
+        return self._kind == "in"
+
+    def write(self, text: str) -> int:
+        if not isinstance(text, str):
+            raise TypeError("write() argument must be str")
+        if text:
+            self._connection.send({self._kind: text})
+        return len(text)
+
+    def flush(self) -> None:
+        pass
+
+    def readline(self, size: int = -1) -> str:
+        return self._connection.read_line()
+
+    def isatty(self) -> bool:
+        return self._tty
+
+
+class _Connection:
+    """一个客户端连接上的NDJSON收发"""
+
+    def __init__(self, rfile, wfile):
+        self._rfile = rfile
+        self._wfile = wfile
+
+    def send(self, message: Dict[str, Any]) -> None:
+        self._wfile.write((json.dumps(message, ensure_ascii=False) + "\n").encode("utf-8"))
+        self._wfile.flush()
+
+    def receive(self) -> Optional[Dict[str, Any]]:
+        line = self._rfile.readline()
+        return json.loads(line) if line else None
+
+    def read_line(self) -> str:
+        self.send({"read": True})
+        reply = self.receive()
+        if not reply or reply.get("eof"):
+            return ""
+        return reply.get("line", "")
+
+
+class FulingDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """在Unix套接字上执行 fl 命令的常驻服务"""
+
+    daemon_threads = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self.requests_served = 0
+        self._config_mtime = self._read_config_mtime()
+        self._stats_lock = threading.Lock()
+        self._config_lock = threading.Lock()
+        # bind 时按 umask 创建套接字文件，先收紧 umask，避免 chmod 之前被其他用户连接
+        old_umask = os.umask(0o177)
+        try:
+            super().__init__(path, _Handler)
+        finally:
+            os.umask(old_umask)
+        os.chmod(path, 0o600)
+
+    def _read_config_mtime(self) -> Optional[float]:
+        from .fuling_core import config
+        try:
+            return config.config_file.stat().st_mtime
+        except OSError:
+            return None
+
+    def refresh_config(self) -> None:
+        """配置文件变化时重新加载，并重建提供商
+
+        其他线程可能正在执行命令，所以先加载好新配置再整体替换，不清空正在使用的配置。
+        """
+        from .fuling_core import FulingConfig, config
+        from .fuling_ai import reset_provider_registry
+
+        with self._config_lock:
+            mtime = self._read_config_mtime()
+            if mtime == self._config_mtime:
+                return
+            fresh = FulingConfig()
+            fresh.config_dir, fresh.config_file = config.config_dir, config.config_file
+            config._config = fresh.load_config()
+            self._config_mtime = mtime
+            reset_provider_registry()
+
+    def run_cli(self, argv: List[str], connection: _Connection, tty: Dict[str, bool]) -> int:
+        """在当前线程执行一条CLI命令，输入输出绑定到连接"""
+        from .fuling_cli_enhanced import cli
+        from .fuling_theme import format_text
+
+        streams = {
+            "stdout": _RemoteStream(connection, "out", bool(tty.get("stdout"))),
+            "stderr": _RemoteStream(connection, "err", bool(tty.get("stderr"))),
+            "stdin": _RemoteStream(connection, "in", bool(tty.get("stdin"))),
+        }
+        proxies = _install_streams()
+        for name, stream in streams.items():
+            proxies[name].bind(stream)
+        try:
+            cli.main(args=argv, prog_name="fl", standalone_mode=True)
+            return 0
+        except SystemExit as e:
+            return e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        except Exception as e:
+            streams["stderr"].write(format_text(f"符咒失效: {e}", "error") + "\n")
+            return 1
+        finally:
+            for name in streams:
+                proxies[name].unbind()
+            with self._stats_lock:
+                self.requests_served += 1
+
+    def server_close(self) -> None:
+        super().server_close()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """处理一个客户端连接"""
+
+    def handle(self):
+        connection = _Connection(self.rfile, self.wfile)
+        try:
+            message = connection.receive()
+        except ValueError:
+            return
+        if not message:
+            return
+
+        op = message.get("op")
+        if op == "ping":
+            connection.send({"ok": True, "pid": os.getpid(), "served": self.server.requests_served})
+            return
+        if op == "shutdown":
+            connection.send({"ok": True})
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+            return
+
+        argv = message.get("argv") or []
+        if not argv or argv[0] not in DAEMON_COMMANDS:
+            connection.send({"err": "守护进程不支持该命令\n"})
+            connection.send({"exit": 2})
+            return
+
+        try:
+            self.server.refresh_config()
+            code = self.server.run_cli(argv, connection, message.get("tty") or {})
+            connection.send({"exit": code})
+        except (OSError, ValueError):
+            pass  # 客户端中途断开
+
+
+_install_lock = threading.Lock()
+
+
+def _install_streams() -> Dict[str, _ThreadLocalStream]:
+    """把标准流替换为按线程分发的流（已替换时直接复用）"""
+    with _install_lock:
+        proxies = {}
+        for name in ("stdout", "stderr", "stdin"):
+            current = getattr(sys, name)
+            if not isinstance(current, _ThreadLocalStream):
+                current = _ThreadLocalStream(current)
+                setattr(sys, name, current)
+            proxies[name] = current
+        return proxies
+
+
+def _warm_up() -> None:
+    """预先导入模块并构建提供商"""
+    from . import fuling_cli_enhanced  # noqa: F401
+    from .fuling_ai import get_ai_provider
+    from .transport import get_transport
+
+    get_transport()
+    get_ai_provider()
+
+
+def serve(path: Optional[str] = None) -> None:
+    """启动守护进程（前台运行，Ctrl+C 退出）"""
+    path = path or socket_path()
+    os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+
+    # 清理上次异常退出留下的套接字文件
+    from .daemon_client import connect
+    existing = connect(path)
+    if existing is not None:
+        existing.close()
+        raise RuntimeError(f"守护进程已在运行: {path}")
+    if os.path.exists(path):
+        os.unlink(path)
+
+    _warm_up()
+    server = FulingDaemon(path)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+@click.command(name="daemon")
+@click.option('--status', is_flag=True, help='查看守护进程状态')
+@click.option('--stop', is_flag=True, help='停止守护进程')
+def daemon_command(status, stop):
+    """常驻守护进程（保持灵力预热，加速 explain/generate/chat）"""
+    from .daemon_client import request
+    from .fuling_theme import format_text
+
+    path = socket_path()
+    if status or stop:
+        reply = request({"op": "shutdown" if stop else "ping"}, path)
+        if reply is None:
+            click.echo(format_text("守护进程未运行", "warning"))
+            sys.exit(1)
+        if stop:
+            click.echo(format_text("守护进程已停止", "success"))
+        else:
+            click.echo(format_text(f"守护进程运行中 (PID {reply.get('pid')}, 已处理 {reply.get('served', 0)} 个请求)", "success"))
+            click.echo(f"  套接字: {path}")
+        return
+
+    click.echo(format_text(f"符灵守护进程启动: {path}", "prompt"))
+    click.echo("  按 Ctrl+C 退出")
+    try:
+        serve(path)
+    except RuntimeError as e:
+        click.echo(format_text(str(e), "warning"))
+        sys.exit(1)
+    except KeyboardInterrupt:
+        click.echo("\n" + format_text("符灵退散...", "info"))
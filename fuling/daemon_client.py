@@ -0,0 +1,130 @@
+"""
+符灵守护进程客户端 - 只依赖标准库，优先把命令转发给 fl daemon，失败时在本进程执行
+
+协议为Unix套接字上的NDJSON（每行一个JSON对象）：
+  客户端 -> 守护进程: {"argv": [...], "tty": {...}} 或 {"op": "ping" | "shutdown"}，
+                      以及应答读取请求的 {"line": "..."} / {"eof": true}
+  守护进程 -> 客户端: {"out": "..."} {"err": "..."} {"read": true} {"exit": 0}
+"""
+
+import json
+import os
+import socket
+import sys
+from typing import Any, Dict, List, Optional
+
+# 可以交给守护进程执行的子命令
+DAEMON_COMMANDS = {"explain", "generate", "chat"}
+
+# 这些选项依赖客户端的工作目录或文件，始终在本进程执行
+LOCAL_ONLY_OPTIONS = {"-o", "--output", "-b", "--batch", "--trace"}
+
+CONNECT_TIMEOUT = 0.2
+
+
+def socket_path() -> str:
+    """守护进程套接字路径（可用 FULING_SOCKET 覆盖）"""
+    override = os.environ.get("FULING_SOCKET")
+    if override:
+        return override
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return os.path.join(runtime_dir, "fuling", "daemon.sock")
+    return os.path.join(os.path.expanduser("~"), ".cache", "fuling", "daemon.sock")
+
+
+def connect(path: Optional[str] = None, timeout: float = CONNECT_TIMEOUT) -> Optional[socket.socket]:
+    """连接守护进程，不可用时返回None"""
+    if not hasattr(socket, "AF_UNIX"):
+        return None
+    path = path or socket_path()
+    if not os.path.exists(path):
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(path)
+    except OSError:
+        sock.close()
+        return None
+    sock.settimeout(None)
+    return sock
+
+
+def _send(sock_file, message: Dict[str, Any]) -> None:
+    sock_file.write((json.dumps(message, ensure_ascii=False) + "\n").encode("utf-8"))
+    sock_file.flush()
+
+
+def request(message: Dict[str, Any], path: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """发送单个控制请求（ping / shutdown），返回应答"""
+    sock = connect(path)
+    if sock is None:
+        return None
+    with sock, sock.makefile("rwb") as sock_file:
+        _send(sock_file, message)
+        line = sock_file.readline()
+    return json.loads(line) if line else None
+
+
+def run_remote(argv: List[str], path: Optional[str] = None) -> Optional[int]:
+    """把命令交给守护进程执行，返回退出码；守护进程不可用时返回None"""
+    sock = connect(path)
+    if sock is None:
+        return None
+
+    started = False
+    try:
+        with sock, sock.makefile("rwb") as sock_file:
+            _send(sock_file, {
+                "argv": argv,
+                "tty": {"stdin": sys.stdin.isatty(), "stdout": sys.stdout.isatty(),
+                        "stderr": sys.stderr.isatty()},
+            })
+            for raw in sock_file:
+                message = json.loads(raw)
+                started = True
+                if "out" in message:
+                    sys.stdout.write(message["out"])
+                    sys.stdout.flush()
+                elif "err" in message:
+                    sys.stderr.write(message["err"])
+                    sys.stderr.flush()
+                elif message.get("read"):
+                    line = sys.stdin.readline()
+                    _send(sock_file, {"line": line} if line else {"eof": True})
+                elif "exit" in message:
+                    return int(message["exit"] or 0)
+    except (OSError, ValueError):
+        pass
+    # 尚未产生输出时回退到本进程执行，否则视为失败
+    return 1 if started else None
+
+
+def should_use_daemon(argv: List[str]) -> bool:
+    """判断命令是否可以交给守护进程"""
+    if os.environ.get("FULING_NO_DAEMON"):
+        return False
+    if not argv or argv[0] not in DAEMON_COMMANDS:
+        return False
+    return not any(arg.split("=", 1)[0] in LOCAL_ONLY_OPTIONS for arg in argv)
+
+
+def main() -> None:
+    """fl 入口：优先走守护进程，否则加载完整CLI"""
+    argv = sys.argv[1:]
+    if should_use_daemon(argv):
+        try:
+            code = run_remote(argv)
+        except KeyboardInterrupt:
+            sys.stdout.write("\n")
+            sys.exit(1)
+        if code is not None:
+            sys.exit(code)
+
+    from .fuling_cli_enhanced import main as cli_main
+    cli_main()
+
+
+if __name__ == "__main__":
+    main()
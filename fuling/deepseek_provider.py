@@ -4,7 +4,7 @@ DeepSeek AI提供商
 
 import os
 import json
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Iterator, List, Optional
 import requests
 from .fuling_ai import AIProvider
 
@@ -24,6 +24,29 @@ class DeepSeekProvider(AIProvider):
             env_var = self.api_key[2:-1]
             self.api_key = os.environ.get(env_var, '')
     
+    def _headers(self) -> Dict[str, str]:
+        """请求头"""
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+    
+    def _payload(self, messages: List[Dict], kwargs: Dict, stream: bool = False) -> Dict[str, Any]:
+        """构建请求数据"""
+        data = {
+            "model": self.model,
+            "messages": messages,
+            "temperature": kwargs.get('temperature', self.config.get('temperature', 0.3)),
+            "max_tokens": kwargs.get('max_tokens', self.config.get('max_tokens', 1000)),
+            "stream": stream,
+        }
+        
+        # 可选参数
+        if 'top_p' in kwargs:
+            data['top_p'] = kwargs['top_p']
+        
+        return data
+    
     def chat_completion(self, messages: List[Dict], **kwargs) -> str:
         """DeepSeek聊天补全"""
         if not self.api_key:
@@ -31,30 +54,10 @@ class DeepSeekProvider(AIProvider):
         
         try:
             url = f"{self.base_url}/chat/completions"
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
-            
-            # 构建请求数据
-            data = {
-                "model": self.model,
-                "messages": messages,
-                "temperature": kwargs.get('temperature', self.config.get('temperature', 0.3)),
-                "max_tokens": kwargs.get('max_tokens', self.config.get('max_tokens', 1000)),
-                "stream": False,
-            }
-            
-            # 可选参数
-            if 'top_p' in kwargs:
-                data['top_p'] = kwargs['top_p']
+            headers = self._headers()
+            data = self._payload(messages, kwargs)
             
-            response = requests.post(
-                url, 
-                headers=headers, 
-                json=data, 
-                timeout=self.timeout
-            )
+            response = self._post(url, headers=headers, json=data)
             
             if response.status_code == 200:
                 result = response.json()
@@ -83,11 +86,20 @@ class DeepSeekProvider(AIProvider):
         except Exception as e:
             return f"❌ DeepSeek API调用异常: {str(e)}"
     
-    def explain_command(self, command: str, context: Optional[str] = None) -> str:
-        """解释命令（使用DeepSeek）"""
+    def stream_chat_completion(self, messages: List[Dict], **kwargs) -> Iterator[str]:
+        """DeepSeek流式聊天补全（SSE）"""
         if not self.api_key:
-            return super().explain_command(command, context)
+            yield "❌ DeepSeek API密钥未配置。请运行 'fl config' 进行配置。"
+            return
         
+        yield from self._stream_sse(
+            f"{self.base_url}/chat/completions",
+            self._headers(),
+            self._payload(messages, kwargs, stream=True),
+        )
+    
+    def explain_messages(self, command: str, context: Optional[str] = None) -> List[Dict]:
+        """构建解释命令的对话消息"""
         messages = [
             {
                 "role": "system",
@@ -104,7 +116,14 @@ class DeepSeekProvider(AIProvider):
         if context:
             messages[1]["content"] += f"\n上下文: {context}"
         
-        return self.chat_completion(messages)
+        return messages
+    
+    def explain_command(self, command: str, context: Optional[str] = None) -> str:
+        """解释命令（使用DeepSeek）"""
+        if not self.api_key:
+            return super().explain_command(command, context)
+        
+        return self.chat_completion(self.explain_messages(command, context))
     
     def suggest_commands(self, context: Optional[str] = None) -> List[Dict]:
         """建议命令（使用DeepSeek）"""
@@ -258,7 +277,8 @@ def test_deepseek_connection(api_key: str):
             "Authorization": f"Bearer {api_key}"
         }
         
-        response = requests.get(url, headers=headers, timeout=10)
+        from .transport import get_transport
+        response = get_transport().get(url, headers=headers, timeout=10)
         
         if response.status_code == 200:
             click.echo("✅ DeepSeek连接测试成功")
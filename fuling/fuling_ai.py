@@ -2,10 +2,18 @@
 符灵AI模块 - 集成多AI提供商
 """
 
+import contextvars
 import os
 import json
-from typing import Dict, Any, List, Optional
-from .fuling_core import get_model_config
+import functools
+import hashlib
+import itertools
+import threading
+import time
+from typing import Dict, Any, Callable, Iterator, List, Optional
+from .fuling_core import get_config, get_model_config, get_providers_config
+from .retry import RetryPolicy
+from .tracing import span
 
 # OpenAIProvider在get_ai_provider中动态导入以避免依赖
 
@@ -18,14 +26,121 @@ class AIProvider:
         self.temperature = config.get('temperature', 0.3)
         self.max_tokens = config.get('max_tokens', 1000)
         self.timeout = config.get('timeout', 30)
+        self.retry_policy = RetryPolicy.from_config(config)
     
     def chat_completion(self, messages: List[Dict], **kwargs) -> str:
         """聊天补全"""
         raise NotImplementedError
     
+    @property
+    def provider_key(self) -> str:
+        """提供商标识，用于统计和日志"""
+        return self.__class__.__name__.replace('Provider', '').lower()
+    
+    def throttle(self) -> float:
+        """发出请求前按提供商+密钥跨进程限流，排队等待而不是失败；返回等待的秒数"""
+        from .ratelimit import throttle
+        
+        with span("ratelimit.wait", provider=self.provider_key) as waiting:
+            waited = throttle(self.provider_key, getattr(self, 'api_key', None), getattr(self, 'base_url', None))
+            waiting.set_attribute("waited", waited)
+        return waited
+    
+    def _post(self, url: str, **kwargs):
+        """通过共享连接池发送POST请求（跨进程限流，临时故障按重试策略重试）"""
+        from .transport import get_transport
+        
+        timeout = kwargs.pop('timeout', self.timeout)
+        transport = get_transport()
+        base_url = getattr(self, 'base_url', None)
+        
+        def send(attempt_timeout):
+            # 每次尝试都占用配额
+            self.throttle()
+            return transport.post(url, base_url=base_url, timeout=attempt_timeout, **kwargs)
+        
+        return self.retry_policy.call(send, key=self.provider_key, timeout=timeout)
+    
+    def stream_chat_completion(self, messages: List[Dict], **kwargs) -> Iterator[str]:
+        """流式聊天补全，逐段产出文本增量（默认一次产出完整回复）"""
+        yield self.chat_completion(messages, **kwargs)
+    
+    def _stream_sse(self, url: str, headers: Dict, data: Dict) -> Iterator[str]:
+        """发送OpenAI兼容的SSE流式请求，产出文本增量"""
+        import requests
+        from .transport import iter_openai_deltas
+        
+        try:
+            response = self._post(url, headers=headers, json=data, stream=True)
+        except requests.exceptions.Timeout:
+            yield "⏱️ 请求超时，请检查网络连接或增加超时时间"
+            return
+        except requests.exceptions.ConnectionError:
+            yield "🔌 网络连接失败，请检查网络连接"
+            return
+        
+        with response:
+            if response.status_code >= 400:
+                yield http_error_message(response.status_code, response.text)
+                return
+            
+            try:
+                yield from iter_openai_deltas(response)
+            except requests.exceptions.RequestException as e:
+                yield f"\n❌ 流式传输中断: {str(e)[:150]}"
+    
+    async def achat_completion(self, messages: List[Dict], **kwargs) -> str:
+        """异步聊天补全（在线程池中执行同步请求）"""
+        import asyncio
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(self.chat_completion, messages, **kwargs))
+    
     def explain_command(self, command: str, context: Optional[str] = None) -> str:
         """解释命令"""
         raise NotImplementedError
+    
+    async def aexplain_command(self, command: str, context: Optional[str] = None) -> str:
+        """异步解释命令"""
+        import asyncio
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.explain_command, command, context)
+    
+    def explain_messages(self, command: str, context: Optional[str] = None) -> Optional[List[Dict]]:
+        """构建解释命令的对话消息；返回None表示不经由chat_completion"""
+        return None
+    
+    def health_check(self) -> bool:
+        """轻量健康检查：GET /models，不调用模型"""
+        base_url = getattr(self, 'base_url', None)
+        api_key = getattr(self, 'api_key', None)
+        if not base_url or not api_key:
+            return False
+        
+        from .transport import get_transport
+        
+        try:
+            response = get_transport().get(
+                f"{base_url}/models",
+                base_url=base_url,
+                headers={"Authorization": f"Bearer {api_key}"},
+                timeout=min(self.timeout, 5),
+            )
+        except Exception:
+            return False
+        
+        # 401/403说明密钥无效，5xx说明服务不可用；其余状态码说明服务可达
+        return response.status_code not in (401, 403) and response.status_code < 500
+
+def http_error_message(status_code: int, text: str = "") -> str:
+    """将HTTP错误状态码转换为提示信息"""
+    if status_code == 401:
+        return "🔑 API密钥无效，请检查配置"
+    elif status_code == 429:
+        return "🚫 请求过于频繁，请稍后重试"
+    elif status_code == 500:
+        return "⚙️ 服务器内部错误，请稍后重试"
+    else:
+        return f"❌ HTTP错误 {status_code}: {text[:200]}"
 
 class MoonshotProvider(AIProvider):
     """Moonshot AI (Kimi) 提供商"""
@@ -35,38 +150,42 @@ class MoonshotProvider(AIProvider):
         self.api_key = config.get('api_key') or os.environ.get('MOONSHOT_API_KEY')
         self.base_url = config.get('base_url', 'https://api.moonshot.cn/v1')
     
-    def chat_completion(self, messages: List[Dict], **kwargs) -> str:
-        """Moonshot聊天补全"""
-        import requests
-        
-        if not self.api_key:
-            return "❌ 未设置Moonshot API密钥。请设置环境变量: export MOONSHOT_API_KEY='your_key'"
-        
-        url = f"{self.base_url}/chat/completions"
-        headers = {
+    def _headers(self) -> Dict[str, str]:
+        """请求头"""
+        return {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
-        
+    
+    def _payload(self, messages: List[Dict], kwargs: Dict, stream: bool = False) -> Dict[str, Any]:
+        """构建请求数据"""
         data = {
             "model": self.name,
             "messages": messages,
             "temperature": kwargs.get('temperature', self.temperature),
             "max_tokens": kwargs.get('max_tokens', self.max_tokens),
-            "stream": False,
+            "stream": stream,
         }
         
         # 添加可选的top_p参数
         if 'top_p' in kwargs:
             data['top_p'] = kwargs['top_p']
         
+        return data
+    
+    def chat_completion(self, messages: List[Dict], **kwargs) -> str:
+        """Moonshot聊天补全"""
+        import requests
+        
+        if not self.api_key:
+            return "❌ 未设置Moonshot API密钥。请设置环境变量: export MOONSHOT_API_KEY='your_key'"
+        
+        url = f"{self.base_url}/chat/completions"
+        headers = self._headers()
+        data = self._payload(messages, kwargs)
+        
         try:
-            response = requests.post(
-                url,
-                headers=headers,
-                json=data,
-                timeout=self.timeout
-            )
+            response = self._post(url, headers=headers, json=data)
             response.raise_for_status()
             
             result = response.json()
@@ -90,15 +209,22 @@ class MoonshotProvider(AIProvider):
         except requests.exceptions.HTTPError as e:
             if e.response.status_code == 401:
                 return "🔑 API密钥无效，请检查MOONSHOT_API_KEY"
-            elif e.response.status_code == 429:
-                return "🚫 请求过于频繁，请稍后重试"
-            elif e.response.status_code == 500:
-                return "⚙️ 服务器内部错误，请稍后重试"
-            else:
-                return f"❌ HTTP错误 {e.response.status_code}: {e.response.text[:200]}"
+            return http_error_message(e.response.status_code, e.response.text)
         except Exception as e:
             return f"❌ Moonshot API错误: {str(e)[:150]}"
     
+    def stream_chat_completion(self, messages: List[Dict], **kwargs) -> Iterator[str]:
+        """Moonshot流式聊天补全（SSE）"""
+        if not self.api_key:
+            yield "❌ 未设置Moonshot API密钥。请设置环境变量: export MOONSHOT_API_KEY='your_key'"
+            return
+        
+        yield from self._stream_sse(
+            f"{self.base_url}/chat/completions",
+            self._headers(),
+            self._payload(messages, kwargs, stream=True),
+        )
+    
     def _log_usage(self, usage: Dict):
         """记录API使用情况（可选）"""
         try:
@@ -109,18 +235,20 @@ class MoonshotProvider(AIProvider):
             # 静默失败，不影响主要功能
             pass
     
-    def explain_command(self, command: str, context: Optional[str] = None) -> str:
-        """解释命令"""
+    def explain_messages(self, command: str, context: Optional[str] = None) -> List[Dict]:
+        """构建解释命令的对话消息"""
         prompt = f"解释这个shell命令的功能和用法: {command}"
         if context:
             prompt += f"\n上下文: {context}"
         
-        messages = [
+        return [
             {"role": "system", "content": "你是一个Linux/Unix系统专家，专门解释shell命令。用中文回答。"},
             {"role": "user", "content": prompt}
         ]
-        
-        return self.chat_completion(messages)
+    
+    def explain_command(self, command: str, context: Optional[str] = None) -> str:
+        """解释命令"""
+        return self.chat_completion(self.explain_messages(command, context))
 
 class LocalProvider(AIProvider):
     """本地回退提供商"""
@@ -128,6 +256,7 @@ class LocalProvider(AIProvider):
     def __init__(self, config: Dict[str, Any]):
         super().__init__(config)
         self.command_db = self._load_command_database()
+        self.command_index = self._build_command_index(self.command_db)
         self.code_templates = self._load_code_templates()
     
     def _load_command_database(self) -> Dict:
@@ -197,6 +326,11 @@ class LocalProvider(AIProvider):
             "which": "寻踪符：查找命令位置",
         }
     
+    def _build_command_index(self, command_db: Dict[str, str]) -> Dict[str, str]:
+        """按规范化命令建立知识库索引"""
+        from .normalize import canonicalize
+        return {canonicalize(cmd): desc for cmd, desc in command_db.items()}
+    
     def _load_code_templates(self) -> Dict:
         """加载代码模板"""
         return {
@@ -336,25 +470,189 @@ CMD {run_command}""",
         response += "\n💡 使用: fl explain '命令' 获取详细解释"
         return response
     
+    def health_check(self) -> bool:
+        """本地提供商始终可用"""
+        return True
+    
     def explain_command(self, command: str, context: Optional[str] = None) -> str:
         """解释命令（本地数据库）"""
-        explanation = self.command_db.get(command.strip())
+        from .normalize import canonicalize
+        
+        canonical = canonicalize(command)
+        explanation = self.command_index.get(canonical)
         
         if explanation:
             return f"📜 {explanation}"
         else:
-            # 尝试匹配部分命令
-            for cmd, desc in self.command_db.items():
-                if command in cmd or cmd in command:
-                    return f"📜 {desc}"
+            # 按程序名匹配，优先选择前缀词最多的条目
+            words = canonical.split()
+            best, best_score = None, 0
+            for cmd, desc in self.command_index.items():
+                cmd_words = cmd.split()
+                if not words or cmd_words[0] != words[0]:
+                    continue
+                score = 1
+                for left, right in zip(cmd_words[1:], words[1:]):
+                    if left != right:
+                        break
+                    score += 1
+                if score > best_score:
+                    best, best_score = desc, score
+            
+            if best:
+                return f"📜 {best}"
             
             return f"💭 此符咒 '{command}' 含义深奥，本地知识库中未找到详细解释。\n💡 请设置API密钥以获取AI解读。"
 
-def get_ai_provider() -> AIProvider:
-    """获取AI提供商实例"""
-    model_config = get_model_config()
-    provider_name = model_config.get('provider', 'local').lower()
+class FailoverProvider(AIProvider):
+    """故障转移提供商：按顺序尝试链中的提供商，跳过已熔断的提供商"""
+    
+    def __init__(self, members: List[tuple], failure_threshold: int = 3, reset_timeout: float = 60,
+                 hedge: Optional[Dict[str, Any]] = None):
+        from .circuit import CircuitBreaker
+        from .health import health_key
+        
+        super().__init__({'name': 'failover'})
+        self.members = members
+        self.hedge = hedge if hedge and hedge.get('enabled') else None
+        self.breakers = {}
+        for name, provider in members:
+            if isinstance(provider, LocalProvider):
+                continue  # 本地模式总是可用，不需要熔断
+            key = health_key(name, getattr(provider, 'base_url', ''), getattr(provider, 'api_key', ''))
+            self.breakers[name] = CircuitBreaker(
+                key,
+                probe=provider.health_check,
+                failure_threshold=failure_threshold,
+                reset_timeout=reset_timeout,
+            )
+    
+    def _candidates(self) -> Iterator[tuple]:
+        """按顺序产出未熔断的提供商"""
+        for name, provider in self.members:
+            breaker = self.breakers.get(name)
+            if breaker is None or breaker.allow():
+                yield name, provider, breaker
+    
+    def _call_member(self, call: Callable[[AIProvider], str], name: str, provider: AIProvider, breaker) -> str:
+        """调用单个提供商并更新其熔断器"""
+        try:
+            result = call(provider)
+        except Exception as e:
+            result = f"❌ {name} 调用失败: {e}"
+        
+        if breaker is not None:
+            if is_error_response(result):
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+        return result
+    
+    def _attempt(self, call: Callable[[AIProvider], str]) -> str:
+        """依次调用提供商，直到拿到非错误的回复（开启对冲时前两个远程提供商竞速）"""
+        candidates = self._candidates()
+        last_error = None
+        
+        if self.hedge:
+            first = next(candidates, None)
+            if first is None:
+                return "❌ 没有可用的AI提供商"
+            second = next(candidates, None) if first[2] is not None else None
+            
+            if second is not None and second[2] is not None:
+                from .hedge import hedge_delay, hedged_call
+                
+                result, _, hedged = hedged_call(
+                    lambda: self._call_member(call, *first),
+                    lambda: self._call_member(call, *second),
+                    hedge_delay(getattr(first[1], 'base_url', None), self.hedge),
+                    is_error_response,
+                )
+                if not is_error_response(result):
+                    return result
+                last_error = result
+                # 备用提供商未被调用时，按顺序继续尝试
+                remaining = [] if hedged else [second]
+            else:
+                remaining = [first] + ([second] if second else [])
+            
+            candidates = itertools.chain(remaining, candidates)
+        
+        for name, provider, breaker in candidates:
+            result = self._call_member(call, name, provider, breaker)
+            if breaker is not None and is_error_response(result):
+                last_error = result
+                continue
+            return result
+        
+        return last_error or "❌ 没有可用的AI提供商"
+    
+    def chat_completion(self, messages: List[Dict], **kwargs) -> str:
+        """故障转移聊天补全"""
+        return self._attempt(lambda provider: _cached_completion(provider, messages, **kwargs))
+    
+    def stream_chat_completion(self, messages: List[Dict], **kwargs) -> Iterator[str]:
+        """故障转移流式聊天补全：首段是错误时换下一个提供商"""
+        last_error = None
+        for name, provider, breaker in self._candidates():
+            stream = _cached_stream(provider, messages, **kwargs)
+            try:
+                first = next(stream, "")
+            except Exception as e:
+                first = f"❌ {name} 调用失败: {e}"
+            
+            if breaker is not None:
+                if not first or is_error_response(first):
+                    breaker.record_failure()
+                    last_error = first
+                    continue
+                breaker.record_success()
+            
+            yield first
+            yield from stream
+            return
+        
+        yield last_error or "❌ 没有可用的AI提供商"
+    
+    def explain_command(self, command: str, context: Optional[str] = None) -> str:
+        """故障转移解释命令（各提供商使用各自的提示词和缓存）"""
+        from .normalize import normalize_command
+        
+        normalized = normalize_command(command)
+        
+        def call(provider: AIProvider) -> str:
+            messages = provider.explain_messages(normalized.canonical, context)
+            if messages is None:
+                return provider.explain_command(command, context)
+            return normalized.render(_cached_completion(provider, messages))
+        
+        return self._attempt(call)
+    
+    def health_check(self) -> bool:
+        """链末尾总有本地模式，始终可用"""
+        return True
     
+    def circuit_states(self) -> Dict[str, str]:
+        """各提供商的熔断状态"""
+        return {name: breaker.state for name, breaker in self.breakers.items()}
+
+# 进程内提供商注册表: 配置指纹 -> (提供商实例, 是否健康, 检查时间)
+_provider_registry: Dict[str, tuple] = {}
+_registry_lock = threading.Lock()
+
+def _config_fingerprint(model_config: Dict[str, Any]) -> str:
+    """计算模型配置指纹，配置变化时重新构建提供商"""
+    fingerprint = {"model": model_config}
+    if _failover_chain(model_config):
+        config = get_config()
+        fingerprint["providers"] = get_providers_config()
+        fingerprint["hedge"] = config.get('hedge')
+        fingerprint["circuit_breaker"] = config.get('circuit_breaker')
+    raw = json.dumps(fingerprint, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+def _resolve_provider_class(provider_name: str):
+    """根据名称解析提供商类"""
     # 基础提供商映射
     base_providers = {
         'moonshot': MoonshotProvider,
@@ -365,48 +663,244 @@ def get_ai_provider() -> AIProvider:
     if provider_name == 'openai':
         try:
             from .openai_provider import OpenAIProvider
-            provider_class = OpenAIProvider
+            return OpenAIProvider
         except ImportError:
             print("⚠️ OpenAIProvider导入失败，回退到本地模式")
-            provider_class = LocalProvider
+            return LocalProvider
     
     # 处理DeepSeek提供商（动态导入）
-    elif provider_name == 'deepseek':
+    if provider_name == 'deepseek':
         try:
             from .deepseek_provider import DeepSeekProvider
-            provider_class = DeepSeekProvider
+            return DeepSeekProvider
         except ImportError:
             print("⚠️ DeepSeekProvider导入失败，回退到本地模式")
-            provider_class = LocalProvider
+            return LocalProvider
     
-    else:
-        provider_class = base_providers.get(provider_name, LocalProvider)
+    # 处理Ollama提供商（动态导入）
+    if provider_name == 'ollama':
+        from .ollama_provider import OllamaProvider
+        return OllamaProvider
+    
+    return base_providers.get(provider_name, LocalProvider)
+
+def _build_provider(model_config: Dict[str, Any]) -> tuple:
+    """构建提供商并做健康检查，返回 (实际使用的提供商, 是否健康)"""
+    from .health import check_health, DEFAULT_HEALTH_TTL
+    
+    if _failover_chain(model_config):
+        return _build_failover_provider(model_config), True
+    
+    provider_name = model_config.get('provider', 'local').lower()
+    provider_class = _resolve_provider_class(provider_name)
     
     try:
-        provider = provider_class(model_config)
+        with span("provider.build", provider=provider_name):
+            provider = provider_class(model_config)
         
-        # 测试提供商是否可用
+        # 轻量探测提供商是否可用（结果按TTL缓存，不消耗模型调用）
         if provider_name != 'local':
-            # 简单测试连接
-            test_result = provider.explain_command("pwd")
-            if "❌" in test_result or "🔑" in test_result or "🚫" in test_result:
-                print(f"⚠️ {provider_name} 提供商测试失败: {test_result[:100]}")
+            ttl = model_config.get('health_ttl', DEFAULT_HEALTH_TTL)
+            with span("provider.health_check", provider=provider_name) as checking:
+                healthy = check_health(provider, ttl)
+                checking.set_attribute("healthy", healthy)
+            if not healthy:
+                print(f"⚠️ {provider_name} 提供商健康检查失败")
                 print("🔮 回退到本地模式")
-                return LocalProvider(model_config)
+                return LocalProvider(model_config), False
         
-        return provider
+        return provider, True
         
     except Exception as e:
         print(f"⚠️ {provider_name} 提供商初始化失败: {e}")
         print("🔮 回退到本地模式")
-        return LocalProvider(model_config)
+        return LocalProvider(model_config), False
+
+# 故障转移链中各提供商沿用 model 段的通用设置
+SHARED_MODEL_KEYS = ('temperature', 'max_tokens', 'timeout', 'retry_attempts', 'retry_delay',
+                     'retry_max_delay', 'retry_deadline')
+
+# 不需要API密钥的提供商
+KEYLESS_PROVIDERS = ('local', 'ollama')
+
+def _member_config(name: str, model_config: Dict[str, Any], providers: Dict[str, Dict]) -> Dict[str, Any]:
+    """合成故障转移链中某个提供商的配置"""
+    if name == model_config.get('provider', '').lower():
+        member = dict(model_config)
+    else:
+        member = {k: model_config[k] for k in SHARED_MODEL_KEYS if k in model_config}
+    member.update(providers.get(name, {}))
+    member['provider'] = name
+    member.pop('failover', None)
+    return member
+
+def _hedge_config() -> Dict[str, Any]:
+    """读取对冲请求配置"""
+    from .hedge import DEFAULT_HEDGE_CONFIG
+    
+    options = dict(DEFAULT_HEDGE_CONFIG)
+    options.update(get_config().get('hedge', {}) or {})
+    return options
+
+def _failover_chain(model_config: Dict[str, Any]) -> List[str]:
+    """故障转移链：model.failover，或开启对冲时的 [主提供商, 备用提供商]"""
+    chain = [str(name).lower() for name in model_config.get('failover') or []]
+    if not chain:
+        hedge = _hedge_config()
+        if hedge.get('enabled') and hedge.get('alternate'):
+            chain = [model_config.get('provider', 'local').lower(), str(hedge['alternate']).lower()]
+    return chain
+
+def _build_failover_provider(model_config: Dict[str, Any]) -> 'FailoverProvider':
+    """按 model.failover 构建故障转移链，末尾总是本地模式"""
+    from .circuit import DEFAULT_CIRCUIT_CONFIG
+    
+    providers = get_providers_config()
+    chain = _failover_chain(model_config)
+    if 'local' not in chain:
+        chain.append('local')
+    
+    members = []
+    for name in chain:
+        member_config = _member_config(name, model_config, providers)
+        try:
+            provider = _resolve_provider_class(name)(member_config)
+        except Exception as e:
+            print(f"⚠️ {name} 提供商初始化失败，已跳过: {e}")
+            continue
+        if name not in KEYLESS_PROVIDERS and not getattr(provider, 'api_key', None):
+            continue  # 未配置密钥的提供商不参与故障转移
+        members.append((name, provider))
+    
+    circuit_config = dict(DEFAULT_CIRCUIT_CONFIG)
+    circuit_config.update({
+        k: v for k, v in (get_config().get('circuit_breaker', {}) or {}).items()
+        if k in DEFAULT_CIRCUIT_CONFIG
+    })
+    return FailoverProvider(members, hedge=_hedge_config(), **circuit_config)
+
+def get_ai_provider() -> AIProvider:
+    """获取AI提供商实例（进程内复用，每种配置只构建一次）"""
+    model_config = get_model_config()
+    key = _config_fingerprint(model_config)
+    
+    with _registry_lock:
+        entry = _provider_registry.get(key)
+        if entry is not None:
+            provider, healthy, checked_at = entry
+            ttl = model_config.get('health_ttl', 300)
+            # 健康的提供商一直复用；回退的本地模式在TTL过后重新探测
+            if healthy or time.time() - checked_at < ttl:
+                return provider
+        
+        provider, healthy = _build_provider(model_config)
+        _provider_registry[key] = (provider, healthy, time.time())
+        return provider
+
+def reset_provider_registry() -> None:
+    """清空提供商注册表（配置变更或测试时使用）"""
+    with _registry_lock:
+        _provider_registry.clear()
+
+# 错误回复的前缀标记，这类回复不写入缓存
+ERROR_PREFIXES = ("❌", "⏱️", "🔌", "🔑", "🚫", "⚙️", "💰", "📏", "⚠️")
+
+def is_error_response(text: str) -> bool:
+    """判断回复是否为提供商返回的错误信息"""
+    return text.lstrip().startswith(ERROR_PREFIXES) or "❌ 流式传输中断" in text
+
+def _cache_key(provider: AIProvider, messages: List[Dict], kwargs: Dict[str, Any]) -> str:
+    """生成提供商请求对应的缓存键（同时用作在途请求的合并键）"""
+    from .cache import ResponseCache
+    return ResponseCache.make_key(
+        provider.__class__.__name__,
+        getattr(provider, 'model', provider.name),
+        messages,
+        kwargs.get('temperature', provider.temperature),
+        kwargs.get('max_tokens', provider.max_tokens),
+    )
+
+def _calls_upstream(provider: AIProvider) -> bool:
+    """是否直接请求远程提供商（本地提供商不请求，故障转移链由各成员分别请求）"""
+    return not isinstance(provider, (LocalProvider, FailoverProvider))
+
+def _get_cache(provider: AIProvider):
+    """获取适用于该提供商的响应缓存"""
+    if not _calls_upstream(provider):
+        return None
+    from .cache import get_response_cache
+    return get_response_cache()
+
+def _cached_completion(provider: AIProvider, messages: List[Dict], **kwargs) -> str:
+    """带响应缓存的聊天补全，相同的在途请求合并为一次上游调用"""
+    if not _calls_upstream(provider):
+        return provider.chat_completion(messages, **kwargs)
+    
+    from .singleflight import coalesce
+    
+    cache = _get_cache(provider)
+    key = _cache_key(provider, messages, kwargs)
+    if cache is not None:
+        with span("cache.get") as lookup:
+            cached = cache.get(key)
+            lookup.set_attribute("hit", cached is not None)
+        if cached is not None:
+            return cached
+    
+    def fetch() -> str:
+        # 上一批合并的请求可能刚写入缓存
+        if cache is not None:
+            cached = cache.get(key)
+            if cached is not None:
+                return cached
+        with span("provider.completion", provider=provider.provider_key,
+                  model=getattr(provider, 'model', provider.name)):
+            result = provider.chat_completion(messages, **kwargs)
+        if cache is not None and not is_error_response(result):
+            cache.put(key, result)
+        return result
+    
+    return coalesce(key, fetch)
+
+def _cached_stream(provider: AIProvider, messages: List[Dict], **kwargs) -> Iterator[str]:
+    """带响应缓存的流式聊天补全（命中缓存时一次产出完整回复）"""
+    cache = _get_cache(provider)
+    if cache is None:
+        yield from provider.stream_chat_completion(messages, **kwargs)
+        return
+    
+    key = _cache_key(provider, messages, kwargs)
+    cached = cache.get(key)
+    if cached is not None:
+        yield cached
+        return
+    
+    parts = []
+    for delta in provider.stream_chat_completion(messages, **kwargs):
+        parts.append(delta)
+        yield delta
+    
+    result = "".join(parts)
+    if result and not is_error_response(result):
+        cache.put(key, result)
 
 # 导出函数
 def explain_command(command: str, context: str = None) -> str:
     """解释shell命令"""
     try:
-        provider = get_ai_provider()
-        return provider.explain_command(command, context)
+        from .normalize import normalize_command
+        
+        with span("provider.get"):
+            provider = get_ai_provider()
+        with span("explain.normalize"):
+            normalized = normalize_command(command)
+            messages = provider.explain_messages(normalized.canonical, context)
+        if messages is None:
+            with span("provider.explain", provider=provider.provider_key):
+                return provider.explain_command(command, context)
+        result = _cached_completion(provider, messages)
+        with span("explain.render"):
+            return normalized.render(result)
     except Exception as e:
         return f"❌ 解释命令失败: {e}"
 
@@ -414,10 +908,71 @@ def chat_completion(messages: List[Dict], **kwargs) -> str:
     """通用聊天补全"""
     try:
         provider = get_ai_provider()
-        return provider.chat_completion(messages, **kwargs)
+        return _cached_completion(provider, messages, **kwargs)
     except Exception as e:
         return f"❌ 聊天失败: {e}"
 
+def stream_chat_completion(messages: List[Dict], **kwargs) -> Iterator[str]:
+    """流式聊天补全，逐段产出文本增量（命中缓存时一次产出完整回复）"""
+    try:
+        provider = get_ai_provider()
+        yield from _cached_stream(provider, messages, **kwargs)
+    except Exception as e:
+        yield f"❌ 聊天失败: {e}"
+
+async def achat_completion(messages: List[Dict], **kwargs) -> str:
+    """异步通用聊天补全"""
+    import asyncio
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, functools.partial(chat_completion, messages, **kwargs))
+
+async def aexplain_command(command: str, context: str = None) -> str:
+    """异步解释shell命令"""
+    import asyncio
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, explain_command, command, context)
+
+def get_max_concurrency() -> int:
+    """批量请求的默认并发数（network.max_concurrency）"""
+    return int(get_config().get('network', {}).get('max_concurrency', 8) or 8)
+
+async def aexplain_batch(commands: List[str], context: str = None, concurrency: Optional[int] = None,
+                         on_result: Optional[Callable[[int, str, str], None]] = None) -> List[str]:
+    """并发解释多条命令，结果按输入顺序返回；on_result按顺序逐条回调"""
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+    
+    concurrency = max(1, concurrency or get_max_concurrency())
+    semaphore = asyncio.Semaphore(concurrency)
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    loop = asyncio.get_running_loop()
+    
+    async def explain_one(command: str) -> str:
+        async with semaphore:
+            # 在调用方上下文的副本中执行，调用链 span 才能挂到同一个父节点下
+            call_context = contextvars.copy_context()
+            return await loop.run_in_executor(executor, call_context.run, explain_command, command, context)
+    
+    tasks = [asyncio.ensure_future(explain_one(command)) for command in commands]
+    results = []
+    try:
+        for index, (command, task) in enumerate(zip(commands, tasks)):
+            result = await task
+            results.append(result)
+            if on_result:
+                on_result(index, command, result)
+    finally:
+        for task in tasks:
+            task.cancel()
+        executor.shutdown(wait=False)
+    return results
+
+def explain_batch(commands: List[str], context: str = None, concurrency: Optional[int] = None,
+                  on_result: Optional[Callable[[int, str, str], None]] = None) -> List[str]:
+    """同步入口：并发解释多条命令"""
+    import asyncio
+    return asyncio.run(aexplain_batch(commands, context, concurrency, on_result))
+
 def test_ai_connection() -> Dict[str, Any]:
     """测试AI连接"""
     provider = get_ai_provider()
@@ -15,22 +15,40 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 try:
     from fuling.fuling_core import config, get_config
-    from fuling.fuling_ai import explain_command, chat_completion, test_ai_connection
     from fuling.fuling_theme import show_banner, format_text
+    from fuling.lazy_group import LazyGroup
 except ImportError:
     # 备用导入
     from .fuling_core import config, get_config
-    from .fuling_ai import explain_command, chat_completion, test_ai_connection
     from .fuling_theme import show_banner, format_text
+    from .lazy_group import LazyGroup
 
-@click.group(context_settings={"help_option_names": ["-h", "--help"]})
+# 独立模块中的子命令，调用时才导入：名称 -> (模块, 属性, 简短说明)
+LAZY_SUBCOMMANDS = {
+    "bench": ("fuling.bench", "bench", "性能基准测试（启动耗时等）"),
+    "daemon": ("fuling.daemon", "daemon_command", "常驻守护进程（保持灵力预热，加速 explain/generate/chat）"),
+    "perf": ("fuling.perf", "perf", "跨调用的性能统计（fl perf report --since 7d）"),
+}
+
+@click.group(cls=LazyGroup, lazy_subcommands=LAZY_SUBCOMMANDS,
+             context_settings={"help_option_names": ["-h", "--help"]})
 @click.version_option(version="0.1.0", prog_name='符灵')
-def cli():
+@click.option('--trace', 'trace_file', type=click.Path(dir_okay=False),
+              help='记录调用链并写出 Chrome/Perfetto trace JSON')
+@click.pass_context
+def cli(ctx, trace_file):
     """符灵 (Fú Líng) - 智能命令行助手
     
     古代符咒之灵，现代AI智能。
     使用AI增强你的命令行体验。
     """
+    if trace_file:
+        _start_trace(ctx, trace_file)
+    
+    # 本次调用的耗时写入 ~/.cache/fuling/metrics.ring，供 fl perf report 汇总
+    from fuling.perf import start_recording
+    start_recording(ctx)
+    
     if sys.stdin.isatty() and sys.stdout.isatty():
         # 检查是否显示横幅
         fuling_config = get_config()
@@ -40,6 +58,28 @@ def cli():
             show_banner()
             click.echo("输入 'fl --help' 查看所有命令\n")
 
+def _start_trace(ctx, trace_file):
+    """开启追踪，命令结束后写出trace文件"""
+    from fuling.tracing import span, tracer
+    
+    tracer.clear()
+    tracer.enable()
+    # 先注册的回调后执行：根 span 结束后才写文件
+    ctx.call_on_close(lambda: _write_trace(trace_file))
+    ctx.with_resource(span(f"fl {ctx.invoked_subcommand or ''}".strip(), argv=" ".join(sys.argv[1:])))
+
+def _write_trace(trace_file):
+    """写出trace文件"""
+    from fuling.tracing import tracer
+    
+    tracer.disable()
+    try:
+        tracer.write_chrome_trace(trace_file)
+    except OSError as e:
+        click.echo(format_text(f"写入trace失败: {e}", "error"), err=True)
+        return
+    click.echo(format_text(f"调用链已写入 {trace_file}（{len(tracer.spans())} 个span，可用 ui.perfetto.dev 打开）", "info"), err=True)
+
 @cli.command()
 @click.option('--theme', type=click.Choice(['ancient', 'modern', 'dark', 'light']), 
               default='ancient', help='主题风格')
@@ -65,25 +105,75 @@ def init(theme):
     click.echo(format_text("  3. 召唤灵体: fl chat", "command"))
     click.echo(format_text("  4. 查看状态: fl power", "command"))
 
+def _read_batch_commands(lines) -> list:
+    """读取批量文件：每行一条命令，合并反斜杠续行，跳过空行和注释"""
+    commands = []
+    pending = ""
+    for line in lines:
+        line = line.rstrip("\n")
+        if line.endswith("\\"):
+            pending += line[:-1].strip() + " "
+            continue
+        command = (pending + line.strip()).strip()
+        pending = ""
+        if command and not command.startswith("#"):
+            commands.append(command)
+    if pending.strip():
+        commands.append(pending.strip())
+    return commands
+
+def _explain_batch(batch_file, context, concurrency):
+    """批量解释文件中的命令，按输入顺序输出"""
+    from .fuling_ai import explain_batch
+    
+    commands = _read_batch_commands(batch_file)
+    if not commands:
+        click.echo(format_text("批量文件中没有命令", "warning"))
+        return
+    
+    click.echo(format_text(f"批量解读 {len(commands)} 条符咒...", "prompt"))
+    
+    def show(index, command, result):
+        click.echo("\n" + "=" * 50)
+        click.echo(format_text(f"[{index + 1}/{len(commands)}] {command}", "command"))
+        click.echo("=" * 50)
+        click.echo(result)
+    
+    explain_batch(commands, context, concurrency=concurrency, on_result=show)
+
 @cli.command()
-@click.argument('command')
+@click.argument('command', required=False)
 @click.option('--context', '-c', help='上下文信息')
-def explain(command, context):
+@click.option('--batch', '-b', 'batch_file', type=click.File('r', encoding='utf-8'),
+              help='批量解释文件中的命令（每行一条，- 表示标准输入）')
+@click.option('--concurrency', '-j', type=click.IntRange(min=1), default=None,
+              help='批量模式的并发数（默认 network.max_concurrency）')
+def explain(command, context, batch_file, concurrency):
     """解释shell命令（符咒解读）"""
+    if batch_file is not None:
+        _explain_batch(batch_file, context, concurrency)
+        return
+    
+    if command is None:
+        raise click.UsageError("请提供要解释的命令，或使用 --batch FILE")
+    
     click.echo(format_text(f"解读符咒: {command}", "prompt"))
     
     if context:
         click.echo(format_text(f"上下文: {context}", "info"))
     
     # 使用AI解释
+    from .fuling_ai import explain_command
+    from .tracing import span
     result = explain_command(command, context)
     
     # 输出结果
-    click.echo("\n" + "=" * 50)
-    click.echo(format_text("📜 符咒解读:", "command"))
-    click.echo("=" * 50)
-    click.echo(result)
-    click.echo("=" * 50)
+    with span("cli.render"):
+        click.echo("\n" + "=" * 50)
+        click.echo(format_text("📜 符咒解读:", "command"))
+        click.echo("=" * 50)
+        click.echo(result)
+        click.echo("=" * 50)
     
     # 提供建议
     if "未设置" in result or "未连接" in result:
@@ -94,6 +184,8 @@ def explain(command, context):
 @cli.command()
 def chat():
     """与符灵对话（召唤灵体）"""
+    from .fuling_ai import stream_chat_completion, test_ai_connection
+    
     click.echo(format_text("召唤符灵...", "prompt"))
     click.echo(format_text("(需要灵力源连接)", "warning"))
     
@@ -141,8 +233,10 @@ def chat():
             
             click.echo(format_text("符灵: ", "prompt"), nl=False)
             
-            response = chat_completion(messages)
-            click.echo(response)
+            # 逐段输出，首个token到达即可见
+            for delta in stream_chat_completion(messages):
+                click.echo(delta, nl=False)
+            click.echo()
             
         except KeyboardInterrupt:
             click.echo("\n" + format_text("符灵退散...", "info"))
@@ -158,6 +252,8 @@ def chat():
 @click.option('--template', '-t', help='符咒模板')
 def generate(specification, language, output, template):
     """生成代码（创造新符咒）"""
+    from .fuling_ai import chat_completion, stream_chat_completion
+    
     click.echo(format_text(f"创造新符咒: {specification}", "prompt"))
     click.echo(format_text(f"符文语言: {language}", "system"))
     
@@ -182,17 +278,17 @@ def generate(specification, language, output, template):
     
     click.echo(format_text("正在生成代码...", "info"))
     
-    # 获取AI生成的代码
-    code = chat_completion(messages)
-    
-    # 清理代码（移除可能的markdown）
-    if code.startswith('```'):
-        lines = code.split('\n')
-        if len(lines) >= 3:
-            code = '\n'.join(lines[1:-1])
-    
     # 输出结果
     if output:
+        # 获取AI生成的代码
+        code = chat_completion(messages)
+        
+        # 清理代码（移除可能的markdown）
+        if code.startswith('```'):
+            lines = code.split('\n')
+            if len(lines) >= 3:
+                code = '\n'.join(lines[1:-1])
+        
         try:
             with open(output, 'w', encoding='utf-8') as f:
                 f.write(code)
@@ -203,7 +299,15 @@ def generate(specification, language, output, template):
         click.echo("\n" + "=" * 50)
         click.echo(format_text(f"📜 新生符咒 ({language}):", "command"))
         click.echo("=" * 50)
-        click.echo(code)
+        
+        # 边生成边输出
+        chunks = []
+        for line in _strip_code_fences(stream_chat_completion(messages)):
+            click.echo(line, nl=False)
+            chunks.append(line)
+        code = ''.join(chunks)
+        if not code.endswith('\n'):
+            click.echo()
         click.echo("=" * 50)
         
         # 提供使用建议
@@ -212,6 +316,53 @@ def generate(specification, language, output, template):
         if language == 'python':
             click.echo(f"  直接运行: python -c \"{code[:100]}...\"")
 
+def _strip_code_fences(deltas):
+    """转发流式输出，去掉回复首尾的markdown代码围栏"""
+    fenced = None      # 回复是否以 ``` 围栏开头
+    pending = ""       # 行首暂时无法判断是否为围栏的文本
+    mid_line = False   # 当前行已确定需要输出
+    skipping = False   # 正在跳过围栏行的剩余部分
+    
+    for delta in deltas:
+        text = pending + delta
+        pending = ""
+        while text:
+            newline = text.find('\n')
+            segment = text if newline < 0 else text[:newline + 1]
+            text = "" if newline < 0 else text[newline + 1:]
+            complete = segment.endswith('\n')
+            
+            if mid_line:
+                yield segment
+                mid_line = not complete
+                continue
+            if skipping:
+                skipping = not complete
+                continue
+            
+            head = segment.strip()
+            if fenced is None:
+                if not complete and len(head) < 3:
+                    pending = segment
+                    break
+                fenced = head.startswith('```')
+                if fenced:
+                    skipping = not complete
+                    continue
+            elif fenced and '```'.startswith(head):
+                if not complete:
+                    pending = segment
+                    break
+                if head == '```':
+                    continue
+            
+            yield segment
+            mid_line = not complete
+    
+    head = pending.strip()
+    if pending and not head.startswith('```'):
+        yield pending
+
 @cli.command()
 def wisdom():
     """获取智慧（帮助和建议）"""
@@ -259,6 +410,7 @@ def power():
         click.echo("  运行: fl init")
     
     # 测试AI连接
+    from .fuling_ai import get_ai_provider, test_ai_connection
     connection_test = test_ai_connection()
     
     click.echo(f"\n{format_text('AI提供商:', 'system')} {connection_test['provider']}")
@@ -276,7 +428,34 @@ def power():
     fuling_config = get_config()
     theme_name = fuling_config.get('theme', {}).get('name', 'ancient')
     click.echo(f"{format_text('🎨 当前主题:', 'system')} {theme_name}")
-    
+
+    # 显示限流等待时间
+    from .ratelimit import current_wait
+    provider = get_ai_provider()
+    wait = current_wait(provider.provider_key, getattr(provider, 'api_key', None), getattr(provider, 'base_url', None))
+    click.echo(f"{format_text('⏳ 限流等待:', 'system')} {wait:.1f} 秒")
+
+    # 显示故障转移链的熔断状态
+    circuit_states = getattr(provider, 'circuit_states', None)
+    if circuit_states:
+        labels = {"closed": "✅ 正常", "open": "⛔ 熔断", "half_open": "🔄 探测中"}
+        click.echo(format_text('🔗 故障转移链:', 'system'))
+        for name, _ in provider.members:
+            state = circuit_states().get(name)
+            click.echo(f"  {name}: {labels.get(state, '✅ 正常') if state else '💡 本地'}")
+
+    # 显示响应缓存信息
+    from .cache import get_response_cache
+    cache = get_response_cache()
+    if cache is None:
+        click.echo(f"{format_text('📦 响应缓存:', 'system')} 已关闭")
+    else:
+        stats = cache.stats()
+        click.echo(
+            f"{format_text('📦 响应缓存:', 'system')} {stats['entries']} 条, "
+            f"{stats['bytes'] / 1024:.1f} KB"
+        )
+
     click.echo("\n" + format_text("🎯 建议:", "info"))
     click.echo("  运行 'fl wisdom' 获取更多智慧")
     if "未连接" in connection_test['connected']:
@@ -3,7 +3,8 @@
 """
 
 import os
-import yaml
+import json
+import tempfile
 from pathlib import Path
 from typing import Dict, Any, Optional
 
@@ -25,7 +26,10 @@ class FulingConfig:
             return self.get_default_config()
         
         try:
-            with open(self.config_file, 'r', encoding='utf-8') as f:
+            import yaml
+            from .tracing import span
+            with span("config.load", path=str(self.config_file)), \
+                    open(self.config_file, 'r', encoding='utf-8') as f:
                 self._config = yaml.safe_load(f) or {}
         except Exception as e:
             print(f"⚠️ 读取配置失败: {e}")
@@ -38,6 +42,7 @@ class FulingConfig:
         self.config_dir.mkdir(parents=True, exist_ok=True)
         
         try:
+            import yaml
             with open(self.config_file, 'w', encoding='utf-8') as f:
                 yaml.dump(config, f, default_flow_style=False, allow_unicode=True)
             self._config = config
@@ -64,6 +69,45 @@ class FulingConfig:
                 "timeout": 30,
                 "retry_attempts": 3,
                 "retry_delay": 2,
+                "retry_max_delay": 30,  # 单次重试等待上限（秒）
+                "retry_deadline": 60,  # 包括重试在内的总时长上限（秒）
+                "retry_idempotent": False,  # 默认只重试未送达的请求；服务端幂等时才重试读超时和5xx
+                "health_ttl": 300,  # 健康检查结果缓存时间（秒）
+                "failover": [],  # 故障转移链，如 ["deepseek", "moonshot", "ollama", "local"]
+            },
+            "providers": {
+                # 故障转移链中各提供商的配置，未列出的项沿用 model 段
+                "deepseek": {
+                    "api_key": "${DEEPSEEK_API_KEY}",
+                    "base_url": "https://api.deepseek.com/v1",
+                    "model": "deepseek-chat",
+                },
+                "ollama": {
+                    "base_url": "http://localhost:11434",
+                    "model": "llama3",
+                },
+            },
+            "hedge": {
+                "enabled": False,  # 对冲请求：主提供商慢时并行请求备用提供商
+                "alternate": "",  # 备用提供商（默认为故障转移链中的下一个）
+                "percentile": 90,  # 以主提供商该分位的延迟作为等待时间
+                "delay": 2.0,  # 样本不足时的等待时间（秒）
+                "min_delay": 0.2,  # 等待时间下限（秒）
+                "min_samples": 20,  # 使用观测分位数所需的最少样本数
+            },
+            "circuit_breaker": {
+                "failure_threshold": 3,  # 连续失败多少次后熔断
+                "reset_timeout": 60,  # 熔断多久后开始后台探测（秒）
+            },
+            "bench": {
+                "runs": 5,  # fl bench startup 每条命令的热启动测量次数
+                "startup_threshold": 0.2,  # 热启动耗时比基线慢超过该比例视为退化
+                "min_regression_ms": 5,  # 小于该差值（毫秒）的波动不算退化
+            },
+            "perf": {
+                "enabled": True,  # 每次调用的耗时写入缓存目录下的环形文件（fl perf report）
+                "slots": 2048,  # 保留最近多少次调用
+                "slot_size": 4096,  # 单次调用记录的最大字节数
             },
             "features": {
                 "auto_suggest": True,
@@ -98,6 +142,22 @@ class FulingConfig:
                     "network": "🌐",
                 }
             },
+            "network": {
+                "pool_connections": 4,  # 每个base_url的连接池数量
+                "pool_maxsize": 10,  # 单个连接池最大连接数
+                "keep_alive": True,  # 复用TCP/TLS连接
+                "max_concurrency": 8,  # 批量请求的最大并发数
+            },
+            "rate_limit": {
+                "enabled": True,  # 多个fl进程共享的客户端限流，只作用于远程提供商（本机/回环地址不限流）
+                "requests_per_minute": 60,  # 每个提供商+密钥的平均请求速率
+                "burst": 10,  # 允许的突发请求数
+            },
+            "cache": {
+                "ttl": 604800,  # 响应缓存有效期（秒）
+                "max_entries": 5000,  # 最多缓存条目数
+                "max_bytes": 52428800,  # 缓存总大小上限（字节）
+            },
             "paths": {
                 "config_dir": "~/.config/fuling",
                 "cache_dir": "~/.cache/fuling",
@@ -112,12 +172,26 @@ class FulingConfig:
         model_config = config.get("model", {})
         
         # 替换环境变量
-        api_key = model_config.get("api_key", "")
-        if api_key.startswith("${") and api_key.endswith("}"):
-            env_var = api_key[2:-1]
-            model_config["api_key"] = os.environ.get(env_var, "")
+        model_config["api_key"] = expand_env(model_config.get("api_key", ""))
         
         return model_config
+    
+    def get_providers_config(self) -> Dict[str, Dict[str, Any]]:
+        """获取各提供商的单独配置（providers 段，供故障转移链使用）"""
+        providers = self.load_config().get("providers", {}) or {}
+        result = {}
+        for name, settings in providers.items():
+            settings = dict(settings or {})
+            if "api_key" in settings:
+                settings["api_key"] = expand_env(settings["api_key"])
+            result[name] = settings
+        return result
+
+def expand_env(value: Any) -> Any:
+    """把 ${VAR} 形式的配置值替换为环境变量"""
+    if isinstance(value, str) and value.startswith("${") and value.endswith("}"):
+        return os.environ.get(value[2:-1], "")
+    return value
 
 # 全局配置实例
 config = FulingConfig()
@@ -128,4 +202,32 @@ def get_config() -> Dict[str, Any]:
 
 def get_model_config() -> Dict[str, Any]:
     """获取模型配置"""
-    return config.get_model_config()
\ No newline at end of file
+    return config.get_model_config()
+
+def get_providers_config() -> Dict[str, Dict[str, Any]]:
+    """获取各提供商的单独配置"""
+    return config.get_providers_config()
+
+def get_cache_dir() -> Path:
+    """获取缓存目录（paths.cache_dir），不存在时创建"""
+    cache_dir = get_config().get("paths", {}).get("cache_dir", "~/.cache/fuling")
+    path = Path(os.path.expanduser(cache_dir))
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+def write_json_atomic(path: Path, data: Any) -> None:
+    """原子写入JSON文件（先写临时文件再替换，多进程安全）"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    
+    fd, tmp_path = tempfile.mkstemp(dir=str(path.parent), prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except Exception:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
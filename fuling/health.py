@@ -0,0 +1,70 @@
+"""
+提供商健康检查缓存 - 结果按TTL保存在 ~/.cache/fuling/health.json
+"""
+
+import hashlib
+import json
+import time
+from typing import Dict, Any, Optional
+
+from .fuling_core import get_cache_dir, write_json_atomic
+
+HEALTH_FILE = "health.json"
+DEFAULT_HEALTH_TTL = 300
+
+
+def health_key(provider_name: str, base_url: str, api_key: str) -> str:
+    """生成健康检查缓存键（不保存明文密钥）"""
+    key_hash = hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:12]
+    return f"{provider_name}|{base_url}|{key_hash}"
+
+
+def _load() -> Dict[str, Any]:
+    """读取健康检查缓存"""
+    try:
+        with open(get_cache_dir() / HEALTH_FILE, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except Exception:
+        return {}
+
+
+def get_cached_health(key: str, ttl: float = DEFAULT_HEALTH_TTL) -> Optional[bool]:
+    """读取未过期的健康检查结果，没有则返回None"""
+    entry = _load().get(key)
+    if not entry:
+        return None
+    if time.time() - entry.get("checked_at", 0) > ttl:
+        return None
+    return bool(entry.get("ok"))
+
+
+def set_cached_health(key: str, ok: bool, ttl: float = DEFAULT_HEALTH_TTL) -> None:
+    """保存健康检查结果，同时删除已过期的条目（换过地址或密钥的旧键不会再被读取）"""
+    try:
+        now = time.time()
+        data = {k: entry for k, entry in _load().items()
+                if isinstance(entry, dict) and now - entry.get("checked_at", 0) <= ttl}
+        data[key] = {"ok": ok, "checked_at": now}
+        write_json_atomic(get_cache_dir() / HEALTH_FILE, data)
+    except Exception:
+        pass  # 缓存失败不影响主要功能
+
+
+def check_health(provider, ttl: float = DEFAULT_HEALTH_TTL) -> bool:
+    """检查提供商健康状态，优先使用缓存结果"""
+    base_url = getattr(provider, 'base_url', None)
+    api_key = getattr(provider, 'api_key', None)
+
+    # 本地提供商或未配置密钥时无需联网，也无需缓存
+    if not base_url or not api_key:
+        return provider.health_check()
+
+    key = health_key(provider.__class__.__name__, base_url, api_key)
+    cached = get_cached_health(key, ttl)
+    if cached is not None:
+        return cached
+
+    ok = provider.health_check()
+    set_cached_health(key, ok, ttl)
+    return ok
@@ -0,0 +1,127 @@
+"""
+符灵对冲请求 - 主提供商迟迟未返回时，向备用提供商再发一份请求，先成功者胜出
+"""
+
+import contextvars
+import queue
+import threading
+from typing import Dict, Any, Callable, Optional, Tuple
+
+PRIMARY = "primary"
+HEDGE = "hedge"
+
+DEFAULT_HEDGE_CONFIG = {
+    "enabled": False,    # 对冲会增加请求量，默认关闭
+    "alternate": "",     # 未配置 model.failover 时使用的备用提供商
+    "percentile": 90,    # 以主提供商该分位的延迟作为对冲等待时间
+    "delay": 2.0,        # 样本不足时的对冲等待时间（秒）
+    "min_delay": 0.2,    # 对冲等待时间下限（秒）
+    "min_samples": 20,   # 使用观测分位数所需的最少样本数
+}
+
+
+class HedgeStats:
+    """对冲请求统计"""
+
+    def __init__(self):
+        self.calls = 0          # 走对冲逻辑的请求数
+        self.hedged = 0         # 实际发出备用请求的次数
+        self.primary_wins = 0
+        self.hedge_wins = 0
+        self._lock = threading.Lock()
+
+    def record(self, hedged: bool, winner: Optional[str]) -> None:
+        """记录一次对冲请求的结果"""
+        with self._lock:
+            self.calls += 1
+            if hedged:
+                self.hedged += 1
+            if winner == PRIMARY:
+                self.primary_wins += 1
+            elif winner == HEDGE:
+                self.hedge_wins += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """导出统计"""
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "hedged": self.hedged,
+                "primary_wins": self.primary_wins,
+                "hedge_wins": self.hedge_wins,
+                "hedge_win_rate": self.hedge_wins / self.hedged if self.hedged else 0.0,
+            }
+
+    def reset(self) -> None:
+        """清空统计"""
+        with self._lock:
+            self.calls = self.hedged = self.primary_wins = self.hedge_wins = 0
+
+
+hedge_stats = HedgeStats()
+
+
+def hedge_delay(base_url: Optional[str], options: Dict[str, Any]) -> float:
+    """根据主提供商的观测延迟计算对冲等待时间"""
+    from .transport import get_transport
+
+    delay = float(options.get("delay", DEFAULT_HEDGE_CONFIG["delay"]))
+    if base_url:
+        stats = get_transport().metrics.get(base_url.rstrip('/'))
+        if stats.count >= options.get("min_samples", DEFAULT_HEDGE_CONFIG["min_samples"]):
+            delay = stats.percentile(options.get("percentile", DEFAULT_HEDGE_CONFIG["percentile"]))
+    return max(float(options.get("min_delay", DEFAULT_HEDGE_CONFIG["min_delay"])), delay)
+
+
+def _spawn(who: str, func: Callable[[], str], results: "queue.Queue") -> None:
+    """在守护线程中执行请求，结果放入队列（落后的请求不会阻塞进程退出）"""
+    def run():
+        try:
+            results.put((who, func(), None))
+        except Exception as e:
+            results.put((who, None, e))
+
+    # 复制调用方上下文，使请求内的 span 挂在发起对冲的 span 之下
+    call_context = contextvars.copy_context()
+    threading.Thread(target=call_context.run, args=(run,), name=f"fuling-hedge-{who}", daemon=True).start()
+
+
+def hedged_call(primary: Callable[[], str], alternate: Callable[[], str], delay: float,
+                is_error: Callable[[str], bool], stats: HedgeStats = hedge_stats) -> Tuple[str, Optional[str], bool]:
+    """执行对冲请求，返回 (结果, 胜出方, 是否发出了备用请求)
+
+    主请求在 delay 内完成（无论成败）时不发备用请求；否则两路并行，
+    第一个非错误结果胜出，落后的一方不再等待，其结果被丢弃。
+    两路都失败时返回主请求的错误。
+    """
+    results: "queue.Queue" = queue.Queue()
+    _spawn(PRIMARY, primary, results)
+    try:
+        _, result, error = results.get(timeout=delay)
+    except queue.Empty:
+        pass
+    else:
+        if error is not None:
+            raise error
+        stats.record(False, None if is_error(result) else PRIMARY)
+        return result, PRIMARY, False
+
+    _spawn(HEDGE, alternate, results)
+    failures: Dict[str, Any] = {}
+    for _ in range(2):
+        who, result, error = results.get()
+        if error is None and not is_error(result):
+            stats.record(True, who)
+            return result, who, True
+        failures[who] = error if error is not None else result
+
+    stats.record(True, None)
+    failure = failures[PRIMARY]
+    if isinstance(failure, BaseException):
+        raise failure
+    return failure, None, True
+
+
+def get_hedge_stats() -> Dict[str, Any]:
+    """获取对冲请求统计"""
+    return hedge_stats.snapshot()
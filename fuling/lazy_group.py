@@ -0,0 +1,52 @@
+"""
+符灵延迟加载命令组 - 子命令所在模块在被调用时才导入
+"""
+
+import importlib
+from typing import Dict, List, Optional, Tuple
+
+import click
+
+
+class LazyGroup(click.Group):
+    """按需导入子命令的 click 命令组
+
+    lazy_subcommands 形如 {"daemon": ("fuling.daemon", "daemon_command", "简短说明")}，
+    `fl --help` 直接使用登记的简短说明，不导入子命令模块。
+    """
+
+    def __init__(self, *args, lazy_subcommands: Optional[Dict[str, Tuple[str, str, str]]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lazy_subcommands = dict(lazy_subcommands or {})
+
+    def list_commands(self, ctx: click.Context) -> List[str]:
+        return sorted(set(super().list_commands(ctx)) | set(self.lazy_subcommands))
+
+    def get_command(self, ctx: click.Context, cmd_name: str) -> Optional[click.Command]:
+        command = super().get_command(ctx, cmd_name)
+        if command is None and cmd_name in self.lazy_subcommands:
+            command = self._load(cmd_name)
+        return command
+
+    def _load(self, cmd_name: str) -> click.Command:
+        module_name, attr, _ = self.lazy_subcommands[cmd_name]
+        command = getattr(importlib.import_module(module_name), attr)
+        if not isinstance(command, click.Command):
+            raise TypeError(f"{module_name}.{attr} 不是 click 命令")
+        self.add_command(command, cmd_name)
+        return command
+
+    def format_commands(self, ctx: click.Context, formatter: click.HelpFormatter) -> None:
+        rows = []
+        for name in self.list_commands(ctx):
+            command = self.commands.get(name)
+            if command is not None:
+                if command.hidden:
+                    continue
+                help_text = command.get_short_help_str(formatter.width - 6 - len(name))
+            else:
+                help_text = self.lazy_subcommands[name][2]
+            rows.append((name, help_text))
+        if rows:
+            with formatter.section("Commands"):
+                formatter.write_dl(rows)
@@ -0,0 +1,296 @@
+"""
+符灵内存缓存 - 有界、线程安全的 LRU + TTL 缓存（分段加锁，可选磁盘二级缓存）
+"""
+
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, Callable, Hashable, Optional, Tuple
+
+_MISSING = object()
+
+
+def estimate_size(value: Any) -> int:
+    """估算对象占用的字节数（容器按一层元素累加）"""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(sys.getsizeof(item) for item in value)
+    return size
+
+
+class _Shard:
+    """一个分段：独立的锁和 LRU 顺序"""
+
+    __slots__ = ("lock", "entries", "bytes", "max_entries", "max_bytes", "last_sweep",
+                 "hits", "misses", "evictions", "expirations")
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.lock = threading.Lock()
+        # key -> (value, 过期时间, 字节数)，越靠后越近被访问
+        self.entries: "OrderedDict[Hashable, Tuple[Any, float, int]]" = OrderedDict()
+        self.bytes = 0
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.last_sweep = time.monotonic()
+        self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def pop(self, key: Hashable) -> None:
+        _, _, size = self.entries.pop(key)
+        self.bytes -= size
+
+    def sweep(self, now: float) -> None:
+        """删除所有已过期条目"""
+        expired = [key for key, (_, expires, _) in self.entries.items() if expires <= now]
+        for key in expired:
+            self.pop(key)
+        self.expirations += len(expired)
+        self.last_sweep = now
+
+    def shrink(self) -> None:
+        """超过容量时从最久未访问的一端淘汰"""
+        while self.entries and (len(self.entries) > self.max_entries or self.bytes > self.max_bytes):
+            _, (_, _, size) = self.entries.popitem(last=False)
+            self.bytes -= size
+            self.evictions += 1
+
+
+class DiskTier:
+    """磁盘二级缓存：每个条目一个JSON文件
+
+    值须可JSON序列化（否则只缓存在内存中），读回后元组会变为列表。
+    """
+
+    def __init__(self, directory: Path, ttl: float, max_entries: int = 1000):
+        self.directory = Path(directory)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self._writes = 0
+
+    @staticmethod
+    def digest(key: Hashable) -> str:
+        raw = json.dumps(key, sort_keys=True, ensure_ascii=False, default=repr)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key: Hashable) -> Path:
+        return self.directory / f"{self.digest(key)}.json"
+
+    def get(self, key: Hashable) -> Any:
+        """读取条目，返回 (值, 剩余有效秒数)；未命中或过期返回 _MISSING"""
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return _MISSING
+        remaining = entry.get("expires_at", 0) - time.time()
+        if remaining <= 0:
+            _unlink(path)
+            return _MISSING
+        self.hits += 1
+        return entry.get("value"), remaining
+
+    def put(self, key: Hashable, value: Any, ttl: float) -> None:
+        """写入条目（原子替换），写失败或值不可序列化时忽略"""
+        from .fuling_core import write_json_atomic
+
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            write_json_atomic(self._path(key), {"expires_at": time.time() + ttl, "value": value})
+        except (OSError, TypeError, ValueError):
+            return
+        self._writes += 1
+        # 每写入一定次数检查一次上限，避免每次写都扫描目录
+        if self._writes % 32 == 0:
+            self.evict()
+
+    def evict(self) -> None:
+        """删除过期条目，并按修改时间淘汰超出上限的条目"""
+        now = time.time()
+        entries = []
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if entry.name.endswith(".json"):
+                        try:
+                            entries.append((entry.stat().st_mtime, entry.path))
+                        except OSError:
+                            continue
+        except OSError:
+            return
+        entries.sort()
+        excess = len(entries) - self.max_entries
+        for index, (mtime, path) in enumerate(entries):
+            if index < excess or now - mtime > self.ttl:
+                _unlink(path)
+
+    def delete(self, key: Hashable) -> None:
+        _unlink(self._path(key))
+
+    def clear(self) -> None:
+        """清空磁盘缓存"""
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if entry.name.endswith(".json"):
+                        _unlink(entry.path)
+        except OSError:
+            pass
+
+
+def _unlink(path) -> None:
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+class LRUCache:
+    """有界的 LRU + TTL 缓存
+
+    条目按键的哈希分到多个分段，每段一把锁，并发访问不同分段时互不阻塞；
+    LRU 淘汰在分段内进行（全局近似 LRU），条目数和字节数上限按分段均分。
+    过期条目在读取时惰性删除，写入时每隔 sweep_interval 秒整段清理一次。
+    指定 disk_dir 时，内存未命中会再查磁盘，写入也会同步落盘。
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024,
+                 ttl: Optional[float] = None, shards: int = 16,
+                 sizeof: Callable[[Any], int] = estimate_size,
+                 sweep_interval: Optional[float] = None,
+                 disk_dir: Optional[Path] = None, disk_max_entries: int = 1000):
+        if max_entries < 1 or max_bytes < 1:
+            raise ValueError("max_entries 和 max_bytes 必须为正数")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.sizeof = sizeof
+        self.sweep_interval = sweep_interval if sweep_interval is not None else min(ttl or 60.0, 60.0)
+        count = max(1, min(shards, max_entries))
+        self._shards = [
+            _Shard(-(-max_entries // count), -(-max_bytes // count))
+            for _ in range(count)
+        ]
+        self.disk = DiskTier(disk_dir, ttl or 365 * 24 * 3600, disk_max_entries) if disk_dir else None
+
+    def _shard(self, key: Hashable) -> _Shard:
+        return self._shards[hash(key) % len(self._shards)]
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """读取缓存，未命中或已过期返回 default"""
+        shard = self._shard(key)
+        now = time.monotonic()
+        with shard.lock:
+            entry = shard.entries.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    shard.entries.move_to_end(key)
+                    shard.hits += 1
+                    return entry[0]
+                shard.pop(key)
+                shard.expirations += 1
+            shard.misses += 1
+
+        if self.disk is not None:
+            found = self.disk.get(key)
+            if found is not _MISSING:
+                value, remaining = found
+                self._store(key, value, remaining)
+                return value
+        return default
+
+    def put(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """写入缓存，必要时淘汰最久未访问的条目"""
+        ttl = self.ttl if ttl is None else ttl
+        self._store(key, value, ttl)
+        if self.disk is not None:
+            self.disk.put(key, value, ttl if ttl is not None else self.disk.ttl)
+
+    def _store(self, key: Hashable, value: Any, ttl: Optional[float]) -> None:
+        shard = self._shard(key)
+        size = self.sizeof(value)
+        now = time.monotonic()
+        expires = now + ttl if ttl is not None else float("inf")
+        with shard.lock:
+            if key in shard.entries:
+                shard.pop(key)
+            if size > shard.max_bytes:
+                return  # 单个值超过分段容量，不缓存
+            shard.entries[key] = (value, expires, size)
+            shard.bytes += size
+            if now - shard.last_sweep >= self.sweep_interval:
+                shard.sweep(now)
+            shard.shrink()
+
+    def delete(self, key: Hashable) -> None:
+        """删除条目"""
+        shard = self._shard(key)
+        with shard.lock:
+            if key in shard.entries:
+                shard.pop(key)
+        if self.disk is not None:
+            self.disk.delete(key)
+
+    def expire(self) -> None:
+        """立即清理所有分段中的过期条目"""
+        now = time.monotonic()
+        for shard in self._shards:
+            with shard.lock:
+                shard.sweep(now)
+
+    def clear(self) -> None:
+        """清空缓存（统计保留）"""
+        for shard in self._shards:
+            with shard.lock:
+                shard.entries.clear()
+                shard.bytes = 0
+        if self.disk is not None:
+            self.disk.clear()
+
+    def __len__(self) -> int:
+        return sum(len(shard.entries) for shard in self._shards)
+
+    def __contains__(self, key: Hashable) -> bool:
+        shard = self._shard(key)
+        with shard.lock:
+            entry = shard.entries.get(key)
+            return entry is not None and entry[1] > time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        """命中、淘汰和占用统计"""
+        totals = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "entries": 0, "bytes": 0}
+        for shard in self._shards:
+            with shard.lock:
+                totals["hits"] += shard.hits
+                totals["misses"] += shard.misses
+                totals["evictions"] += shard.evictions
+                totals["expirations"] += shard.expirations
+                totals["entries"] += len(shard.entries)
+                totals["bytes"] += shard.bytes
+        if self.disk is not None:
+            # 内存未命中而磁盘命中的次数
+            totals["disk_hits"] = self.disk.hits
+        lookups = totals["hits"] + totals["misses"]
+        totals["hit_rate"] = totals["hits"] / lookups if lookups else 0.0
+        return totals
+
+
+def make_key(args: tuple, kwargs: Dict[str, Any]) -> Hashable:
+    """由调用参数生成缓存键；参数不可哈希时退化为其规范JSON表示"""
+    key = (args, tuple(sorted(kwargs.items()))) if kwargs else args
+    try:
+        hash(key)
+        return key
+    except TypeError:
+        pass
+    try:
+        return json.dumps([args, kwargs], sort_keys=True, ensure_ascii=False, default=repr)
+    except (TypeError, ValueError):
+        return repr((args, sorted(kwargs.items())))
@@ -0,0 +1,242 @@
+"""
+符灵指标模块 - 请求延迟统计
+"""
+
+import math
+import threading
+from collections import deque
+from typing import Dict, Any, List
+
+
+class LatencyStats:
+    """单个指标的延迟统计（固定窗口保留最近样本用于分位数）"""
+
+    def __init__(self, window: int = 512):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.last = 0.0
+        self._recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float, ok: bool = True):
+        """记录一次请求耗时"""
+        with self._lock:
+            self.count += 1
+            if not ok:
+                self.errors += 1
+            self.total += seconds
+            self.last = seconds
+            self.min = seconds if self.min is None else min(self.min, seconds)
+            self.max = seconds if self.max is None else max(self.max, seconds)
+            self._recent.append(seconds)
+
+    def percentile(self, q: float) -> float:
+        """计算最近样本的分位数 (q: 0-100)"""
+        with self._lock:
+            values = sorted(self._recent)
+        return percentile(values, q)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """导出统计快照"""
+        with self._lock:
+            count = self.count
+            result = {
+                'count': count,
+                'errors': self.errors,
+                'total': self.total,
+                'mean': self.total / count if count else 0.0,
+                'min': self.min or 0.0,
+                'max': self.max or 0.0,
+                'last': self.last,
+            }
+        result['p50'] = self.percentile(50)
+        result['p90'] = self.percentile(90)
+        result['p99'] = self.percentile(99)
+        return result
+
+
+class LatencyRegistry:
+    """按名称管理多个延迟统计"""
+
+    def __init__(self):
+        self._stats: Dict[str, LatencyStats] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> LatencyStats:
+        """获取（或创建）指定名称的统计"""
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = LatencyStats()
+                self._stats[name] = stats
+            return stats
+
+    def record(self, name: str, seconds: float, ok: bool = True):
+        """记录一次耗时"""
+        self.get(name).record(seconds, ok)
+
+    def names(self) -> List[str]:
+        """所有指标名称"""
+        with self._lock:
+            return list(self._stats)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """导出所有指标快照"""
+        return {name: self.get(name).snapshot() for name in self.names()}
+
+    def reset(self):
+        """清空所有指标"""
+        with self._lock:
+            self._stats.clear()
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """对已排序序列做线性插值分位数"""
+    if not sorted_values:
+        return 0.0
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+
+    rank = (len(sorted_values) - 1) * q / 100.0
+    low = int(rank)
+    high = min(low + 1, len(sorted_values) - 1)
+    fraction = rank - low
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * fraction
+
+
+class LogHistogram:
+    """固定内存的对数桶直方图（相对误差有界，可合并）
+
+    桶 i 覆盖 (gamma^(i-1), gamma^i]，gamma = (1+a)/(1-a)，a 为相对误差。
+    记录为 O(1)；桶数只取决于数值跨度（1e-6 到 1e3 且 a=1% 时约 1000 个），与样本数无关，
+    超过 max_buckets 时合并最小的桶（只影响最低分位的精度）。
+    count/total/min/max/last 精确保存，分位数误差不超过 a。
+    """
+
+    MIN_VALUE = 1e-9  # 绝对值小于它的样本计入零桶
+
+    def __init__(self, relative_accuracy: float = 0.01, max_buckets: int = 2048):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy 必须在 (0, 1) 之间")
+        self.relative_accuracy = relative_accuracy
+        self.max_buckets = max_buckets
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.positive: Dict[int, int] = {}
+        self.negative: Dict[int, int] = {}
+        self.zero = 0
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.last = 0.0
+
+    def _index(self, magnitude: float) -> int:
+        return math.ceil(math.log(magnitude) / self._log_gamma)
+
+    def _value(self, index: int) -> float:
+        """桶的代表值（使相对误差最小）"""
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def record(self, value: float) -> None:
+        """记录一个样本"""
+        if value > self.MIN_VALUE:
+            self._add(self.positive, self._index(value), 1)
+        elif value < -self.MIN_VALUE:
+            self._add(self.negative, self._index(-value), 1)
+        else:
+            self.zero += 1
+        self.count += 1
+        self.total += value
+        self.last = value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def _add(self, store: Dict[int, int], index: int, count: int) -> None:
+        store[index] = store.get(index, 0) + count
+        if len(self.positive) + len(self.negative) > self.max_buckets and len(store) > 1:
+            # 把最接近零的桶并入相邻的桶
+            moved = store.pop(min(store))
+            store[min(store)] += moved
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, q: float) -> float:
+        """分位数 (q: 0-100)，结果限制在 [min, max] 内"""
+        if not self.count:
+            return 0.0
+        rank = q / 100.0 * (self.count - 1)
+        seen = 0
+        for index in sorted(self.negative, reverse=True):
+            seen += self.negative[index]
+            if seen > rank:
+                return self._clamp(-self._value(index))
+        seen += self.zero
+        if seen > rank:
+            return self._clamp(0.0)
+        for index in sorted(self.positive):
+            seen += self.positive[index]
+            if seen > rank:
+                return self._clamp(self._value(index))
+        return self.max
+
+    def _clamp(self, value: float) -> float:
+        return min(max(value, self.min), self.max)
+
+    def merge(self, other: "LogHistogram") -> None:
+        """合并另一个直方图（相对误差须一致）"""
+        if other.gamma != self.gamma:
+            raise ValueError("只能合并相对误差相同的直方图")
+        for mine, theirs in ((self.positive, other.positive), (self.negative, other.negative)):
+            for index, count in theirs.items():
+                self._add(mine, index, count)
+        self.zero += other.zero
+        if other.count:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+            self.last = other.last
+        self.count += other.count
+        self.total += other.total
+
+    def copy(self) -> "LogHistogram":
+        """复制一份快照"""
+        clone = LogHistogram(self.relative_accuracy, self.max_buckets)
+        clone.merge(self)
+        return clone
+
+    def to_dict(self) -> Dict[str, Any]:
+        """导出为可JSON序列化的字典"""
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "max_buckets": self.max_buckets,
+            "positive": {str(k): v for k, v in self.positive.items()},
+            "negative": {str(k): v for k, v in self.negative.items()},
+            "zero": self.zero,
+            "count": self.count,
+            "total": self.total,
+            "min": self.min,
+            "max": self.max,
+            "last": self.last,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "LogHistogram":
+        """从 to_dict() 的结果恢复"""
+        histogram = cls(data.get("relative_accuracy", 0.01), data.get("max_buckets", 2048))
+        histogram.positive = {int(k): v for k, v in data.get("positive", {}).items()}
+        histogram.negative = {int(k): v for k, v in data.get("negative", {}).items()}
+        histogram.zero = data.get("zero", 0)
+        histogram.count = data.get("count", 0)
+        histogram.total = data.get("total", 0.0)
+        histogram.min = data.get("min")
+        histogram.max = data.get("max")
+        histogram.last = data.get("last", 0.0)
+        return histogram
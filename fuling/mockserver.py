@@ -0,0 +1,376 @@
+"""
+符灵模拟提供商服务器 - 离线基准测试用的 OpenAI / Ollama 兼容服务
+
+    python -m fuling.mockserver --port 8765 --latency lognormal:0.3,0.5 --error-429 0.05 --tokens-per-second 50
+
+支持的接口:
+  POST /v1/chat/completions   OpenAI兼容（含 SSE 流式）
+  GET  /v1/models             模型列表（健康检查）
+  POST /api/chat              Ollama（含 NDJSON 流式）
+  GET  /api/tags              Ollama 模型列表
+  GET  /stats                 模拟服务器自身的请求统计
+"""
+
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, Callable, List, Optional
+
+import click
+
+DEFAULT_MODEL = "fuling-mock"
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """解析延迟分布，返回采样函数（秒）
+
+    fixed:0.2 | uniform:0.1,0.5 | normal:均值,标准差 | lognormal:中位数,sigma | exp:均值 | pareto:下限,alpha
+    只写数字等同于 fixed。
+    """
+    name, _, args = spec.partition(":")
+    if not args:
+        name, args = "fixed", name
+    try:
+        values = [float(v) for v in args.split(",")]
+    except ValueError:
+        raise ValueError(f"无效的延迟分布: {spec}")
+
+    samplers = {
+        ("fixed", 1): lambda rng: values[0],
+        ("uniform", 2): lambda rng: rng.uniform(values[0], values[1]),
+        ("normal", 2): lambda rng: max(0.0, rng.gauss(values[0], values[1])),
+        ("lognormal", 2): lambda rng: rng.lognormvariate(math.log(values[0]), values[1]) if values[0] > 0 else 0.0,
+        ("exp", 1): lambda rng: rng.expovariate(1 / values[0]) if values[0] > 0 else 0.0,
+        ("pareto", 2): lambda rng: values[0] * rng.paretovariate(values[1]),
+    }
+    sampler = samplers.get((name, len(values)))
+    if sampler is None or any(v < 0 for v in values):
+        raise ValueError(f"无效的延迟分布: {spec}")
+    return sampler
+
+
+_CJK = "\u3000-\u303f\u4e00-\u9fff\uff00-\uffef"
+_TOKEN_PATTERN = re.compile(rf"[{_CJK}]|\s*[^\s{_CJK}]+|\s+$")
+
+
+def tokenize(text: str) -> List[str]:
+    """把回复切成近似的token：每个汉字一个，其余按单词（保留前导空白）"""
+    return _TOKEN_PATTERN.findall(text)
+
+
+class MockOptions:
+    """模拟服务器的行为配置"""
+
+    def __init__(self, latency: str = "fixed:0", error_429: float = 0.0, error_500: float = 0.0,
+                 timeout_rate: float = 0.0, timeout_seconds: float = 60.0, retry_after: Optional[float] = 1.0,
+                 tokens_per_second: float = 0.0, reply: Optional[str] = None, reply_tokens: int = 0,
+                 model: str = DEFAULT_MODEL, seed: Optional[int] = None):
+        self.latency_spec = latency
+        self.latency = parse_latency(latency)
+        self.error_429 = error_429
+        self.error_500 = error_500
+        self.timeout_rate = timeout_rate
+        self.timeout_seconds = timeout_seconds
+        self.retry_after = retry_after
+        self.tokens_per_second = tokens_per_second
+        self.reply = reply
+        self.reply_tokens = reply_tokens
+        self.model = model
+        self.random = random.Random(seed)
+        self._random_lock = threading.Lock()
+
+    def draw(self) -> Dict[str, Any]:
+        """为一个请求抽取延迟和故障（线程安全）"""
+        with self._random_lock:
+            roll = self.random.random()
+            latency = self.latency(self.random)
+        if roll < self.timeout_rate:
+            fault = "timeout"
+        elif roll < self.timeout_rate + self.error_429:
+            fault = 429
+        elif roll < self.timeout_rate + self.error_429 + self.error_500:
+            fault = 500
+        else:
+            fault = None
+        return {"latency": latency, "fault": fault}
+
+    def make_reply(self, messages: List[Dict[str, Any]]) -> List[str]:
+        """生成回复token序列"""
+        if self.reply is not None:
+            text = self.reply
+        else:
+            last = next((str(m.get("content", "")) for m in reversed(messages) if m.get("role") == "user"), "")
+            text = f"符灵模拟回复：{last}"
+        tokens = tokenize(text)
+        if self.reply_tokens:
+            filler = tokens or ["符"]
+            tokens = [filler[i % len(filler)] for i in range(self.reply_tokens)]
+        return tokens
+
+
+class MockStats:
+    """请求计数"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts: Dict[str, int] = {}
+
+    def add(self, name: str) -> None:
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.counts)
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    """处理一个模拟请求"""
+
+    protocol_version = "HTTP/1.1"  # 支持keep-alive，便于测量连接池
+    disable_nagle_algorithm = True  # 响应头和正文分开写入，避免与延迟确认叠加出40ms停顿
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    # 响应辅助
+
+    def _send_json(self, status: int, body: Any, headers: Optional[Dict[str, str]] = None) -> None:
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _start_chunked(self, content_type: str) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+    def _write_chunk(self, text: str) -> None:
+        data = text.encode("utf-8")
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _end_chunked(self) -> None:
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _read_body(self) -> Dict[str, Any]:
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        try:
+            return json.loads(raw or b"{}")
+        except ValueError:
+            return {}
+
+    def _token_delay(self) -> float:
+        tps = self.server.options.tokens_per_second
+        return 1.0 / tps if tps > 0 else 0.0
+
+    def _inject(self, draw: Dict[str, Any]) -> bool:
+        """执行注入的故障，返回是否已经处理完请求"""
+        fault = draw["fault"]
+        if fault is None:
+            return False
+        self.server.stats.add(f"fault_{fault}")
+        if fault == "timeout":
+            time.sleep(self.server.options.timeout_seconds)
+            self.close_connection = True
+            return True
+        headers = {}
+        if fault == 429 and self.server.options.retry_after is not None:
+            headers["Retry-After"] = f"{self.server.options.retry_after:g}"
+        kind = "rate_limit_error" if fault == 429 else "server_error"
+        self._send_json(fault, {"error": {"message": f"mock {fault}", "type": kind}}, headers)
+        return True
+
+    # 路由
+
+    def do_GET(self):
+        path = self.path.split("?", 1)[0].rstrip("/")
+        options = self.server.options
+        if path.endswith("/models"):
+            self.server.stats.add("models")
+            self._send_json(200, {"object": "list", "data": [
+                {"id": options.model, "object": "model", "created": 0, "owned_by": "fuling"},
+            ]})
+        elif path == "/api/tags":
+            self.server.stats.add("tags")
+            self._send_json(200, {"models": [{"name": options.model, "model": options.model}]})
+        elif path == "/stats":
+            self._send_json(200, self.server.stats.snapshot())
+        else:
+            self._send_json(404, {"error": {"message": f"未知路径: {path}", "type": "not_found"}})
+
+    def do_POST(self):
+        path = self.path.split("?", 1)[0].rstrip("/")
+        body = self._read_body()
+        if path.endswith("/chat/completions"):
+            self._chat(body, ollama=False)
+        elif path == "/api/chat":
+            self._chat(body, ollama=True)
+        else:
+            self._send_json(404, {"error": {"message": f"未知路径: {path}", "type": "not_found"}})
+
+    def _chat(self, body: Dict[str, Any], ollama: bool) -> None:
+        options = self.server.options
+        # Ollama 未指定 stream 时默认流式
+        stream = bool(body.get("stream", ollama))
+        self.server.stats.add("requests")
+
+        draw = options.draw()
+        time.sleep(draw["latency"])  # 首字节延迟
+        if self._inject(draw):
+            return
+
+        tokens = options.make_reply(body.get("messages") or [])
+        model = body.get("model") or options.model
+        self.server.stats.add("streams" if stream else "completions")
+        if not stream:
+            time.sleep(len(tokens) * self._token_delay())
+            content = "".join(tokens)
+            if ollama:
+                self._send_json(200, {
+                    "model": model,
+                    "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                    "message": {"role": "assistant", "content": content},
+                    "done": True,
+                    "eval_count": len(tokens),
+                })
+            else:
+                self._send_json(200, {
+                    "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop",
+                    }],
+                    "usage": {"prompt_tokens": 0, "completion_tokens": len(tokens), "total_tokens": len(tokens)},
+                })
+            return
+
+        if ollama:
+            self._stream_ollama(tokens, model)
+        else:
+            self._stream_openai(tokens, model)
+
+    def _stream_openai(self, tokens: List[str], model: str) -> None:
+        self._start_chunked("text/event-stream; charset=utf-8")
+        chunk_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        delay = self._token_delay()
+
+        def event(delta: Dict[str, Any], finish: Optional[str] = None) -> str:
+            payload = {
+                "id": chunk_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+            }
+            return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+        self._write_chunk(event({"role": "assistant"}))
+        for token in tokens:
+            time.sleep(delay)
+            self._write_chunk(event({"content": token}))
+        self._write_chunk(event({}, "stop"))
+        self._write_chunk("data: [DONE]\n\n")
+        self._end_chunked()
+
+    def _stream_ollama(self, tokens: List[str], model: str) -> None:
+        self._start_chunked("application/x-ndjson")
+        delay = self._token_delay()
+        for token in tokens:
+            time.sleep(delay)
+            self._write_chunk(json.dumps({"model": model, "message": {"role": "assistant", "content": token},
+                                          "done": False}, ensure_ascii=False) + "\n")
+        self._write_chunk(json.dumps({"model": model, "message": {"role": "assistant", "content": ""},
+                                      "done": True, "eval_count": len(tokens)}) + "\n")
+        self._end_chunked()
+
+
+class MockServer(ThreadingHTTPServer):
+    """模拟提供商服务器"""
+
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, options: Optional[MockOptions] = None,
+                 verbose: bool = False):
+        self.options = options or MockOptions()
+        self.stats = MockStats()
+        self.verbose = verbose
+        super().__init__((host, port), MockHandler)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def serve_in_background(options: Optional[MockOptions] = None, host: str = "127.0.0.1",
+                        port: int = 0) -> MockServer:
+    """在后台线程中启动模拟服务器（用于测试和基准），用 shutdown() 停止"""
+    server = MockServer(host, port, options)
+    threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05},
+                     name="fuling-mockserver", daemon=True).start()
+    return server
+
+
+def _latency_option(ctx, param, value):
+    try:
+        parse_latency(value)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+    return value
+
+
+@click.command()
+@click.option('--host', default='127.0.0.1', show_default=True, help='监听地址')
+@click.option('--port', '-p', type=int, default=8765, show_default=True, help='监听端口（0 表示随机）')
+@click.option('--latency', '-l', default='fixed:0', show_default=True, callback=_latency_option,
+              help='首字节延迟分布: fixed:S | uniform:A,B | normal:M,SD | lognormal:MEDIAN,SIGMA | exp:M | pareto:MIN,ALPHA')
+@click.option('--error-429', type=click.FloatRange(0, 1), default=0.0, help='返回 429 的概率')
+@click.option('--error-500', type=click.FloatRange(0, 1), default=0.0, help='返回 500 的概率')
+@click.option('--timeout-rate', type=click.FloatRange(0, 1), default=0.0, help='不响应（挂起）的概率')
+@click.option('--timeout-seconds', type=float, default=60.0, show_default=True, help='挂起多久后断开连接')
+@click.option('--retry-after', type=float, default=1.0, show_default=True, help='429 响应的 Retry-After（秒）')
+@click.option('--tokens-per-second', '-t', type=float, default=0.0, help='输出速率限制（0 表示不限）')
+@click.option('--reply', default=None, help='固定回复内容（默认复述用户消息）')
+@click.option('--reply-tokens', type=click.IntRange(min=0), default=0, help='把回复填充/截断到指定token数')
+@click.option('--model', default=DEFAULT_MODEL, show_default=True, help='报告的模型名')
+@click.option('--seed', type=int, default=None, help='随机种子（便于复现）')
+@click.option('--verbose', '-v', is_flag=True, help='打印每个请求')
+def main(host, port, latency, error_429, error_500, timeout_rate, timeout_seconds, retry_after,
+         tokens_per_second, reply, reply_tokens, model, seed, verbose):
+    """启动OpenAI/Ollama兼容的模拟提供商服务器"""
+    options = MockOptions(latency, error_429, error_500, timeout_rate, timeout_seconds, retry_after,
+                          tokens_per_second, reply, reply_tokens, model, seed)
+    server = MockServer(host, port, options, verbose)
+    click.echo(f"🔮 符灵模拟服务器: {server.url}")
+    click.echo(f"  OpenAI兼容: base_url={server.url}/v1")
+    click.echo(f"  Ollama:     base_url={server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        click.echo("\n符灵退散...")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+"""
+符灵命令规范化 - 在查缓存和本地知识库之前把等价命令统一成同一种写法
+"""
+
+import re
+import shlex
+from typing import Dict, List, Optional, Set, Tuple
+
+# 已知命令中需要参数的短选项字母；只有表中的命令才会合并、排序短选项
+SHORT_FLAGS_WITH_ARGS: Dict[str, str] = {
+    "ls": "IwT",
+    "df": "Bt",
+    "du": "BdX",
+    "free": "cs",
+    "ps": "opuUgGtC",
+    "rm": "",
+    "cp": "St",
+    "mv": "St",
+    "mkdir": "m",
+    "rmdir": "",
+    "chmod": "",
+    "chown": "",
+    "cat": "",
+    "grep": "efmABCdD",
+    "head": "nc",
+    "tail": "ncs",
+    "wc": "",
+    "sort": "ktSTo",
+    "uniq": "fsw",
+    "tar": "fCTXbgHKN",
+    "gzip": "S",
+    "unzip": "dxP",
+    "netstat": "",
+    "uname": "",
+}
+
+# 参数中的数字有特定含义的命令，不替换为占位符
+KEEP_NUMBERS = {"chmod", "umask", "kill", "exit", "renice", "nice"}
+
+# 参数多为主机名/URL的命令，不把带后缀的词当作文件
+NETWORK_COMMANDS = {"ping", "curl", "wget", "ssh", "scp", "dig", "host", "nslookup", "traceroute", "telnet", "nc"}
+
+# sed/awk/grep 的脚本或模式参数不是路径，原样保留：
+# (给出模式的选项, 给出脚本文件的选项, 其他带参数的选项)；未用选项给出时第一个位置参数就是模式
+PATTERN_COMMANDS: Dict[str, Tuple[str, str, str]] = {
+    "sed": ("e", "f", "l"),
+    "awk": ("", "f", "vF"),
+    "gawk": ("", "f", "vF"),
+    "grep": ("e", "f", "mABCdD"),
+    "egrep": ("e", "f", "mABCdD"),
+    "fgrep": ("e", "f", "mABCdD"),
+}
+
+# 这些命令的参数多为引用/分支名（origin/main、feature/x），只把 -- 之后或带后缀的参数当作文件
+REF_COMMANDS = {"git"}
+
+# 有特定含义的特殊文件，替换后模型无法解释
+SPECIAL_FILES = {"/", "/dev/null", "/dev/stdin", "/dev/stdout", "/dev/stderr", "/dev/tty"}
+
+OPERATORS = {"|", "||", "&&", ";", "&", "(", ")"}
+
+# 重定向：>、>>、<、>|、2>、2>>、2>&1、>&2、&>、<<、<<-、<<< 等
+_REDIRECT = r"(?:\d+|&)?(?:>>|>&(?:\d+|-)?|<&(?:\d+|-)?|>\||>|<<<|<<-?|<)"
+_REDIRECT_RE = re.compile(f"^{_REDIRECT}$")
+_HEREDOC_RE = re.compile(r"^\d*<<")
+_OPERATOR_RE = re.compile(rf"{_REDIRECT}|\|\||&&|[|&;()]")
+# 一个shell词：普通字符、转义字符和成对的引号
+_WORD_RE = re.compile(r"""(?:[^\s'"\\|&;()<>]|\\.|'[^']*'|"(?:\\.|[^"\\])*")+""", re.S)
+_SPACE_RE = re.compile(r"\s+")
+# 只合并纯字母的短选项；-20、-n20 这类带数字的选项原样保留
+_SHORT_FLAG_RE = re.compile(r"^-[A-Za-z]+$")
+_NUMBER_RE = re.compile(r"^\d+(\.\d+)?$")
+_FILENAME_RE = re.compile(r"^[\w@+-][\w.@+-]*\.[A-Za-z][A-Za-z0-9]{0,7}$")
+_PATH_CHARS_RE = re.compile(r"^[\w.@+~/ -]+$")
+
+
+class NormalizedCommand:
+    """规范化后的命令及占位符对应的原始字面量"""
+
+    def __init__(self, original: str, canonical: str, placeholders: Dict[str, str]):
+        self.original = original
+        self.canonical = canonical
+        self.placeholders = placeholders
+
+    def render(self, text: str) -> str:
+        """把文本中的占位符还原为原始路径和数字"""
+        for placeholder, literal in self.placeholders.items():
+            text = text.replace(placeholder, literal)
+        return text
+
+    def __repr__(self) -> str:
+        return f"NormalizedCommand({self.canonical!r}, {self.placeholders!r})"
+
+
+def _is_operator(token: str) -> bool:
+    """判断词是否为管道、连接符或重定向"""
+    return token in OPERATORS or bool(_REDIRECT_RE.match(token))
+
+
+def _tokenize(command: str) -> List[str]:
+    """按shell规则切分命令，管道、连接符和重定向单独成词
+
+    重定向在去引号之前识别，所以 2>x 是标准错误重定向，而 2 > x 和 "2">x 中的 2 是参数。
+    """
+    tokens: List[str] = []
+    position = 0
+    try:
+        while position < len(command):
+            match = _SPACE_RE.match(command, position)
+            if match:
+                position = match.end()
+                continue
+            if command[position] == "#":
+                break  # 注释
+            match = _OPERATOR_RE.match(command, position)
+            if match:
+                tokens.append(match.group())
+            else:
+                match = _WORD_RE.match(command, position)
+                if not match:
+                    raise ValueError("unbalanced quotes")
+                tokens.append("".join(shlex.split(match.group())))
+            position = match.end()
+    except ValueError:
+        # 引号不成对时退回按空白切分
+        return command.split()
+    return tokens
+
+
+def _split_segments(tokens: List[str]) -> List[List[str]]:
+    """按管道和连接符把命令切成若干段，连接符自成一段"""
+    segments: List[List[str]] = []
+    current: List[str] = []
+    for token in tokens:
+        if token in OPERATORS:
+            if current:
+                segments.append(current)
+            segments.append([token])
+            current = []
+        else:
+            current.append(token)
+    if current:
+        segments.append(current)
+    return segments
+
+
+def _split_redirects(segment: List[str]) -> Tuple[List[str], List[Tuple[str, Optional[str]]]]:
+    """把一段命令分成命令词和 (重定向, 目标) 列表；2>&1 这类重定向没有目标"""
+    words: List[str] = []
+    redirects: List[Tuple[str, Optional[str]]] = []
+    tokens = iter(segment)
+    for token in tokens:
+        if not _REDIRECT_RE.match(token):
+            words.append(token)
+        elif re.search(r"&(\d+|-)$", token):
+            redirects.append((token, None))
+        else:
+            redirects.append((token, next(tokens, None)))
+    return words, redirects
+
+
+def _is_path(token: str, program: str = "") -> bool:
+    """判断参数是否像文件路径字面量"""
+    if token in SPECIAL_FILES or token.startswith("-") or not _PATH_CHARS_RE.match(token):
+        return False
+    if token.startswith(("/", "~", "./", "../")):
+        return True
+    if program in NETWORK_COMMANDS:
+        return False
+    return "/" in token or bool(_FILENAME_RE.match(token))
+
+
+def _pattern_args(program: str, args: List[str]) -> Set[int]:
+    """sed/awk/grep 中作为脚本或模式的参数下标"""
+    spec = PATTERN_COMMANDS.get(program)
+    if spec is None:
+        return set()
+    pattern_flags, file_flags, arg_flags = spec
+    patterns: Set[int] = set()
+    has_pattern = False
+    options_done = False
+    expect: Optional[str] = None
+    for index, arg in enumerate(args):
+        if expect is not None:
+            if expect in pattern_flags:
+                patterns.add(index)
+            expect = None
+            continue
+        if arg == "--":
+            options_done = True
+            continue
+        if not options_done and arg.startswith("-") and len(arg) > 1:
+            if arg.startswith("--"):
+                continue
+            for offset, letter in enumerate(arg[1:], 1):
+                if letter in pattern_flags + file_flags + arg_flags:
+                    has_pattern = has_pattern or letter in pattern_flags + file_flags
+                    if offset == len(arg) - 1:
+                        expect = letter  # 参数在下一个词里
+                    break
+            continue
+        if not has_pattern:
+            patterns.add(index)
+            has_pattern = True
+    return patterns
+
+
+def _merge_short_flags(program: str, args: List[str]) -> List[str]:
+    """合并并排序不带参数的短选项，放在命令名之后"""
+    takes_arg = SHORT_FLAGS_WITH_ARGS.get(program)
+    if takes_arg is None:
+        return args
+
+    letters = set()
+    rest: List[str] = []
+    skip_next = False
+    for index, arg in enumerate(args):
+        if skip_next:
+            rest.append(arg)
+            skip_next = False
+            continue
+        if arg == "--":
+            rest.extend(args[index:])
+            break
+        if _SHORT_FLAG_RE.match(arg) and not any(ch in takes_arg for ch in arg[1:]):
+            letters.update(arg[1:])
+            continue
+        if _SHORT_FLAG_RE.match(arg):
+            # 带参数的选项原样保留，若参数在下一个词里也一并保留
+            skip_next = arg[-1] in takes_arg
+        rest.append(arg)
+
+    if not letters:
+        return rest
+    return ["-" + "".join(sorted(letters))] + rest
+
+
+def normalize_command(command: str) -> NormalizedCommand:
+    """规范化命令：合并空白、合并排序短选项、用占位符替换路径和数字"""
+    placeholders: Dict[str, str] = {}
+    literals: Dict[str, str] = {}
+    counters = {"PATH": 0, "NUM": 0}
+
+    def placeholder(kind: str, literal: str) -> str:
+        if literal not in literals:
+            counters[kind] += 1
+            name = f"<{kind}{counters[kind]}>"
+            literals[literal] = name
+            placeholders[name] = literal
+        return literals[literal]
+
+    words: List[str] = []
+    for segment in _split_segments(_tokenize(command.strip())):
+        if segment[0] in OPERATORS:
+            words.append(segment[0])
+            continue
+
+        command_words, redirects = _split_redirects(segment)
+        if command_words:
+            program = command_words[0]
+            args = _merge_short_flags(program, command_words[1:])
+            patterns = _pattern_args(program, args)
+            after_dashes = False
+            words.append(shlex.quote(program))
+            for index, arg in enumerate(args):
+                if index in patterns:
+                    words.append(shlex.quote(arg))
+                elif program not in KEEP_NUMBERS and _NUMBER_RE.match(arg):
+                    words.append(placeholder("NUM", arg))
+                elif _is_path(arg, program) and (program not in REF_COMMANDS or after_dashes
+                                                 or _FILENAME_RE.match(arg.rsplit("/", 1)[-1])):
+                    words.append(placeholder("PATH", arg))
+                else:
+                    words.append(shlex.quote(arg))
+                after_dashes = after_dashes or arg == "--"
+
+        # 重定向统一放在命令之后，目标按路径规则替换（here-doc 的定界符除外）
+        for operator, target in redirects:
+            words.append(operator)
+            if target is None:
+                continue
+            if not _HEREDOC_RE.match(operator) and _is_path(target):
+                words.append(placeholder("PATH", target))
+            else:
+                words.append(shlex.quote(target))
+
+    return NormalizedCommand(command, " ".join(words), placeholders)
+
+
+def canonicalize(command: str) -> str:
+    """返回命令的规范形式（不含占位符还原信息）"""
+    return normalize_command(command).canonical
@@ -0,0 +1,91 @@
+"""
+Ollama本地AI提供商
+"""
+
+from typing import Dict, Any, Iterator, List, Optional
+from .fuling_ai import AIProvider
+
+
+class OllamaProvider(AIProvider):
+    """Ollama 本地AI提供商"""
+
+    def __init__(self, config: Dict[str, Any]):
+        super().__init__(config)
+        self.base_url = config.get('base_url', 'http://localhost:11434').rstrip('/')
+        self.model = config.get('model') or config.get('name') or 'llama3'
+
+    def _payload(self, messages: List[Dict], kwargs: Dict, stream: bool = False) -> Dict[str, Any]:
+        """构建请求数据"""
+        return {
+            "model": self.model,
+            "messages": [{"role": msg["role"], "content": msg["content"]} for msg in messages],
+            "stream": stream,  # Ollama默认返回NDJSON流
+            "options": {
+                "temperature": kwargs.get('temperature', self.temperature),
+                "num_predict": kwargs.get('max_tokens', self.max_tokens),
+            }
+        }
+
+    def chat_completion(self, messages: List[Dict], **kwargs) -> str:
+        """Ollama聊天补全"""
+        import requests
+
+        try:
+            response = self._post(f"{self.base_url}/api/chat", json=self._payload(messages, kwargs))
+            response.raise_for_status()
+            return response.json()['message']['content']
+        except requests.exceptions.Timeout:
+            return "⏱️ Ollama请求超时"
+        except requests.exceptions.ConnectionError:
+            return "🔌 无法连接Ollama，请确认服务正在运行: ollama serve"
+        except Exception as e:
+            return f"❌ Ollama API错误: {str(e)[:150]}"
+
+    def stream_chat_completion(self, messages: List[Dict], **kwargs) -> Iterator[str]:
+        """Ollama流式聊天补全（NDJSON）"""
+        import requests
+        from .transport import iter_ndjson
+
+        try:
+            with self._post(f"{self.base_url}/api/chat", json=self._payload(messages, kwargs, stream=True),
+                            stream=True) as response:
+                response.raise_for_status()
+                for chunk in iter_ndjson(response):
+                    content = chunk.get('message', {}).get('content')
+                    if content:
+                        yield content
+                    if chunk.get('done'):
+                        break
+        except requests.exceptions.ConnectionError:
+            yield "🔌 无法连接Ollama，请确认服务正在运行: ollama serve"
+        except Exception as e:
+            yield f"❌ Ollama API错误: {str(e)[:150]}"
+
+    def explain_messages(self, command: str, context: Optional[str] = None) -> List[Dict]:
+        """构建解释命令的对话消息"""
+        prompt = f"解释这个shell命令的功能和用法: {command}"
+        if context:
+            prompt += f"\n上下文: {context}"
+
+        return [
+            {"role": "system", "content": "你是一个Linux/Unix系统专家，专门解释shell命令。用中文回答。"},
+            {"role": "user", "content": prompt}
+        ]
+
+    def explain_command(self, command: str, context: Optional[str] = None) -> str:
+        """解释命令"""
+        return self.chat_completion(self.explain_messages(command, context))
+
+    def health_check(self) -> bool:
+        """轻量健康检查：GET /api/tags，不调用模型"""
+        from .transport import get_transport
+
+        try:
+            response = get_transport().get(
+                f"{self.base_url}/api/tags",
+                base_url=self.base_url,
+                timeout=min(self.timeout, 5),
+            )
+        except Exception:
+            return False
+        return response.status_code < 400
@@ -3,7 +3,7 @@ OpenAI提供商实现
 """
 
 import os
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Iterator, List, Optional
 from .fuling_ai import AIProvider
 
 class OpenAIProvider(AIProvider):
@@ -14,6 +14,7 @@ class OpenAIProvider(AIProvider):
         self.api_key = config.get('api_key') or os.environ.get('OPENAI_API_KEY')
         self.base_url = config.get('base_url', 'https://api.openai.com/v1')
         self.organization = config.get('organization')
+        self._client = None
         
         if not self.api_key:
             raise ValueError("OpenAI API密钥未设置")
@@ -23,17 +24,10 @@ class OpenAIProvider(AIProvider):
         try:
             # 尝试使用openai库
             try:
-                from openai import OpenAI
-                
-                client_kwargs = {
-                    "api_key": self.api_key,
-                    "base_url": self.base_url,
-                }
-                if self.organization:
-                    client_kwargs["organization"] = self.organization
-                
-                client = OpenAI(**client_kwargs)
+                client = self._get_client()
                 
+                # SDK 不经过 _post，同样占用跨进程限流配额
+                self.throttle()
                 response = client.chat.completions.create(
                     model=self.name,
                     messages=messages,
@@ -61,32 +55,82 @@ class OpenAIProvider(AIProvider):
             else:
                 return f"❌ OpenAI API错误: {error_msg[:150]}"
     
-    def _chat_completion_via_requests(self, messages: List[Dict], kwargs: Dict) -> str:
-        """通过requests调用OpenAI API"""
-        import requests
+    def stream_chat_completion(self, messages: List[Dict], **kwargs) -> Iterator[str]:
+        """OpenAI流式聊天补全"""
+        try:
+            client = self._get_client()
+        except ImportError:
+            # 回退到requests直接解析SSE
+            yield from self._stream_sse(
+                f"{self.base_url}/chat/completions",
+                self._headers(),
+                self._payload(messages, kwargs, stream=True),
+            )
+            return
         
-        url = f"{self.base_url}/chat/completions"
+        try:
+            self.throttle()
+            stream = client.chat.completions.create(
+                model=self.name,
+                messages=messages,
+                temperature=kwargs.get('temperature', self.temperature),
+                max_tokens=kwargs.get('max_tokens', self.max_tokens),
+                stream=True,
+            )
+            for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except Exception as e:
+            yield f"❌ OpenAI API错误: {str(e)[:150]}"
+    
+    def _headers(self) -> Dict[str, str]:
+        """请求头"""
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
         }
         if self.organization:
             headers["OpenAI-Organization"] = self.organization
-        
+        return headers
+    
+    def _payload(self, messages: List[Dict], kwargs: Dict, stream: bool = False) -> Dict[str, Any]:
+        """构建请求数据"""
         data = {
             "model": self.name,
             "messages": messages,
             "temperature": kwargs.get('temperature', self.temperature),
             "max_tokens": kwargs.get('max_tokens', self.max_tokens),
         }
+        if stream:
+            data["stream"] = True
+        return data
+    
+    def _get_client(self):
+        """获取复用的openai客户端（保持其内部连接池）"""
+        if self._client is None:
+            from openai import OpenAI
+            
+            client_kwargs = {
+                "api_key": self.api_key,
+                "base_url": self.base_url,
+                "max_retries": self.retry_policy.attempts,  # SDK自带退避并遵循Retry-After
+            }
+            if self.organization:
+                client_kwargs["organization"] = self.organization
+            
+            self._client = OpenAI(**client_kwargs)
+        return self._client
+    
+    def _chat_completion_via_requests(self, messages: List[Dict], kwargs: Dict) -> str:
+        """通过requests调用OpenAI API"""
+        import requests
+        
+        url = f"{self.base_url}/chat/completions"
+        headers = self._headers()
+        data = self._payload(messages, kwargs)
         
         try:
-            response = requests.post(
-                url,
-                headers=headers,
-                json=data,
-                timeout=self.timeout
-            )
+            response = self._post(url, headers=headers, json=data)
             response.raise_for_status()
             
             result = response.json()
@@ -130,18 +174,20 @@ class OpenAIProvider(AIProvider):
         except:
             pass
     
-    def explain_command(self, command: str, context: Optional[str] = None) -> str:
-        """解释命令"""
+    def explain_messages(self, command: str, context: Optional[str] = None) -> List[Dict]:
+        """构建解释命令的对话消息"""
         prompt = f"请用中文解释这个shell命令的功能和用法: {command}"
         if context:
             prompt += f"\n上下文: {context}"
         
-        messages = [
+        return [
             {"role": "system", "content": "你是一个Linux/Unix系统专家，专门用中文解释shell命令。回答要简洁明了，包含实际用例。"},
             {"role": "user", "content": prompt}
         ]
-        
-        return self.chat_completion(messages)
+    
+    def explain_command(self, command: str, context: Optional[str] = None) -> str:
+        """解释命令"""
+        return self.chat_completion(self.explain_messages(command, context))
     
     def suggest_commands(self, context: Optional[str] = None) -> List[Dict]:
         """建议命令"""
@@ -0,0 +1,358 @@
+"""
+符灵跨调用性能统计 - fl perf 命令
+
+每次调用结束时把本进程的指标快照（对数桶直方图）追加到缓存目录下的环形文件中。
+文件大小固定：头部之后是 slots 个等长槽位，通过 mmap 原地写入，
+写满后覆盖最旧的记录。fl perf report 按时间窗口合并各次调用的直方图，
+给出每个命令、每个提供商的延迟分位数。
+"""
+
+import contextvars
+import json
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+import click
+
+from .fuling_theme import format_text
+from .metrics import LogHistogram
+
+try:
+    import fcntl
+except ImportError:  # Windows：不加文件锁，尽力而为
+    fcntl = None
+
+DEFAULT_PERF_CONFIG = {
+    "enabled": True,     # 记录每次调用的指标
+    "slots": 2048,       # 环形文件保留的调用记录数
+    "slot_size": 4096,   # 单条记录的最大字节数（压缩后）
+}
+
+# 头部：魔数、版本、槽位大小、槽位数、下一个序号
+HEADER = struct.Struct("<8sIIIQ")
+HEADER_SIZE = 64
+MAGIC = b"FLPERF01"
+VERSION = 1
+# 槽位：序号、时间戳、负载长度，其后是 zlib 压缩的 JSON
+SLOT_HEADER = struct.Struct("<QdI")
+
+# 不记录的命令（基准测试会产生大量非真实请求）
+UNRECORDED_COMMANDS = {"bench", "perf", "daemon", None}
+
+
+def get_perf_config() -> Dict[str, Any]:
+    """获取性能统计配置"""
+    from .fuling_core import get_config
+    return {**DEFAULT_PERF_CONFIG, **(get_config().get("perf") or {})}
+
+
+def default_ring_path() -> Path:
+    """默认的环形文件"""
+    from .fuling_core import get_cache_dir
+    return get_cache_dir() / "metrics.ring"
+
+
+class MetricsRing:
+    """固定大小的指标环形文件（多进程追加安全）"""
+
+    def __init__(self, path: Path, slots: int = DEFAULT_PERF_CONFIG["slots"],
+                 slot_size: int = DEFAULT_PERF_CONFIG["slot_size"]):
+        if slot_size <= SLOT_HEADER.size:
+            raise ValueError("slot_size 过小")
+        self.path = Path(path)
+        self.slots = slots
+        self.slot_size = slot_size
+
+    @property
+    def capacity(self) -> int:
+        """单条记录负载的最大字节数"""
+        return self.slot_size - SLOT_HEADER.size
+
+    def _file_size(self) -> int:
+        return HEADER_SIZE + self.slots * self.slot_size
+
+    def _open(self, create: bool):
+        """打开并映射文件；布局与当前配置不符时重建（旧记录丢弃）"""
+        if create:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd = os.open(str(self.path), os.O_RDWR | os.O_CREAT, 0o600)
+        else:
+            fd = os.open(str(self.path), os.O_RDONLY)
+        f = os.fdopen(fd, "r+b" if create else "rb")
+        try:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX if create else fcntl.LOCK_SH)
+            size = os.fstat(f.fileno()).st_size
+            if create and (size != self._file_size() or not self._header_matches(f)):
+                f.truncate(0)
+                f.truncate(self._file_size())
+                f.seek(0)
+                f.write(HEADER.pack(MAGIC, VERSION, self.slot_size, self.slots, 0))
+                f.flush()
+            elif size < HEADER_SIZE:
+                raise OSError("指标文件不完整")
+            access = mmap.ACCESS_WRITE if create else mmap.ACCESS_READ
+            return f, mmap.mmap(f.fileno(), 0, access=access)
+        except Exception:
+            f.close()
+            raise
+
+    def _header_matches(self, f) -> bool:
+        f.seek(0)
+        raw = f.read(HEADER.size)
+        if len(raw) < HEADER.size:
+            return False
+        magic, version, slot_size, slots, _ = HEADER.unpack(raw)
+        return (magic, version, slot_size, slots) == (MAGIC, VERSION, self.slot_size, self.slots)
+
+    def append(self, payload: bytes, timestamp: Optional[float] = None) -> bool:
+        """追加一条记录，超出槽位大小时返回False"""
+        if len(payload) > self.capacity:
+            return False
+        f, mapped = self._open(create=True)
+        try:
+            _, _, _, _, seq = HEADER.unpack_from(mapped, 0)
+            offset = HEADER_SIZE + (seq % self.slots) * self.slot_size
+            mapped[offset + SLOT_HEADER.size:offset + SLOT_HEADER.size + len(payload)] = payload
+            SLOT_HEADER.pack_into(mapped, offset, seq + 1, timestamp or time.time(), len(payload))
+            HEADER.pack_into(mapped, 0, MAGIC, VERSION, self.slot_size, self.slots, seq + 1)
+        finally:
+            mapped.close()
+            f.close()  # 关闭文件同时释放锁
+        return True
+
+    def records(self) -> Iterator[Tuple[float, bytes]]:
+        """按写入顺序遍历有效记录 (时间戳, 负载)"""
+        try:
+            f, mapped = self._open(create=False)
+        except (OSError, ValueError):
+            return
+        try:
+            magic, version, slot_size, slots, seq = HEADER.unpack_from(mapped, 0)
+            if (magic, version) != (MAGIC, VERSION) or len(mapped) < HEADER_SIZE + slots * slot_size:
+                return
+            for number in range(max(0, seq - slots), seq):
+                offset = HEADER_SIZE + (number % slots) * slot_size
+                stored, timestamp, length = SLOT_HEADER.unpack_from(mapped, offset)
+                # 序号不符说明该槽位尚未写入或写入被中断
+                if stored != number + 1 or length > slot_size - SLOT_HEADER.size:
+                    continue
+                start = offset + SLOT_HEADER.size
+                yield timestamp, bytes(mapped[start:start + length])
+        finally:
+            mapped.close()
+            f.close()
+
+
+def encode_snapshot(snapshot: Dict[str, LogHistogram], command: Optional[str] = None) -> bytes:
+    """把指标快照编码为紧凑的压缩JSON"""
+    metrics = {}
+    for name, histogram in snapshot.items():
+        if not histogram.count:
+            continue
+        data = histogram.to_dict()
+        # 省略默认值以压缩体积
+        for key, default in (("relative_accuracy", 0.01), ("max_buckets", 2048), ("negative", {}), ("zero", 0)):
+            if data.get(key) == default:
+                del data[key]
+        metrics[name] = data
+    raw = json.dumps({"command": command, "metrics": metrics}, separators=(",", ":"), ensure_ascii=False)
+    return zlib.compress(raw.encode("utf-8"), 9)
+
+
+def decode_snapshot(payload: bytes) -> Dict[str, Any]:
+    """解码 encode_snapshot 的结果"""
+    record = json.loads(zlib.decompress(payload).decode("utf-8"))
+    record["metrics"] = {name: LogHistogram.from_dict(data) for name, data in record.get("metrics", {}).items()}
+    return record
+
+
+def append_snapshot(snapshot: Dict[str, LogHistogram], command: Optional[str] = None,
+                    ring: Optional[MetricsRing] = None) -> bool:
+    """把一次调用的指标快照写入环形文件；记录过大时依次丢弃桶最多的指标"""
+    if ring is None:
+        options = get_perf_config()
+        if not options.get("enabled", True):
+            return False
+        ring = MetricsRing(default_ring_path(), options["slots"], options["slot_size"])
+
+    snapshot = {name: histogram for name, histogram in snapshot.items() if histogram.count}
+    while snapshot:
+        payload = encode_snapshot(snapshot, command)
+        if len(payload) <= ring.capacity:
+            try:
+                return ring.append(payload)
+            except OSError:
+                return False  # 统计失败不影响主要功能
+        largest = max(snapshot, key=lambda name: len(snapshot[name].positive) + len(snapshot[name].negative))
+        del snapshot[largest]
+    return False
+
+
+def load_snapshots(ring: MetricsRing, since: Optional[float] = None) -> List[Dict[str, Any]]:
+    """读取时间窗口内的快照，附带 timestamp 字段"""
+    result = []
+    for timestamp, payload in ring.records():
+        if since is not None and timestamp < since:
+            continue
+        try:
+            record = decode_snapshot(payload)
+        except (ValueError, zlib.error):
+            continue
+        record["timestamp"] = timestamp
+        result.append(record)
+    return result
+
+
+def aggregate(records: List[Dict[str, Any]], daily: bool = False) -> Dict[str, Dict[str, Any]]:
+    """合并各次调用的直方图，按指标（以及日期）汇总"""
+    merged: Dict[Tuple[str, str], LogHistogram] = {}
+    runs: Dict[Tuple[str, str], int] = {}
+    for record in records:
+        day = time.strftime("%Y-%m-%d", time.localtime(record["timestamp"])) if daily else ""
+        for name, histogram in record["metrics"].items():
+            key = (name, day)
+            if key in merged:
+                merged[key].merge(histogram)
+            else:
+                merged[key] = histogram
+            runs[key] = runs.get(key, 0) + 1
+
+    report = {}
+    for (name, day), histogram in sorted(merged.items()):
+        report[f"{name} {day}".strip()] = {
+            "metric": name,
+            "day": day or None,
+            "runs": runs[(name, day)],
+            "count": histogram.count,
+            "mean": histogram.mean,
+            "p50": histogram.percentile(50),
+            "p90": histogram.percentile(90),
+            "p99": histogram.percentile(99),
+            "max": histogram.max,
+        }
+    return report
+
+
+def parse_since(text: str) -> float:
+    """解析时间窗口（如 7d、12h、30m、2w），返回秒数"""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([smhdw])\s*", text or "")
+    if not match:
+        raise ValueError(f"无法解析时间窗口: {text!r}（示例: 30m, 12h, 7d, 2w）")
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+    return float(match.group(1)) * units[match.group(2)]
+
+
+class InvocationRecorder:
+    """收集一次 fl 调用的指标：命令总耗时和各提供商的模型调用耗时"""
+
+    def __init__(self, command: str):
+        self.command = command
+        self.start = time.perf_counter()
+        self.metrics: Dict[str, LogHistogram] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float) -> None:
+        with self._lock:
+            histogram = self.metrics.get(name)
+            if histogram is None:
+                histogram = self.metrics[name] = LogHistogram()
+            histogram.record(seconds)
+
+    def on_span(self, finished) -> None:
+        """tracing 回调：按提供商记录模型调用耗时"""
+        if finished.name in ("provider.completion", "provider.explain"):
+            self.record(f"provider.{finished.attributes.get('provider', 'unknown')}", finished.duration)
+
+    def finish(self) -> bool:
+        """结束并写入环形文件"""
+        _active_recorder.set(None)
+        self.record(f"command.{self.command}", time.perf_counter() - self.start)
+        with self._lock:
+            snapshot = dict(self.metrics)
+        return append_snapshot(snapshot, self.command)
+
+
+# 当前调用的记录器；守护进程中并发的请求各自独立，工作线程通过复制的上下文继承
+_active_recorder: contextvars.ContextVar = contextvars.ContextVar("fuling_perf_recorder", default=None)
+
+
+def _dispatch_span(finished) -> None:
+    recorder = _active_recorder.get()
+    if recorder is not None:
+        recorder.on_span(finished)
+
+
+def start_recording(ctx: click.Context) -> Optional[InvocationRecorder]:
+    """为当前子命令开始记录，命令结束时自动写入"""
+    command = ctx.invoked_subcommand
+    if command in UNRECORDED_COMMANDS or not get_perf_config().get("enabled", True):
+        return None
+    from .tracing import add_listener
+
+    add_listener(_dispatch_span)
+    recorder = InvocationRecorder(command)
+    _active_recorder.set(recorder)
+    ctx.call_on_close(recorder.finish)
+    return recorder
+
+
+@click.group()
+def perf():
+    """跨调用的性能统计"""
+
+
+@perf.command()
+@click.option('--since', default='7d', show_default=True, help='时间窗口（如 30m、12h、7d、2w）')
+@click.option('--metric', '-m', 'prefixes', multiple=True, help='只显示以此开头的指标（如 provider.）')
+@click.option('--daily', is_flag=True, help='按天分组，便于观察趋势')
+@click.option('--json', 'as_json', is_flag=True, help='以JSON输出结果')
+def report(since, prefixes, daily, as_json):
+    """汇总最近各次调用的延迟分位数（按命令、按提供商）"""
+    from .bench import _display_width, _ljust, _rjust
+
+    try:
+        window = parse_since(since)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="--since")
+
+    options = get_perf_config()
+    ring = MetricsRing(default_ring_path(), options["slots"], options["slot_size"])
+    records = load_snapshots(ring, since=time.time() - window)
+    rows = aggregate(records, daily=daily)
+    if prefixes:
+        rows = {key: row for key, row in rows.items() if row["metric"].startswith(prefixes)}
+
+    if as_json:
+        click.echo(json.dumps({"since": since, "invocations": len(records), "metrics": rows},
+                              ensure_ascii=False, indent=2))
+        return
+
+    if not rows:
+        click.echo(format_text(f"最近 {since} 内没有性能记录", "warning"))
+        return
+
+    click.echo(format_text(f"最近 {since} 共 {len(records)} 次调用", "info"))
+    headers = ["指标", "日期", "调用", "样本", "p50", "p90", "p99", "最大"] if daily else \
+        ["指标", "调用", "样本", "p50", "p90", "p99", "最大"]
+    table = []
+    for row in rows.values():
+        line = [row["metric"]] + ([row["day"]] if daily else []) + [str(row["runs"]), str(row["count"])]
+        line += [f"{row[key] * 1000:.1f}ms" for key in ("p50", "p90", "p99", "max")]
+        table.append(line)
+
+    widths = [max(_display_width(str(cell)) for cell in column) for column in zip(headers, *table)]
+    text_columns = 2 if daily else 1
+    for line in [headers] + table:
+        cells = [
+            _ljust(cell, width) if index < text_columns else _rjust(cell, width)
+            for index, (cell, width) in enumerate(zip(line, widths))
+        ]
+        click.echo("  ".join(cells))
@@ -217,7 +217,7 @@ def test_moonshot_connection(api_key: str):
     click.echo("\n🔗 测试Moonshot连接...")
     
     try:
-        import requests
+        from .transport import get_transport
         
         url = "https://api.moonshot.cn/v1/chat/completions"
         headers = {
@@ -231,7 +231,7 @@ def test_moonshot_connection(api_key: str):
             "max_tokens": 10,
         }
         
-        response = requests.post(url, headers=headers, json=data, timeout=10)
+        response = get_transport().post(url, headers=headers, json=data, timeout=10)
         
         if response.status_code == 200:
             click.echo("✅ Moonshot连接测试成功")
@@ -254,14 +254,14 @@ def test_openai_connection(api_key: str):
     click.echo("\n🔗 测试OpenAI连接...")
     
     try:
-        import requests
+        from .transport import get_transport
         
         url = "https://api.openai.com/v1/models"
         headers = {
             "Authorization": f"Bearer {api_key}"
         }
         
-        response = requests.get(url, headers=headers, timeout=10)
+        response = get_transport().get(url, headers=headers, timeout=10)
         
         if response.status_code == 200:
             click.echo("✅ OpenAI连接测试成功")
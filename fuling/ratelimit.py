@@ -0,0 +1,184 @@
+"""
+符灵限流器 - 多个进程共享的令牌桶，状态保存在 ~/.cache/fuling/ratelimit.json
+
+只限制远程提供商：本机的 Ollama、LM Studio 等没有配额，限流只会抵消批量并发。
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Any, Callable, Optional
+
+from .fuling_core import get_config, get_cache_dir
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+STATE_FILE = "ratelimit.json"
+
+# 不经过网络的提供商
+LOCAL_PROVIDERS = {"local", "ollama"}
+
+DEFAULT_RATE_LIMIT_CONFIG = {
+    "enabled": True,
+    "requests_per_minute": 60,  # 每个提供商+密钥的平均请求速率
+    "burst": 10,                # 允许的突发请求数
+}
+
+
+def limiter_key(provider_name: str, api_key: Optional[str]) -> str:
+    """生成限流键（不保存明文密钥）"""
+    key_hash = hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:12]
+    return f"{provider_name}|{key_hash}"
+
+
+class RateLimiter:
+    """令牌桶限流器，用文件锁在进程间共享状态
+
+    acquire() 先预订令牌（令牌数可以为负），再睡眠到轮到自己为止，
+    所以并发的请求按到达顺序排队，而不是失败。
+    """
+
+    def __init__(self, path: Path, requests_per_minute: float = 60, burst: int = 10,
+                 sleep: Callable[[float], None] = time.sleep, clock: Callable[[], float] = time.time):
+        self.path = Path(path)
+        self.rate = max(requests_per_minute, 0.001) / 60.0
+        self.burst = max(1, int(burst))
+        self._sleep = sleep
+        self._clock = clock
+        self._thread_lock = threading.Lock()
+
+    @contextmanager
+    def _locked(self):
+        """进程内加线程锁，进程间加文件锁（不支持fcntl时仅线程锁）"""
+        with self._thread_lock:
+            if not FCNTL_AVAILABLE:
+                yield
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path.with_suffix(".lock"), "a") as lock_file:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _load(self) -> Dict[str, Any]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, data: Dict[str, Any]) -> None:
+        # 已持有文件锁，直接写临时文件后替换即可
+        tmp_path = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+    def _refill(self, bucket: Optional[Dict[str, float]], now: float) -> float:
+        """按经过的时间补充令牌，返回当前令牌数"""
+        if not bucket:
+            return float(self.burst)
+        elapsed = max(0.0, now - bucket.get("updated", now))
+        return min(float(self.burst), bucket.get("tokens", self.burst) + elapsed * self.rate)
+
+    def reserve(self, key: str) -> float:
+        """预订一个令牌，返回需要等待的秒数"""
+        with self._locked():
+            now = self._clock()
+            data = self._load()
+            tokens = self._refill(data.get(key), now) - 1
+            data[key] = {"tokens": tokens, "updated": now}
+            try:
+                self._save(data)
+            except OSError:
+                pass  # 状态写入失败时退化为不限流
+            return max(0.0, -tokens / self.rate)
+
+    def acquire(self, key: str) -> float:
+        """获取令牌，必要时等待；返回实际等待的秒数"""
+        wait = self.reserve(key)
+        if wait > 0:
+            self._sleep(wait)
+        return wait
+
+    def current_wait(self, key: str) -> float:
+        """此刻发起请求需要等待的秒数（不消耗令牌）"""
+        with self._locked():
+            tokens = self._refill(self._load().get(key), self._clock())
+        return max(0.0, (1 - tokens) / self.rate)
+
+
+_rate_limiter: Optional[RateLimiter] = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> Optional[RateLimiter]:
+    """获取全局限流器；rate_limit.enabled 关闭时返回None"""
+    global _rate_limiter
+
+    options = dict(DEFAULT_RATE_LIMIT_CONFIG)
+    options.update(get_config().get("rate_limit", {}) or {})
+    if not options.get("enabled", True):
+        return None
+
+    if _rate_limiter is None:
+        with _limiter_lock:
+            if _rate_limiter is None:
+                _rate_limiter = RateLimiter(
+                    get_cache_dir() / STATE_FILE,
+                    requests_per_minute=float(options["requests_per_minute"]),
+                    burst=int(options["burst"]),
+                )
+    return _rate_limiter
+
+
+def is_local_endpoint(provider_name: str, base_url: Optional[str] = None) -> bool:
+    """提供商是否运行在本机（本地模式、Ollama 或回环地址上的服务）"""
+    if provider_name in LOCAL_PROVIDERS:
+        return True
+    if not base_url:
+        return False
+    import ipaddress
+    from urllib.parse import urlparse
+
+    host = urlparse(base_url).hostname or ""
+    if host == "localhost" or host.endswith(".localhost"):
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def _limiter_for(provider_name: str, api_key: Optional[str], base_url: Optional[str]) -> Optional[RateLimiter]:
+    """需要限流时返回限流器：只限制带密钥的远程提供商"""
+    if not api_key or is_local_endpoint(provider_name, base_url):
+        return None
+    return get_rate_limiter()
+
+
+def throttle(provider_name: str, api_key: Optional[str], base_url: Optional[str] = None) -> float:
+    """请求前调用：按提供商+密钥限流，返回等待的秒数"""
+    limiter = _limiter_for(provider_name, api_key, base_url)
+    if limiter is None:
+        return 0.0
+    return limiter.acquire(limiter_key(provider_name, api_key))
+
+
+def current_wait(provider_name: str, api_key: Optional[str], base_url: Optional[str] = None) -> float:
+    """提供商此刻需要等待的秒数"""
+    limiter = _limiter_for(provider_name, api_key, base_url)
+    if limiter is None:
+        return 0.0
+    return limiter.current_wait(limiter_key(provider_name, api_key))
@@ -0,0 +1,213 @@
+"""
+符灵重试策略 - 指数退避 + 全抖动，遵循 Retry-After，并受总时长限制
+
+聊天补全的POST不是幂等的：请求一旦发出，重试可能让同一次补全计费两次。
+因此默认只重试请求未送达的失败（建立连接失败/超时）以及服务端明确表示
+未处理的状态码；读超时和其余5xx只有提供商标记为幂等时才重试。
+"""
+
+import random
+import socket
+import threading
+import time
+from typing import Dict, Any, Callable, Iterator, Optional, Union
+
+from .tracing import span
+
+# 服务端未处理请求的状态码：请求超时、限流、服务暂不可用，总是可以重试
+RETRYABLE_STATUS = {408, 429, 503}
+# 请求可能已被处理的状态码，只有幂等的提供商才重试
+IDEMPOTENT_RETRYABLE_STATUS = RETRYABLE_STATUS | {500, 502, 504}
+
+DEFAULT_RETRY_CONFIG = {
+    "retry_attempts": 3,    # 首次失败后最多重试次数
+    "retry_delay": 2,       # 退避基数（秒）
+    "retry_max_delay": 30,  # 单次等待上限（秒）
+    "retry_deadline": 60,   # 包括重试在内的总时长上限（秒）
+    "retry_idempotent": False,  # 重复请求不会重复计费时才重试读超时和5xx
+}
+
+
+class RetryStats:
+    """按提供商统计重试次数"""
+
+    def __init__(self):
+        self._counts: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, key: str, event: str) -> None:
+        """记录一次事件（retries / recovered / exhausted）"""
+        with self._lock:
+            counts = self._counts.setdefault(key, {"retries": 0, "recovered": 0, "exhausted": 0})
+            counts[event] += 1
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        """所有提供商的重试统计"""
+        with self._lock:
+            return {key: dict(counts) for key, counts in self._counts.items()}
+
+    def reset(self) -> None:
+        """清空统计"""
+        with self._lock:
+            self._counts.clear()
+
+
+retry_stats = RetryStats()
+
+
+def parse_retry_after(value: Optional[str], now: Optional[float] = None) -> Optional[float]:
+    """解析 Retry-After 头（秒数或HTTP日期），返回需等待的秒数"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    from email.utils import parsedate_to_datetime
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when is None:
+        return None
+    return max(0.0, when.timestamp() - (now if now is not None else time.time()))
+
+
+def _iter_causes(error: BaseException) -> Iterator[BaseException]:
+    """沿异常链（含 urllib3 的 reason 和包装在参数中的异常）遍历所有原因"""
+    seen = set()
+    pending = [error]
+    while pending:
+        current = pending.pop()
+        if current is None or id(current) in seen:
+            continue
+        seen.add(id(current))
+        yield current
+        pending.extend([current.__cause__, current.__context__, getattr(current, 'reason', None)])
+        pending.extend(arg for arg in getattr(current, 'args', ()) if isinstance(arg, BaseException))
+
+
+def is_unreachable(error: BaseException) -> bool:
+    """连接被拒绝（服务未启动）或域名无法解析（离线）时重试无意义，沿异常链查找原因"""
+    return any(isinstance(cause, (ConnectionRefusedError, socket.gaierror)) for cause in _iter_causes(error))
+
+
+def is_connect_failure(error: BaseException) -> bool:
+    """失败发生在建立连接阶段，请求尚未发出，重试不会重复执行"""
+    import requests
+    from urllib3.exceptions import ConnectTimeoutError
+
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    # urllib3 的 NewConnectionError 是 ConnectTimeoutError 的子类
+    return any(isinstance(cause, ConnectTimeoutError) for cause in _iter_causes(error))
+
+
+Timeout = Union[float, tuple]
+
+
+def cap_timeout(timeout: Optional[Timeout], remaining: float) -> Timeout:
+    """把单次请求的超时限制在剩余总时长以内，支持 (连接, 读取) 二元组"""
+    if timeout is None:
+        return remaining
+    if isinstance(timeout, tuple):
+        return tuple(remaining if part is None else min(part, remaining) for part in timeout)
+    return min(timeout, remaining)
+
+
+class RetryPolicy:
+    """HTTP请求重试策略"""
+
+    def __init__(self, attempts: int = 3, base_delay: float = 2.0, max_delay: float = 30.0,
+                 deadline: float = 60.0, idempotent: bool = False,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.attempts = max(0, int(attempts))
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.idempotent = idempotent
+        self._sleep = sleep
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "RetryPolicy":
+        """从模型配置创建策略，缺省项使用默认值"""
+        options = dict(DEFAULT_RETRY_CONFIG)
+        options.update({k: v for k, v in config.items() if k in DEFAULT_RETRY_CONFIG and v is not None})
+        return cls(
+            attempts=options["retry_attempts"],
+            base_delay=float(options["retry_delay"]),
+            max_delay=float(options["retry_max_delay"]),
+            deadline=float(options["retry_deadline"]),
+            idempotent=bool(options["retry_idempotent"]),
+        )
+
+    def backoff(self, attempt: int) -> float:
+        """第attempt次重试前的等待时间（全抖动）"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def is_retryable(self, error: BaseException) -> bool:
+        """网络异常是否可以重试"""
+        if is_unreachable(error):
+            return False
+        return self.idempotent or is_connect_failure(error)
+
+    def call(self, send: Callable[..., Any], key: str = "default",
+             timeout: Optional[Timeout] = None) -> Any:
+        """执行请求，遇到可重试的失败时按策略重试
+
+        传入 timeout 时以 send(单次超时) 调用，单次超时不超过剩余总时长，
+        因此包括重试在内的总耗时不超过 deadline。
+        返回最后一次的响应；若最后一次是网络异常则抛出该异常。
+        """
+        import requests
+
+        retryable_status = IDEMPOTENT_RETRYABLE_STATUS if self.idempotent else RETRYABLE_STATUS
+        deadline_at = time.monotonic() + self.deadline
+        attempt = 0
+        while True:
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                if attempt:
+                    retry_stats.record(key, "exhausted")
+                raise requests.exceptions.Timeout(f"超过重试总时长 {self.deadline:g} 秒")
+
+            response, error = None, None
+            try:
+                response = send() if timeout is None else send(cap_timeout(timeout, remaining))
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+                if not self.is_retryable(e):
+                    if attempt:
+                        retry_stats.record(key, "exhausted")
+                    raise
+                error = e
+            else:
+                if response.status_code not in retryable_status:
+                    if attempt:
+                        retry_stats.record(key, "recovered")
+                    return response
+
+            delay = None
+            if response is not None:
+                delay = parse_retry_after(response.headers.get("Retry-After"))
+            if delay is None:
+                delay = self.backoff(attempt)
+
+            if attempt >= self.attempts or time.monotonic() + delay >= deadline_at:
+                if attempt:
+                    retry_stats.record(key, "exhausted")
+                if error is not None:
+                    raise error
+                return response
+
+            if response is not None:
+                response.close()  # 释放连接回连接池
+            retry_stats.record(key, "retries")
+            with span("retry.wait", key=key, attempt=attempt + 1, delay=delay):
+                self._sleep(delay)
+            attempt += 1
+
+
+def get_retry_stats() -> Dict[str, Dict[str, int]]:
+    """获取各提供商的重试统计"""
+    return retry_stats.snapshot()
@@ -0,0 +1,82 @@
+"""
+符灵请求合并 - 相同的请求同时在途时只向提供商发送一次，结果分发给所有等待者
+
+合并范围是当前进程内的所有线程；通过 fl daemon 转发的多个终端共享守护进程，因而同样会被合并。
+"""
+
+import threading
+from typing import Dict, Any, Callable, Optional, Tuple
+
+
+class _Call:
+    """一个在途请求"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """按键合并并发的相同调用"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self.calls = 0       # 实际执行的调用次数
+        self.coalesced = 0   # 搭便车共享结果的调用次数
+
+    def do(self, key: str, func: Callable[[], Any]) -> Tuple[Any, bool]:
+        """执行 func，同键的调用已在途时等待其结果；返回 (结果, 是否共享)"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.coalesced += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self.calls += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            # 先移除再唤醒，之后到达的调用会重新发起请求
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def in_flight(self) -> int:
+        """当前在途的请求数"""
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self) -> Dict[str, Any]:
+        """导出统计"""
+        with self._lock:
+            return {"calls": self.calls, "coalesced": self.coalesced, "in_flight": len(self._calls)}
+
+
+_inflight = SingleFlight()
+
+
+def coalesce(key: str, func: Callable[[], Any]) -> Any:
+    """在全局合并器中执行调用，返回结果"""
+    return _inflight.do(key, func)[0]
+
+
+def get_singleflight_stats() -> Dict[str, Any]:
+    """获取请求合并统计"""
+    return _inflight.stats()
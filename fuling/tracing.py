@@ -0,0 +1,182 @@
+"""
+符灵调用链追踪 - 基于 contextvars 的嵌套 span，可导出 Chrome / Perfetto trace-event JSON
+
+    with span("config.load"):
+        ...
+
+    @traced("provider.chat")
+    def chat(...): ...
+
+span 总会计时（供性能监控使用）；只有启用追踪器后才会保存下来用于导出。
+"""
+
+import contextvars
+import functools
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, Callable, Iterator, List, Optional
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("fuling_span", default=None)
+_span_ids = itertools.count(1)
+
+
+class Span:
+    """一次计时的操作"""
+
+    __slots__ = ("name", "span_id", "parent_id", "start", "end", "thread_id", "thread_name", "attributes")
+
+    def __init__(self, name: str, parent: Optional["Span"] = None, attributes: Optional[Dict[str, Any]] = None):
+        thread = threading.current_thread()
+        self.name = name
+        self.span_id = next(_span_ids)
+        self.parent_id = parent.span_id if parent is not None else None
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.thread_id = thread.ident
+        self.thread_name = thread.name
+        self.attributes = dict(attributes or {})
+
+    @property
+    def duration(self) -> float:
+        """耗时（秒），未结束时为到目前为止的耗时"""
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        """设置属性"""
+        self.attributes[key] = value
+
+
+class Tracer:
+    """收集已结束的 span"""
+
+    def __init__(self, max_spans: int = 100000):
+        self.enabled = False
+        self.max_spans = max_spans
+        self.dropped = 0
+        self.epoch = time.perf_counter()
+        self._spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def enable(self) -> None:
+        """开始记录"""
+        self.enabled = True
+
+    def disable(self) -> None:
+        """停止记录"""
+        self.enabled = False
+
+    def record(self, finished: Span) -> None:
+        with self._lock:
+            if len(self._spans) < self.max_spans:
+                self._spans.append(finished)
+            else:
+                self.dropped += 1
+
+    def spans(self) -> List[Span]:
+        """已结束的 span（按开始时间排序）"""
+        with self._lock:
+            return sorted(self._spans, key=lambda s: s.start)
+
+    def clear(self) -> None:
+        """清空记录"""
+        with self._lock:
+            self._spans.clear()
+            self.dropped = 0
+            self.epoch = time.perf_counter()
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        """导出为 Chrome trace-event 格式（chrome://tracing、ui.perfetto.dev 可直接打开）"""
+        pid = os.getpid()
+        events: List[Dict[str, Any]] = []
+        threads: Dict[int, str] = {}
+        for item in self.spans():
+            threads.setdefault(item.thread_id, item.thread_name)
+            args = {key: _jsonable(value) for key, value in item.attributes.items()}
+            args["span_id"] = item.span_id
+            if item.parent_id is not None:
+                args["parent_id"] = item.parent_id
+            events.append({
+                "name": item.name,
+                "cat": item.name.split(".", 1)[0],
+                "ph": "X",
+                "ts": round((item.start - self.epoch) * 1e6, 3),
+                "dur": round(item.duration * 1e6, 3),
+                "pid": pid,
+                "tid": item.thread_id,
+                "args": args,
+            })
+        for thread_id, thread_name in threads.items():
+            events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": thread_id,
+                           "args": {"name": thread_name}})
+        return {"traceEvents": events, "displayTimeUnit": "ms",
+                "otherData": {"dropped_spans": self.dropped}}
+
+    def write_chrome_trace(self, path: str) -> None:
+        """写出 trace 文件"""
+        import json
+
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_chrome_trace(), f, ensure_ascii=False)
+
+
+def _jsonable(value: Any) -> Any:
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+
+tracer = Tracer()
+
+# span 结束时的回调（如性能监控器记录耗时）
+_listeners: List[Callable[[Span], None]] = []
+
+
+def add_listener(listener: Callable[[Span], None]) -> None:
+    """注册 span 结束回调"""
+    if listener not in _listeners:
+        _listeners.append(listener)
+
+
+def current_span() -> Optional[Span]:
+    """当前上下文中正在进行的 span"""
+    return _current_span.get()
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Span]:
+    """计时一段代码，自动以当前 span 为父节点（跨线程、异步任务各自独立）"""
+    item = Span(name, _current_span.get(), attributes)
+    token = _current_span.set(item)
+    try:
+        yield item
+    except BaseException as e:
+        item.attributes["error"] = type(e).__name__
+        raise
+    finally:
+        item.end = time.perf_counter()
+        _current_span.reset(token)
+        if tracer.enabled:
+            tracer.record(item)
+        for listener in _listeners:
+            listener(item)
+
+
+def traced(name: Optional[str] = None, **attributes) -> Callable:
+    """span 装饰器，默认以函数的限定名命名"""
+    def decorator(func):
+        span_name = name or f"{func.__module__}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name, **attributes):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def get_tracer() -> Tracer:
+    """获取全局追踪器"""
+    return tracer
@@ -0,0 +1,198 @@
+"""
+符灵传输层 - 所有AI提供商共享的HTTP连接池
+"""
+
+import json
+import threading
+import time
+from typing import Dict, Any, Iterator, Optional
+from urllib.parse import urlsplit
+
+from .metrics import LatencyRegistry
+from .tracing import span, tracer
+
+DEFAULT_NETWORK_CONFIG = {
+    "pool_connections": 4,   # 每个base_url缓存的连接池数量
+    "pool_maxsize": 10,      # 单个连接池的最大连接数
+    "keep_alive": True,      # 复用TCP/TLS连接
+}
+
+
+class HTTPTransport:
+    """按base_url复用 requests.Session 的HTTP传输层"""
+
+    def __init__(self, pool_connections: int = 4, pool_maxsize: int = 10,
+                 keep_alive: bool = True):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.keep_alive = keep_alive
+        self.metrics = LatencyRegistry()
+        self._sessions: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def get_session(self, base_url: str):
+        """获取base_url对应的会话（首次使用时创建）"""
+        with self._lock:
+            session = self._sessions.get(base_url)
+            if session is None:
+                session = self._create_session()
+                self._sessions[base_url] = session
+            return session
+
+    def _create_session(self):
+        """创建带连接池的会话"""
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+
+        if not self.keep_alive:
+            session.headers["Connection"] = "close"
+
+        return session
+
+    def request(self, method: str, url: str, base_url: Optional[str] = None, **kwargs):
+        """发送请求并记录延迟（流式请求记录的是首字节时间）"""
+        base_url = (base_url or _origin(url)).rstrip('/')
+        session = self.get_session(base_url)
+
+        with span("http.request", method=method, host=urlsplit(base_url).netloc) as request_span:
+            # 追踪时记录是否新建了连接（新连接的耗时包含 TCP 与 TLS 握手）
+            opened = _connections_opened(session, url) if tracer.enabled else None
+            start = time.perf_counter()
+            try:
+                response = session.request(method, url, **kwargs)
+            except Exception:
+                self.metrics.record(base_url, time.perf_counter() - start, ok=False)
+                raise
+            finally:
+                if opened is not None:
+                    request_span.set_attribute("new_connection", _connections_opened(session, url) > opened)
+
+            self.metrics.record(base_url, time.perf_counter() - start, ok=response.status_code < 400)
+            request_span.set_attribute("status", response.status_code)
+        return response
+
+    def post(self, url: str, **kwargs):
+        """POST请求"""
+        return self.request("POST", url, **kwargs)
+
+    def get(self, url: str, **kwargs):
+        """GET请求"""
+        return self.request("GET", url, **kwargs)
+
+    def get_metrics(self) -> Dict[str, Dict[str, Any]]:
+        """各base_url的延迟统计"""
+        return self.metrics.snapshot()
+
+    def close(self):
+        """关闭所有会话"""
+        with self._lock:
+            for session in self._sessions.values():
+                try:
+                    session.close()
+                except Exception:
+                    pass
+            self._sessions.clear()
+
+
+def iter_sse_data(response) -> Iterator[str]:
+    """逐条产出SSE事件的data字段，遇到 [DONE] 结束"""
+    if 'charset' not in response.headers.get('Content-Type', ''):
+        response.encoding = 'utf-8'  # text/event-stream 默认不是latin-1
+    for line in response.iter_lines(decode_unicode=True):
+        if not line or line.startswith(':'):
+            continue
+        if line.startswith('data:'):
+            data = line[5:].strip()
+            if data == '[DONE]':
+                return
+            yield data
+
+
+def iter_openai_deltas(response) -> Iterator[str]:
+    """解析OpenAI兼容SSE流，产出文本增量"""
+    for data in iter_sse_data(response):
+        try:
+            chunk = json.loads(data)
+        except ValueError:
+            continue
+        for choice in chunk.get('choices') or []:
+            content = (choice.get('delta') or {}).get('content')
+            if content:
+                yield content
+
+
+def iter_ndjson(response) -> Iterator[Dict[str, Any]]:
+    """逐行解析NDJSON流（Ollama格式）"""
+    response.encoding = 'utf-8'
+    for line in response.iter_lines(decode_unicode=True):
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            continue
+
+
+def _connections_opened(session, url: str) -> int:
+    """URL所用适配器的各urllib3连接池累计新建的连接数"""
+    try:
+        pools = session.get_adapter(url).poolmanager.pools
+        # urllib3 的连接池容器不支持直接迭代，keys() 在其内部锁下复制
+        return sum(getattr(pools.get(key), "num_connections", 0) for key in pools.keys())
+    except Exception:
+        return 0
+
+
+def _origin(url: str) -> str:
+    """提取URL的scheme://host:port部分"""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+_transport: Optional[HTTPTransport] = None
+_transport_lock = threading.Lock()
+
+
+def get_transport() -> HTTPTransport:
+    """获取全局共享的传输层实例"""
+    global _transport
+
+    if _transport is None:
+        with _transport_lock:
+            if _transport is None:
+                _transport = HTTPTransport(**_load_network_config())
+    return _transport
+
+
+def configure_transport(**options) -> HTTPTransport:
+    """用新的连接池参数替换全局传输层"""
+    global _transport
+
+    config = dict(DEFAULT_NETWORK_CONFIG)
+    config.update({k: v for k, v in options.items() if k in DEFAULT_NETWORK_CONFIG})
+
+    with _transport_lock:
+        if _transport is not None:
+            _transport.close()
+        _transport = HTTPTransport(**config)
+    return _transport
+
+
+def _load_network_config() -> Dict[str, Any]:
+    """从符灵配置读取连接池参数"""
+    config = dict(DEFAULT_NETWORK_CONFIG)
+    try:
+        from .fuling_core import get_config
+        network = get_config().get('network', {}) or {}
+        config.update({k: v for k, v in network.items() if k in DEFAULT_NETWORK_CONFIG})
+    except Exception:
+        pass
+    return config
@@ -54,8 +54,8 @@ setup(
     },
     entry_points={
         "console_scripts": [
-            "fl=fuling.fuling_cli_enhanced:main",
-            "fuling=fuling.fuling_cli_enhanced:main",
+            "fl=fuling.daemon_client:main",
+            "fuling=fuling.daemon_client:main",
         ],
     },
     package_data={
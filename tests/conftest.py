@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+测试公共夹具
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# 添加父目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fuling import cache, circuit, fuling_core, health, ratelimit
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache_dir(tmp_path_factory, monkeypatch):
+    """健康检查、限流、熔断和响应缓存都写入临时目录，不污染 ~/.cache/fuling"""
+    cache_dir = tmp_path_factory.mktemp("cache")
+
+    def get_cache_dir():
+        return cache_dir
+
+    for module in (fuling_core, health, ratelimit, circuit, cache):
+        monkeypatch.setattr(module, "get_cache_dir", get_cache_dir)
+
+    # 直接读取 paths.cache_dir 的代码也指向临时目录
+    load_config = fuling_core.config.load_config
+
+    def load_config_with_cache_dir():
+        loaded = load_config()
+        return dict(loaded, paths=dict(loaded.get("paths") or {}, cache_dir=str(cache_dir)))
+    monkeypatch.setattr(fuling_core.config, "load_config", load_config_with_cache_dir)
+
+    # 进程内单例保存着旧目录下的文件路径
+    monkeypatch.setattr(ratelimit, "_rate_limiter", None)
+    monkeypatch.setattr(cache, "_response_cache", None)
+    return cache_dir
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+启动基准测试
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+# 添加父目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fuling import bench
+
+IMPORTTIME_OUTPUT = """\
+import time: self [us] | cumulative | imported package
+import time:       120 |        120 |   _io
+import time:       300 |        420 | site
+import time:      4000 |       4000 |     yaml.error
+import time:       500 |       4500 |   yaml
+import time:      1000 |       5500 | fuling.fuling_core
+"""
+
+
+def make_report(warm_ms):
+    """构造只含一条命令的测量结果"""
+    return {
+        "python": "3",
+        "timestamp": 0,
+        "runs": 1,
+        "commands": {
+            "fl --help": {
+                "argv": ["--help"], "exit_code": 0, "cold_ms": 300.0, "warm_ms": warm_ms,
+                "warm_min_ms": warm_ms, "import_ms": 50.0, "modules": 3,
+                "top": [{"module": "yaml", "self_ms": 4.0, "cumulative_ms": 4.5}],
+            },
+        },
+    }
+
+
+def test_parse_importtime():
+    """解析导入树的耗时和层级"""
+    records = bench.parse_importtime(IMPORTTIME_OUTPUT)
+
+    assert [r["module"] for r in records] == ["_io", "site", "yaml.error", "yaml", "fuling.fuling_core"]
+    assert [r["depth"] for r in records] == [1, 0, 2, 1, 0]
+    assert records[2]["self_us"] == 4000
+    assert records[-1]["cumulative_us"] == 5500
+
+
+def test_compare_startup():
+    """超过比例阈值且超过最小差值才算退化"""
+    baseline = make_report(100.0)
+
+    assert not bench.compare_startup(make_report(110.0), baseline, 0.2, 5)[0]["regressed"]
+    assert bench.compare_startup(make_report(130.0), baseline, 0.2, 5)[0]["regressed"]
+    assert not bench.compare_startup(make_report(130.0), baseline, 0.2, 50)[0]["regressed"]
+
+
+def test_startup_command_regression_exit_code(tmp_path, monkeypatch):
+    """保存基线后，启动变慢时返回非零退出码"""
+    baseline = tmp_path / "startup.json"
+    monkeypatch.setattr(bench, "startup_targets", lambda names=None: [["--help"]])
+
+    monkeypatch.setattr(bench, "bench_startup", lambda targets, runs, top=10: make_report(100.0))
+    runner = CliRunner()
+    result = runner.invoke(bench.bench, ["startup", "--baseline", str(baseline), "--save-baseline"])
+    assert result.exit_code == 0
+    assert json.loads(baseline.read_text(encoding="utf-8"))["commands"]["fl --help"]["warm_ms"] == 100.0
+
+    monkeypatch.setattr(bench, "bench_startup", lambda targets, runs, top=10: make_report(200.0))
+    result = runner.invoke(bench.bench, ["startup", "--baseline", str(baseline)])
+    assert result.exit_code == 1
+    assert "+100.0ms" in result.output
+
+
+def test_parse_mix():
+    """解析请求配比"""
+    assert bench.parse_mix("explain=3, chat") == {"explain": 3.0, "chat": 1.0}
+    with pytest.raises(ValueError):
+        bench.parse_mix("deploy=1")
+
+
+def test_summarize_load():
+    """汇总吞吐量、错误率和分位数"""
+    samples = [{"op": "explain", "seconds": i / 1000, "ok": i != 100, "ttft": None} for i in range(1, 101)]
+    report = bench.summarize_load(samples, 2.0, 4)
+
+    assert report["throughput_rps"] == 50
+    assert report["error_rate"] == 0.01
+    assert round(report["latency"]["p50_ms"], 1) == 50.5
+    assert report["latency"]["max_ms"] == 100
+    assert report["by_op"]["explain"]["errors"] == 1
+
+
+def test_load_command_against_mock(tmp_path):
+    """对进程内模拟服务器做负载测试并写出JSON"""
+    output = tmp_path / "load.json"
+    result = CliRunner().invoke(bench.bench, [
+        "load", "--mock", "--mock-latency", "0", "-u", "3", "-n", "12", "--seed", "1", "-o", str(output),
+    ])
+
+    assert result.exit_code == 0, result.output
+    report = json.loads(output.read_text(encoding="utf-8"))
+    assert report["requests"] == 12
+    assert report["errors"] == 0
+    assert set(report["by_op"]) <= {"explain", "generate", "chat"}
+    assert "p99.9_ms" in report["latency"]
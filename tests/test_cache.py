@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+响应缓存测试
+"""
+
+import os
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+# 添加父目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fuling.cache import ResponseCache
+
+
+MESSAGES = [{"role": "user", "content": "解释 ls -la"}]
+
+
+class TestResponseCache:
+    """测试磁盘响应缓存"""
+
+    def test_miss_then_hit(self, tmp_path):
+        """首次未命中，写入后命中"""
+        cache = ResponseCache(tmp_path)
+        key = cache.make_key("MoonshotProvider", "kimi", MESSAGES, 0.3, 1000)
+
+        assert cache.get(key) is None
+        cache.put(key, "列出文件")
+        assert cache.get(key) == "列出文件"
+
+        stats = cache.stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["entries"] == 1
+
+    def test_key_normalizes_whitespace(self):
+        """消息中的空白差异不影响缓存键"""
+        first = ResponseCache.make_key("p", "m", [{"role": "user", "content": "ls   -la\n"}])
+        second = ResponseCache.make_key("p", "m", [{"role": "user", "content": "ls -la"}])
+        assert first == second
+
+    def test_key_includes_sampling_params(self):
+        """模型和采样参数不同则缓存键不同"""
+        base = ResponseCache.make_key("p", "m", MESSAGES, 0.3, 1000)
+        assert base != ResponseCache.make_key("p", "other", MESSAGES, 0.3, 1000)
+        assert base != ResponseCache.make_key("p", "m", MESSAGES, 0.9, 1000)
+        assert base != ResponseCache.make_key("p", "m", MESSAGES, 0.3, 200)
+
+    def test_ttl_expiry(self, tmp_path):
+        """过期条目视为未命中并被删除"""
+        cache = ResponseCache(tmp_path, ttl=60)
+        cache.put("k", "旧回复")
+
+        cache.ttl = -1
+        assert cache.get("k") is None
+        assert not (tmp_path / "k.json").exists()
+
+    def test_lru_eviction(self, tmp_path):
+        """超过条目上限时淘汰最久未访问的条目"""
+        cache = ResponseCache(tmp_path, max_entries=2)
+        cache.put("a", "1")
+        cache.put("b", "2")
+
+        # 让a比b更早，再访问a使其成为最近使用
+        past = time.time() - 100
+        os.utime(tmp_path / "a.json", (past, past))
+        os.utime(tmp_path / "b.json", (past + 10, past + 10))
+        assert cache.get("a") == "1"
+
+        cache.put("c", "3")
+        assert cache.get("b") is None
+        assert cache.get("a") == "1"
+        assert cache.get("c") == "3"
+        assert cache.evictions == 1
+
+
+class TestCachedCompletion:
+    """测试聊天补全接入缓存"""
+
+    @pytest.fixture
+    def provider(self, tmp_path, monkeypatch):
+        """返回计数的假提供商，并使用临时缓存"""
+        from fuling import cache as cache_module
+        from fuling import fuling_ai
+
+        class CountingProvider(fuling_ai.MoonshotProvider):
+            calls = 0
+
+            def chat_completion(self, messages, **kwargs):
+                CountingProvider.calls += 1
+                return "回复"
+
+        provider = CountingProvider({"name": "test", "api_key": "key"})
+        monkeypatch.setattr(fuling_ai, "get_ai_provider", lambda: provider)
+        monkeypatch.setattr(cache_module, "_response_cache", ResponseCache(tmp_path))
+        return provider
+
+    def test_second_call_served_from_cache(self, provider):
+        """相同请求第二次直接读缓存"""
+        from fuling.fuling_ai import chat_completion
+
+        assert chat_completion(MESSAGES) == "回复"
+        assert chat_completion(MESSAGES) == "回复"
+        assert provider.calls == 1
+
+    def test_cache_disabled(self, provider, monkeypatch):
+        """关闭 features.enable_cache 时每次都请求提供商"""
+        from fuling import cache as cache_module
+        from fuling.fuling_ai import chat_completion
+
+        monkeypatch.setattr(cache_module, "get_config",
+                            lambda: {"features": {"enable_cache": False}})
+        chat_completion(MESSAGES)
+        chat_completion(MESSAGES)
+        assert provider.calls == 2
+
+    def test_error_not_cached(self, provider, monkeypatch):
+        """错误回复不写入缓存"""
+        from fuling.fuling_ai import chat_completion
+
+        monkeypatch.setattr(type(provider), "chat_completion",
+                            lambda self, messages, **kwargs: "❌ API错误 500")
+        chat_completion(MESSAGES)
+        from fuling.cache import get_response_cache
+        assert get_response_cache().stats()["entries"] == 0
@@ -84,6 +84,38 @@ class TestFulingCLI:
         assert result.exit_code == 0
         assert 'grep' in result.output
     
+    def test_explain_batch(self):
+        """测试批量解释文件中的命令"""
+        self.runner.invoke(cli, ['init'])
+        
+        batch_file = Path(self.temp_dir) / "deploy.sh"
+        batch_file.write_text("#!/bin/bash\nls -la\n\ndf \\\n  -h\n", encoding="utf-8")
+        
+        result = self.runner.invoke(cli, ['explain', '--batch', str(batch_file), '-j', '2'])
+        assert result.exit_code == 0
+        assert '[1/2] ls -la' in result.output
+        assert '[2/2] df -h' in result.output
+        assert result.output.index('[1/2]') < result.output.index('[2/2]')
+
+    def test_help_does_not_load_heavy_modules(self):
+        """测试帮助命令不导入AI模块、yaml和requests"""
+        import subprocess
+        script = (
+            "import sys; from fuling.daemon_client import main; sys.argv = ['fl', '--help']\n"
+            "try:\n    main()\nexcept SystemExit:\n    pass\n"
+            "print(sorted({'fuling.fuling_ai', 'fuling.daemon', 'yaml', 'requests'} & set(sys.modules)))"
+        )
+        result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True,
+                                cwd=str(Path(__file__).parent.parent))
+        assert 'daemon' in result.stdout
+        assert result.stdout.strip().endswith('[]')
+
+    def test_lazy_subcommand(self):
+        """测试延迟加载的子命令"""
+        result = self.runner.invoke(cli, ['daemon', '--help'])
+        assert result.exit_code == 0
+        assert '--status' in result.output
+
     def test_wisdom_command(self):
         """测试智慧命令"""
         result = self.runner.invoke(cli, ['wisdom'])
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Context collection tests
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+# 添加父目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from ai_cli.core import context
+from ai_cli.core.context import _empty_git_status, get_git_head, get_git_status, parse_porcelain_v2
+
+requires_git = pytest.mark.skipif(shutil.which("git") is None, reason="git not installed")
+
+OID = "1" * 40
+RECORDS = [
+    f"# branch.oid {OID}",
+    "# branch.head main",
+    "# branch.upstream origin/main",
+    "# branch.ab +2 -1",
+    f"1 M. N... 100644 100644 100644 {OID} {OID} staged.py",
+    f"1 .M N... 100644 100644 100644 {OID} {OID} dir/with space.py",
+    f"1 MM N... 100644 100644 100644 {OID} {OID} both.py",
+    f"2 R. N... 100644 100644 100644 {OID} {OID} R100 new name.py",
+    "old name.py",
+    f"u UU N... 100644 100644 100644 100644 {OID} {OID} {OID} conflict.py",
+    "? notes.txt",
+    "? build/",
+]
+
+
+def test_parse_porcelain_v2():
+    status = _empty_git_status()
+    assert parse_porcelain_v2(RECORDS, status)
+
+    assert status["is_repo"]
+    assert status["branch"] == "main"
+    assert status["upstream"] == "origin/main"
+    assert (status["ahead"], status["behind"]) == (2, 1)
+    assert status["staged"] == ["staged.py", "both.py", "new name.py"]
+    assert status["unstaged"] == ["dir/with space.py", "both.py"]
+    assert status["conflicted"] == ["conflict.py"]
+    assert status["untracked"] == ["notes.txt", "build/"]
+
+
+def test_parse_detached_and_untracked_cap():
+    status = _empty_git_status()
+    records = [f"# branch.oid {OID}", "# branch.head (detached)"] + [f"? file{i}" for i in range(10)]
+    assert not parse_porcelain_v2(records, status, max_untracked=3)
+
+    assert status["detached"] and status["branch"] is None
+    assert status["untracked"] == ["file0", "file1", "file2"]
+    assert status["untracked_truncated"]
+
+
+def test_read_records_across_chunks():
+    import io
+
+    stream = io.BytesIO("# branch.head main\0? 文件.txt\0? b\0".encode("utf-8"))
+    assert list(context._read_records(stream, chunk_size=3)) == ["# branch.head main", "? 文件.txt", "? b"]
+
+
+def git(repo, *args):
+    subprocess.run(["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+                   cwd=repo, check=True, capture_output=True)
+
+
+@requires_git
+def test_get_git_status_in_repository(tmp_path, monkeypatch):
+    git(tmp_path, "init", "-q", "-b", "work")
+    (tmp_path / "tracked.txt").write_text("one\n")
+    git(tmp_path, "add", "tracked.txt")
+    git(tmp_path, "commit", "-q", "-m", "init")
+    (tmp_path / "tracked.txt").write_text("two\n")
+    (tmp_path / "added.txt").write_text("new\n")
+    git(tmp_path, "add", "added.txt")
+    for i in range(5):
+        (tmp_path / f"untracked{i}.txt").write_text("")
+    monkeypatch.chdir(tmp_path)
+
+    status = get_git_status(max_untracked=None)
+    assert status["is_repo"] and status["branch"] == "work"
+    assert status["staged"] == ["added.txt"]
+    assert status["unstaged"] == ["tracked.txt"]
+    assert len(status["untracked"]) == 5
+
+    capped = get_git_status(max_untracked=2)
+    assert len(capped["untracked"]) == 2 and capped["untracked_truncated"]
+    assert capped["staged"] == ["added.txt"]
+
+    skipped = get_git_status(max_untracked=0)
+    assert skipped["untracked"] == [] and not skipped["untracked_truncated"]
+
+
+@requires_git
+def test_get_git_status_outside_repository(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("GIT_CEILING_DIRECTORIES", str(tmp_path.parent))
+    assert get_git_status() == _empty_git_status()
+
+
+def git_output(repo, *args):
+    return subprocess.run(["git", *args], cwd=repo, check=True, capture_output=True, text=True).stdout.strip()
+
+
+@requires_git
+def test_git_head_fast_path(tmp_path, monkeypatch):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    git(repo, "init", "-q", "-b", "main")
+    assert get_git_head(str(repo))["branch"] == "main"  # 尚无提交
+    assert get_git_head(str(repo))["oid"] is None
+
+    (repo / "a.txt").write_text("a\n")
+    git(repo, "add", "a.txt")
+    git(repo, "commit", "-q", "-m", "init")
+    oid = git_output(repo, "rev-parse", "HEAD")
+    (repo / "sub" / "dir").mkdir(parents=True)
+
+    head = get_git_head(str(repo / "sub" / "dir"))
+    assert head["is_repo"] and not head["detailed"]
+    assert (head["branch"], head["oid"]) == ("main", oid)
+
+    git(repo, "pack-refs", "--all")
+    assert not (repo / ".git" / "refs" / "heads" / "main").exists()
+    assert get_git_head(str(repo))["oid"] == oid
+
+    git(repo, "worktree", "add", "-q", "-b", "feature", str(tmp_path / "linked"))
+    linked = get_git_head(str(tmp_path / "linked"))
+    assert (linked["branch"], linked["oid"]) == ("feature", oid)
+
+    git(repo, "checkout", "-q", "--detach")
+    detached = get_git_head(str(repo))
+    assert detached["detached"] and detached["branch"] is None and detached["oid"] == oid
+
+    # 与 git 一样不进入天花板目录
+    monkeypatch.setenv("GIT_CEILING_DIRECTORIES", str(repo / "sub"))
+    assert get_git_head(str(repo / "sub" / "dir")) == dict(_empty_git_status(), detailed=False)
+    assert get_git_head(str(repo))["is_repo"]
+
+
+@requires_git
+def test_git_status_without_detail_does_not_fork(tmp_path, monkeypatch):
+    git(tmp_path, "init", "-q", "-b", "trunk")
+    monkeypatch.chdir(tmp_path)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("git should not be run")
+    monkeypatch.setattr(subprocess, "Popen", fail)
+    status = get_git_status(detail=False)
+    assert status["is_repo"] and status["branch"] == "trunk"
+
+    # GIT_DIR 等覆盖只有 git 本身能正确处理
+    monkeypatch.setenv("GIT_DIR", str(tmp_path / ".git"))
+    assert get_git_head() is None
+    with pytest.raises(AssertionError):
+        get_git_status(detail=False)
+
+
+@pytest.fixture
+def counted(monkeypatch):
+    """Count how often each context source is recomputed"""
+    calls = {}
+
+    def wrap(name):
+        original = getattr(context, name)
+
+        def counting(*args, **kwargs):
+            calls[name] = calls.get(name, 0) + 1
+            return original(*args, **kwargs)
+        monkeypatch.setattr(context, name, counting)
+
+    for name in ("get_directory_contents", "get_file_types", "get_git_status",
+                 "get_system_info", "get_recent_commands"):
+        wrap(name)
+    context.clear_context_cache()
+    yield calls
+    context.clear_context_cache()
+
+
+@requires_git
+def test_context_cache_invalidates_per_field(tmp_path, monkeypatch, counted):
+    history = tmp_path / "history"
+    history.write_text("ls\n")
+    monkeypatch.setattr(context, "get_history_files", lambda: [str(history)])
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    git(repo, "init", "-q", "-b", "main")
+    monkeypatch.chdir(repo)
+
+    first = context.get_context().to_dict()
+    second = context.get_context().to_dict()
+    assert second["contents"] is first["contents"]
+    assert second["git"] == first["git"]
+    assert counted == dict.fromkeys(counted, 1)
+
+    (repo / "new.py").write_text("")
+    third = context.get_context()
+    assert "new.py" in third["contents"] and third["file_types"][".py"] == 1
+    assert counted["get_directory_contents"] == counted["get_file_types"] == 2
+    assert counted["get_git_status"] == 1  # 索引未变
+
+    git(repo, "add", "new.py")
+    assert context.get_context()["git"]["staged"] == ["new.py"]
+    assert counted["get_git_status"] == 2
+
+    with open(history, "a") as f:
+        f.write("pwd\n")
+    assert context.get_context()["recent_commands"] == ["ls", "pwd"]
+    assert counted["get_recent_commands"] == 2
+    assert counted["get_system_info"] == 1
+
+    context.get_context(use_cache=False)["system"]
+    assert counted["get_system_info"] == 2
+
+
+def test_context_cache_keyed_by_directory(tmp_path, monkeypatch, counted):
+    for name in ("a", "b"):
+        (tmp_path / name).mkdir()
+        (tmp_path / name / f"{name}.txt").write_text("")
+
+    monkeypatch.chdir(tmp_path / "a")
+    assert context.get_context()["contents"] == ["a.txt"]
+    monkeypatch.chdir(tmp_path / "b")
+    assert context.get_context()["contents"] == ["b.txt"]
+    monkeypatch.chdir(tmp_path / "a")
+    assert context.get_context()["contents"] == ["a.txt"]
+    assert counted["get_directory_contents"] == 2
+
+
+@requires_git
+def test_git_status_refreshed_after_ttl(tmp_path, monkeypatch, counted):
+    git(tmp_path, "init", "-q")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(context, "_load_context_options",
+                        lambda: {"max_untracked": 10, "git_ttl": 0})
+    context.get_context()["git"].load()
+    context.get_context()["git"].load()
+    assert counted["get_git_status"] == 2
+
+
+def test_lazy_context_computes_only_accessed_fields(tmp_path, monkeypatch, counted):
+    (tmp_path / "script.py").write_text("")
+    monkeypatch.chdir(tmp_path)
+
+    ctx = context.get_context()
+    assert counted == {}
+    assert ctx["file_types"] == {".py": 1}
+    assert counted == {"get_file_types": 1}
+    assert ctx["file_types"] is ctx["file_types"]
+    assert counted == {"get_file_types": 1}
+
+    # 旧的 dict 接口仍然可用
+    assert set(ctx) == {"directory", "contents", "git", "system", "recent_commands", "file_types", "environment"}
+    assert len(ctx) == 7 and "git" in ctx
+    assert ctx.get("missing", "default") == "default"
+    assert ctx["directory"] == os.getcwd()
+    with pytest.raises(KeyError):
+        ctx["missing"]
+    json.dumps(ctx.to_dict())
+
+
+@requires_git
+def test_lazy_git_status_reads_head_without_forking(tmp_path, monkeypatch, counted):
+    git(tmp_path, "init", "-q", "-b", "main")
+    (tmp_path / "new.txt").write_text("")
+    monkeypatch.chdir(tmp_path)
+
+    git_status = context.get_context()["git"]
+    assert git_status["is_repo"] and git_status["branch"] == "main"
+    assert "get_git_status" not in counted
+
+    assert git_status["untracked"] == ["new.txt"]
+    assert git_status.get("detailed") is True
+    assert counted["get_git_status"] == 1
+
+
+def test_prefetch_runs_fields_concurrently(monkeypatch):
+    import threading
+
+    barrier = threading.Barrier(3, timeout=5)
+
+    def slow(value):
+        def load():
+            barrier.wait()  # 只有三个字段同时计算时才能通过
+            return value
+        return load
+
+    ctx = context.LazyContext({"a": slow(1), "b": slow(2), "c": slow(3)})
+    ctx.prefetch()
+    assert dict(ctx) == {"a": 1, "b": 2, "c": 3}
+    assert sorted(ctx.computed()) == ["a", "b", "c"]
@@ -163,6 +163,70 @@ class TestAIProviders:
         provider = get_ai_provider()
         assert isinstance(provider, LocalProvider)
     
+    def test_get_ai_provider_reused(self):
+        """测试提供商在进程内只构建一次"""
+        from fuling.fuling_ai import get_ai_provider, reset_provider_registry
+        
+        reset_provider_registry()
+        assert get_ai_provider() is get_ai_provider()
+    
+    def test_get_ai_provider_uses_health_probe(self):
+        """测试构建提供商时只做健康探测，不调用模型"""
+        from unittest.mock import patch
+        from fuling import fuling_ai
+        
+        model_config = {
+            "provider": "moonshot",
+            "name": "kimi-k2-turbo-preview",
+            "api_key": "test_key",
+            "base_url": "https://api.moonshot.cn/v1",
+        }
+        
+        fuling_ai.reset_provider_registry()
+        with patch.object(fuling_ai, 'get_model_config', return_value=model_config), \
+             patch('fuling.health.get_cached_health', return_value=None), \
+             patch('fuling.health.set_cached_health'), \
+             patch.object(fuling_ai.MoonshotProvider, 'health_check', return_value=True) as probe, \
+             patch.object(fuling_ai.MoonshotProvider, 'chat_completion') as chat:
+            provider = fuling_ai.get_ai_provider()
+            fuling_ai.get_ai_provider()
+        
+        assert isinstance(provider, fuling_ai.MoonshotProvider)
+        assert probe.call_count == 1
+        chat.assert_not_called()
+        fuling_ai.reset_provider_registry()
+    
+    def test_explain_batch_keeps_order(self):
+        """测试批量解释并发执行且按输入顺序返回"""
+        import threading
+        import time
+        from unittest.mock import patch
+        from fuling import fuling_ai
+        
+        lock = threading.Lock()
+        state = {"running": 0, "peak": 0}
+        
+        def slow_explain(command, context=None):
+            with lock:
+                state["running"] += 1
+                state["peak"] = max(state["peak"], state["running"])
+            time.sleep(0.05 if command == "first" else 0.01)
+            with lock:
+                state["running"] -= 1
+            return f"解释 {command}"
+        
+        commands = ["first", "second", "third", "fourth", "fifth"]
+        seen = []
+        with patch.object(fuling_ai, 'explain_command', side_effect=slow_explain):
+            results = fuling_ai.explain_batch(
+                commands, concurrency=2,
+                on_result=lambda index, command, result: seen.append(index),
+            )
+        
+        assert results == [f"解释 {c}" for c in commands]
+        assert seen == list(range(len(commands)))
+        assert state["peak"] == 2
+    
     def test_explain_command_function(self):
         """测试解释命令函数"""
         from fuling.fuling_ai import explain_command
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+守护进程与客户端测试
+"""
+
+import subprocess
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+import pytest
+
+# 添加父目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fuling import daemon, daemon_client
+
+pytestmark = pytest.mark.skipif(not hasattr(daemon.socketserver, "UnixStreamServer"),
+                                reason="需要Unix套接字")
+
+
+@pytest.fixture
+def instance():
+    """在临时套接字上启动守护进程（AF_UNIX路径长度有限，不使用 tmp_path）"""
+    directory = tempfile.mkdtemp(prefix="fl-")
+    path = str(Path(directory) / "d.sock")
+
+    instance = daemon.FulingDaemon(path)
+    thread = threading.Thread(target=instance.serve_forever, daemon=True)
+    thread.start()
+    yield instance
+    instance.shutdown()
+    instance.server_close()
+    thread.join(5)
+
+
+@pytest.fixture
+def server(instance):
+    """守护进程的套接字路径"""
+    return instance.path
+
+
+class FakeConnection:
+    """记录守护进程发给客户端的消息"""
+
+    def __init__(self):
+        self.messages = []
+
+    def send(self, message):
+        self.messages.append(message)
+
+    def output(self, kind):
+        return "".join(message.get(kind, "") for message in self.messages)
+
+
+def run_client(argv, path, stdin=""):
+    """在子进程中以客户端身份执行命令，返回 (退出码, 输出)"""
+    script = ("import sys; from fuling.daemon_client import run_remote; "
+              f"code = run_remote({argv!r}, {path!r}); sys.exit(99 if code is None else code)")
+    result = subprocess.run([sys.executable, "-c", script], input=stdin, capture_output=True,
+                            text=True, cwd=str(Path(__file__).parent.parent), timeout=30)
+    return result.returncode, result.stdout
+
+
+def test_ping(server):
+    """控制请求返回进程信息"""
+    reply = daemon_client.request({"op": "ping"}, server)
+    assert reply["ok"] is True
+    assert reply["served"] == 0
+
+
+def test_explain_through_daemon(server, monkeypatch):
+    """命令在守护进程中执行，输出转发给客户端"""
+    from fuling import fuling_ai
+    monkeypatch.setattr(fuling_ai, "explain_command", lambda command, context=None: f"解读: {command}")
+
+    code, output = run_client(["explain", "ls -al"], server)
+
+    assert code == 0
+    assert "解读: ls -al" in output
+    assert daemon_client.request({"op": "ping"}, server)["served"] == 1
+
+
+def test_stdin_forwarded(server, monkeypatch):
+    """守护进程读取输入时向客户端请求"""
+    from fuling import fuling_cli_enhanced
+
+    @fuling_cli_enhanced.cli.command(name="echo-test")
+    def echo_test():
+        fuling_cli_enhanced.click.echo(f"收到 {input().strip()}")
+
+    monkeypatch.setattr(daemon, "DAEMON_COMMANDS", daemon.DAEMON_COMMANDS | {"echo-test"})
+    try:
+        code, output = run_client(["echo-test"], server, stdin="符咒\n")
+    finally:
+        del fuling_cli_enhanced.cli.commands["echo-test"]
+
+    assert code == 0
+    assert "收到 符咒" in output
+
+
+def test_usage_error_exit_code(server):
+    """命令行错误的退出码原样返回"""
+    code, _ = run_client(["generate"], server)
+    assert code == 2
+
+
+def test_no_daemon_falls_back(tmp_path):
+    """守护进程不可用时返回None，由本进程执行"""
+    assert daemon_client.run_remote(["explain", "ls"], str(tmp_path / "missing.sock")) is None
+    assert daemon_client.request({"op": "ping"}, str(tmp_path / "missing.sock")) is None
+
+
+def test_should_use_daemon(monkeypatch):
+    """只转发支持的子命令，依赖本地文件的选项在本进程执行"""
+    monkeypatch.delenv("FULING_NO_DAEMON", raising=False)
+    assert daemon_client.should_use_daemon(["explain", "ls"])
+    assert not daemon_client.should_use_daemon(["power"])
+    assert not daemon_client.should_use_daemon([])
+    assert not daemon_client.should_use_daemon(["generate", "x", "-o", "out.py"])
+    assert not daemon_client.should_use_daemon(["generate", "x", "--output=out.py"])
+
+    monkeypatch.setenv("FULING_NO_DAEMON", "1")
+    assert not daemon_client.should_use_daemon(["explain", "ls"])
+
+
+def test_socket_private(instance):
+    """套接字只对当前用户可读写，创建后恢复原来的 umask"""
+    import os
+    import stat
+
+    assert stat.S_IMODE(os.stat(instance.path).st_mode) == 0o600
+    current = os.umask(0o022)
+    os.umask(current)
+    assert current != 0o177
+
+
+def test_stderr_keeps_its_own_tty_flag(instance, monkeypatch):
+    """标准错误按客户端 stderr 的 isatty 决定，命令异常写入标准错误"""
+    from fuling import fuling_cli_enhanced
+
+    @fuling_cli_enhanced.cli.command(name="tty-test")
+    def tty_test():
+        print(sys.stdout.isatty(), sys.stderr.isatty())
+
+    @fuling_cli_enhanced.cli.command(name="crash-test")
+    def crash_test():
+        raise RuntimeError("炸了")
+
+    try:
+        connection = FakeConnection()
+        assert instance.run_cli(["tty-test"], connection, {"stdout": True, "stderr": False}) == 0
+        assert connection.output("out") == "True False\n"
+
+        connection = FakeConnection()
+        assert instance.run_cli(["crash-test"], connection, {}) == 1
+        assert "炸了" in connection.output("err")
+        assert connection.output("out") == ""
+    finally:
+        del fuling_cli_enhanced.cli.commands["tty-test"]
+        del fuling_cli_enhanced.cli.commands["crash-test"]
+
+
+def test_refresh_config_swaps_in_loaded_config(instance, tmp_path, monkeypatch):
+    """配置变化时整体替换为新配置，加载期间其他线程仍看到旧配置"""
+    from fuling import fuling_core
+
+    config_file = tmp_path / "config.yaml"
+    config_file.write_text("theme:\n  name: modern\n", encoding="utf-8")
+    old = {"theme": {"name": "ancient"}}
+    monkeypatch.setattr(fuling_core.config, "config_dir", tmp_path)
+    monkeypatch.setattr(fuling_core.config, "config_file", config_file)
+    monkeypatch.setattr(fuling_core.config, "_config", old)
+
+    seen_during_load = []
+    load_config = fuling_core.FulingConfig.load_config
+
+    def recording_load(self):
+        seen_during_load.append(fuling_core.config._config)
+        return load_config(self)
+    monkeypatch.setattr(fuling_core.FulingConfig, "load_config", recording_load)
+
+    instance.refresh_config()
+    assert seen_during_load == [old]
+    assert fuling_core.config._config == {"theme": {"name": "modern"}}
+
+    instance.refresh_config()  # 未变化时不重新加载
+    assert len(seen_during_load) == 1
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+故障转移链与熔断器测试
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# 添加父目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fuling import fuling_ai
+from fuling.circuit import CircuitBreaker, CLOSED, OPEN
+
+
+class FakeClock:
+    """可手动推进的时钟"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class ScriptedProvider(fuling_ai.AIProvider):
+    """按预设返回回复并记录调用次数的提供商"""
+
+    def __init__(self, reply, healthy=True):
+        super().__init__({"name": "fake"})
+        self.reply = reply
+        self.healthy = healthy
+        self.calls = 0
+
+    def chat_completion(self, messages, **kwargs):
+        self.calls += 1
+        return self.reply
+
+    def health_check(self):
+        return self.healthy
+
+
+@pytest.fixture(autouse=True)
+def isolated(monkeypatch):
+    """不使用响应缓存（熔断状态由 conftest 写入临时目录）"""
+    monkeypatch.setattr(fuling_ai, "_get_cache", lambda provider: None)
+
+
+class TestCircuitBreaker:
+    """测试熔断器状态转换"""
+
+    def test_opens_after_threshold(self):
+        """连续失败达到阈值后熔断"""
+        breaker = CircuitBreaker("p", failure_threshold=2)
+        breaker.record_failure()
+        assert breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == OPEN
+        assert not breaker.allow()
+
+    def test_success_resets_failures(self):
+        """成功后重新计数"""
+        breaker = CircuitBreaker("p", failure_threshold=2)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        assert breaker.state == CLOSED
+
+    def test_half_open_probe_closes(self):
+        """熔断到期后后台探测成功则恢复"""
+        clock = FakeClock()
+        breaker = CircuitBreaker("p", probe=lambda: True, failure_threshold=1,
+                                 reset_timeout=30, clock=clock)
+        breaker.record_failure()
+
+        clock.now += 10
+        assert not breaker.allow()
+        clock.now += 30
+        assert not breaker.allow()  # 探测在后台进行，本次请求仍然跳过
+        breaker.wait_probe(5)
+        assert breaker.state == CLOSED
+        assert breaker.allow()
+
+    def test_half_open_probe_failure_reopens(self):
+        """探测失败则重新熔断"""
+        clock = FakeClock()
+        breaker = CircuitBreaker("p", probe=lambda: False, failure_threshold=1,
+                                 reset_timeout=30, clock=clock)
+        breaker.record_failure()
+        clock.now += 31
+        breaker.allow()
+        breaker.wait_probe(5)
+        assert breaker.state == OPEN
+        assert not breaker.allow()
+
+    def test_state_shared_between_instances(self):
+        """状态持久化，新进程中的熔断器能看到"""
+        CircuitBreaker("p", failure_threshold=1).record_failure()
+        assert not CircuitBreaker("p", failure_threshold=1).allow()
+
+
+class TestFailoverProvider:
+    """测试故障转移链"""
+
+    def test_falls_through_to_next(self):
+        """首个提供商失败时使用下一个"""
+        primary = ScriptedProvider("⏱️ 请求超时")
+        backup = ScriptedProvider("备用回复")
+        provider = fuling_ai.FailoverProvider([("primary", primary), ("backup", backup)])
+
+        assert provider.chat_completion([{"role": "user", "content": "hi"}]) == "备用回复"
+        assert primary.calls == 1
+
+    def test_open_circuit_skipped(self):
+        """熔断后的提供商直接跳过，不再等待"""
+        primary = ScriptedProvider("🔌 网络连接失败", healthy=False)
+        backup = ScriptedProvider("备用回复")
+        provider = fuling_ai.FailoverProvider([("primary", primary), ("backup", backup)],
+                                              failure_threshold=2)
+
+        for _ in range(5):
+            provider.chat_completion([{"role": "user", "content": "hi"}])
+        assert primary.calls == 2
+        assert backup.calls == 5
+        assert provider.circuit_states()["primary"] == OPEN
+
+    def test_stream_falls_through(self):
+        """流式请求首段是错误时换下一个提供商"""
+        primary = ScriptedProvider("❌ HTTP错误 502")
+        backup = ScriptedProvider("备用")
+        provider = fuling_ai.FailoverProvider([("primary", primary), ("backup", backup)])
+
+        assert list(provider.stream_chat_completion([{"role": "user", "content": "hi"}])) == ["备用"]
+
+    def test_local_always_answers(self):
+        """全部失败时本地模式兜底"""
+        local = fuling_ai.LocalProvider({"name": "local"})
+        provider = fuling_ai.FailoverProvider([("primary", ScriptedProvider("❌ 错误")), ("local", local)])
+
+        assert "天眼符" in provider.explain_command("ls -al")
+
+
+def test_get_ai_provider_builds_chain(monkeypatch):
+    """配置 model.failover 时构建故障转移链，跳过未配置密钥的提供商"""
+    model_config = {
+        "provider": "moonshot",
+        "api_key": "moonshot-key",
+        "failover": ["deepseek", "moonshot", "ollama"],
+        "timeout": 7,
+    }
+    monkeypatch.setattr(fuling_ai, "get_model_config", lambda: model_config)
+    monkeypatch.setattr(fuling_ai, "get_providers_config", lambda: {"deepseek": {"api_key": ""}})
+
+    fuling_ai.reset_provider_registry()
+    try:
+        provider = fuling_ai.get_ai_provider()
+    finally:
+        fuling_ai.reset_provider_registry()
+
+    assert isinstance(provider, fuling_ai.FailoverProvider)
+    assert [name for name, _ in provider.members] == ["moonshot", "ollama", "local"]
+    assert provider.members[1][1].timeout == 7
+
+
+class SlowProvider(ScriptedProvider):
+    """先等待再返回的提供商"""
+
+    def __init__(self, reply, seconds):
+        super().__init__(reply)
+        self.seconds = seconds
+
+    def chat_completion(self, messages, **kwargs):
+        import time
+        time.sleep(self.seconds)
+        return super().chat_completion(messages, **kwargs)
+
+
+class TestHedging:
+    """测试对冲请求"""
+
+    HEDGE = {"enabled": True, "delay": 0.05, "min_delay": 0.01, "min_samples": 20}
+
+    def test_hedged_call_alternate_wins(self):
+        """主请求超过等待时间时备用请求胜出"""
+        import time
+        from fuling.hedge import HedgeStats, hedged_call, HEDGE
+
+        stats = HedgeStats()
+        result, winner, hedged = hedged_call(
+            lambda: time.sleep(1) or "主",
+            lambda: "备",
+            0.05, fuling_ai.is_error_response, stats,
+        )
+        assert (result, winner, hedged) == ("备", HEDGE, True)
+        assert stats.snapshot()["hedge_wins"] == 1
+
+    def test_hedged_call_fast_primary(self):
+        """主请求及时返回时不发备用请求"""
+        from fuling.hedge import HedgeStats, hedged_call, PRIMARY
+
+        stats = HedgeStats()
+        called = []
+        result, winner, hedged = hedged_call(
+            lambda: "主", lambda: called.append(1) or "备",
+            1.0, fuling_ai.is_error_response, stats,
+        )
+        assert (result, winner, hedged) == ("主", PRIMARY, False)
+        assert called == []
+        assert stats.snapshot()["primary_wins"] == 1
+
+    def test_hedged_call_primary_error_during_race(self):
+        """备用请求失败时等待主请求的结果"""
+        import time
+        from fuling.hedge import HedgeStats, hedged_call, PRIMARY
+
+        result, winner, _ = hedged_call(
+            lambda: time.sleep(0.2) or "主",
+            lambda: "❌ 备用失败",
+            0.05, fuling_ai.is_error_response, HedgeStats(),
+        )
+        assert (result, winner) == ("主", PRIMARY)
+
+    def test_failover_provider_hedges(self):
+        """开启对冲后，慢的主提供商被备用提供商抢先"""
+        slow = SlowProvider("慢回复", 1.0)
+        fast = ScriptedProvider("快回复")
+        provider = fuling_ai.FailoverProvider([("slow", slow), ("fast", fast)], hedge=self.HEDGE)
+
+        assert provider.chat_completion([{"role": "user", "content": "hi"}]) == "快回复"
+        assert fast.calls == 1
+
+    def test_failover_provider_primary_fails_fast(self):
+        """主提供商很快报错时不对冲，按顺序转移"""
+        broken = ScriptedProvider("🔌 网络连接失败")
+        backup = ScriptedProvider("备用回复")
+        provider = fuling_ai.FailoverProvider([("broken", broken), ("backup", backup)],
+                                              hedge={**self.HEDGE, "delay": 1.0})
+
+        assert provider.chat_completion([{"role": "user", "content": "hi"}]) == "备用回复"
+        assert broken.calls == 1
+        assert backup.calls == 1
+
+
+def test_health_cache_prunes_expired_entries(isolated_cache_dir):
+    """写入健康检查结果时删除过期条目，旧地址的键不会一直累积"""
+    import json
+    import time
+    from fuling import health
+
+    path = isolated_cache_dir / health.HEALTH_FILE
+    path.write_text(json.dumps({
+        "OpenAIProvider|http://127.0.0.1:1/v1|x": {"ok": True, "checked_at": time.time() - 3600},
+        "MoonshotProvider|https://api.moonshot.cn/v1|y": {"ok": True, "checked_at": time.time()},
+    }))
+
+    health.set_cached_health("OpenAIProvider|http://127.0.0.1:2/v1|x", False, ttl=300)
+    data = json.loads(path.read_text())
+    assert set(data) == {"MoonshotProvider|https://api.moonshot.cn/v1|y", "OpenAIProvider|http://127.0.0.1:2/v1|x"}
+    assert health.get_cached_health("OpenAIProvider|http://127.0.0.1:2/v1|x") is False
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+有界 LRU + TTL 缓存测试
+"""
+
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+# 添加父目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fuling.lru import LRUCache, make_key
+
+
+def test_lru_eviction_order():
+    cache = LRUCache(max_entries=2, shards=1)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # a 变为最近访问
+    cache.put("c", 3)
+
+    assert "b" not in cache
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_byte_limit():
+    cache = LRUCache(max_entries=100, max_bytes=100, shards=1, sizeof=len)
+    cache.put("a", "x" * 60)
+    cache.put("b", "y" * 60)
+    assert "a" not in cache and "b" in cache
+    assert cache.stats()["bytes"] == 60
+
+    cache.put("huge", "z" * 200)  # 单个值超过上限，不缓存
+    assert "huge" not in cache
+    assert cache.get("b") == "y" * 60
+
+
+def test_ttl_expiry_lazy_and_sweep():
+    cache = LRUCache(ttl=0.05, shards=1, sweep_interval=0.05)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    time.sleep(0.08)
+
+    assert cache.get("a") is None  # 读取时惰性删除
+    cache.put("c", 3)              # 写入触发整段清理，b 也被删除
+    assert len(cache) == 1
+    assert cache.stats()["expirations"] == 2
+
+
+def test_per_entry_ttl_and_default():
+    cache = LRUCache(ttl=60)
+    cache.put("short", 1, ttl=0)
+    assert cache.get("short", "missing") == "missing"
+
+
+def test_bounded_under_concurrent_writes():
+    cache = LRUCache(max_entries=64, shards=8)
+
+    def worker(offset):
+        for i in range(2000):
+            cache.put((offset, i), i)
+            cache.get((offset, i - 1))
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = cache.stats()
+    assert len(cache) <= 64
+    assert stats["entries"] == len(cache)
+    assert stats["hits"] + stats["misses"] == 8 * 2000
+
+
+def test_disk_tier_survives_new_instance(tmp_path):
+    first = LRUCache(ttl=60, disk_dir=tmp_path)
+    first.put(("ls", "-la"), {"answer": 42})
+
+    second = LRUCache(ttl=60, disk_dir=tmp_path)
+    assert second.get(("ls", "-la")) == {"answer": 42}
+    assert second.stats()["disk_hits"] == 1
+
+    second.put("unserializable", object())  # 只缓存在内存中
+    assert "unserializable" in second
+    assert LRUCache(ttl=60, disk_dir=tmp_path).get("unserializable") is None
+
+
+def test_make_key_handles_unhashable_arguments():
+    assert make_key((1, 2), {"b": 1, "a": 2}) == make_key((1, 2), {"a": 2, "b": 1})
+    key = make_key(([1, 2],), {"options": {"x": [1]}})
+    hash(key)
+    assert key == make_key(([1, 2],), {"options": {"x": [1]}})
+    assert key != make_key(([1, 3],), {"options": {"x": [1]}})
+
+
+def test_invalid_limits():
+    with pytest.raises(ValueError):
+        LRUCache(max_entries=0)
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+模拟提供商服务器测试
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import pytest
+import requests
+
+# 添加父目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fuling import ratelimit
+from fuling.mockserver import MockOptions, parse_latency, serve_in_background, tokenize
+
+
+@pytest.fixture
+def mock():
+    """启动模拟服务器，测试可修改 mock.options"""
+    server = serve_in_background(MockOptions(reply="你好 world", seed=1))
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_parse_latency():
+    """解析各种延迟分布"""
+    import random
+    rng = random.Random(0)
+    assert parse_latency("0.25")(rng) == 0.25
+    assert 0.1 <= parse_latency("uniform:0.1,0.2")(rng) <= 0.2
+    assert parse_latency("lognormal:0.3,0.5")(rng) > 0
+    with pytest.raises(ValueError):
+        parse_latency("gamma:1")
+    with pytest.raises(ValueError):
+        parse_latency("uniform:1")
+
+
+def test_tokenize():
+    """汉字逐字切分，其余按单词"""
+    assert tokenize("你好 world") == ["你", "好", " world"]
+
+
+def test_openai_completion(mock):
+    """非流式补全返回OpenAI格式"""
+    response = requests.post(f"{mock.url}/v1/chat/completions",
+                             json={"messages": [{"role": "user", "content": "hi"}]})
+    body = response.json()
+    assert body["choices"][0]["message"]["content"] == "你好 world"
+    assert body["usage"]["completion_tokens"] == 3
+
+
+def test_models(mock):
+    """模型列表"""
+    assert requests.get(f"{mock.url}/v1/models").json()["data"][0]["id"] == "fuling-mock"
+    assert requests.get(f"{mock.url}/api/tags").json()["models"][0]["name"] == "fuling-mock"
+
+
+def test_error_injection(mock):
+    """按概率注入错误，429 带 Retry-After"""
+    mock.options.error_429 = 1.0
+    response = requests.post(f"{mock.url}/v1/chat/completions", json={"messages": []})
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "1"
+
+    mock.options.error_429, mock.options.error_500 = 0.0, 1.0
+    assert requests.post(f"{mock.url}/api/chat", json={"stream": False}).status_code == 500
+    assert requests.get(f"{mock.url}/stats").json()["fault_500"] == 1
+
+
+def test_timeout_injection(mock):
+    """超时注入时不返回响应"""
+    mock.options.timeout_rate, mock.options.timeout_seconds = 1.0, 0.5
+    with pytest.raises(requests.exceptions.RequestException):
+        requests.post(f"{mock.url}/v1/chat/completions", json={}, timeout=0.2)
+
+
+def test_token_throttling(mock):
+    """按速率逐个输出token"""
+    import time
+    mock.options.tokens_per_second = 20
+    start = time.perf_counter()
+    requests.post(f"{mock.url}/v1/chat/completions", json={"messages": []})
+    assert time.perf_counter() - start >= 3 / 20
+
+
+def test_openai_provider_against_mock(mock):
+    """OpenAI兼容提供商的普通与流式请求"""
+    from fuling.fuling_ai import MoonshotProvider
+    provider = MoonshotProvider({"name": "moonshot", "api_key": "test", "base_url": f"{mock.url}/v1"})
+    messages = [{"role": "user", "content": "hi"}]
+
+    assert provider.chat_completion(messages) == "你好 world"
+    assert "".join(provider.stream_chat_completion(messages)) == "你好 world"
+    assert provider.health_check()
+
+
+def test_ollama_provider_against_mock(mock):
+    """Ollama提供商的普通与NDJSON流式请求"""
+    from fuling.ollama_provider import OllamaProvider
+    provider = OllamaProvider({"name": "ollama", "base_url": mock.url})
+    messages = [{"role": "user", "content": "hi"}]
+
+    assert provider.chat_completion(messages) == "你好 world"
+    assert list(provider.stream_chat_completion(messages)) == ["你", "好", " world"]
+    assert provider.health_check()
+    assert requests.get(f"{mock.url}/stats").json()["streams"] == 1
+
+
+def test_batch_explain_not_throttled_for_local_provider(mock, monkeypatch):
+    """默认限流配置下，本机提供商的批量解释不排队等待"""
+    import time
+    from fuling import fuling_ai
+    from fuling.cache import ResponseCache
+    from fuling.fuling_ai import MoonshotProvider
+
+    provider = MoonshotProvider({"name": "moonshot", "api_key": "test", "base_url": f"{mock.url}/v1",
+                                 "retry_attempts": 0})
+    monkeypatch.setattr(ratelimit, "get_config", lambda: {})  # 使用默认的 rate_limit 配置
+    monkeypatch.setattr(fuling_ai, "get_ai_provider", lambda: provider)
+    monkeypatch.setattr(fuling_ai, "_get_cache", lambda provider: None)
+    waits = []
+    monkeypatch.setattr(ratelimit.RateLimiter, "acquire", lambda self, key: waits.append(key) or 0.0)
+
+    burst = ratelimit.DEFAULT_RATE_LIMIT_CONFIG["burst"]
+    commands = [f"echo {i}" for i in range(burst * 3)]
+    start = time.perf_counter()
+    results = fuling_ai.explain_batch(commands, concurrency=8)
+    assert all("你好 world" in result for result in results)
+    assert waits == []
+    assert time.perf_counter() - start < 5
+
+    # 远程提供商仍按默认配置限流
+    assert ratelimit.throttle("moonshot", "test", "https://api.moonshot.cn/v1") == 0.0
+    assert waits == [ratelimit.limiter_key("moonshot", "test")]
+
+
+def test_is_local_endpoint():
+    """本地模式、Ollama 和回环地址视为本机提供商"""
+    assert ratelimit.is_local_endpoint("ollama")
+    assert ratelimit.is_local_endpoint("openai", "http://127.0.0.1:1234/v1")
+    assert ratelimit.is_local_endpoint("openai", "http://localhost:8000/v1")
+    assert ratelimit.is_local_endpoint("openai", "http://[::1]:8000/v1")
+    assert not ratelimit.is_local_endpoint("moonshot", "https://api.moonshot.cn/v1")
+    assert not ratelimit.is_local_endpoint("openai", None)
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+命令规范化测试
+"""
+
+import sys
+from pathlib import Path
+
+# 添加父目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fuling.normalize import canonicalize, normalize_command
+
+
+class TestNormalizeCommand:
+    """测试命令规范化"""
+
+    def test_equivalent_flags(self):
+        """等价的短选项写法规范为同一形式"""
+        forms = {canonicalize(c) for c in ["ls -la", "ls -al", "ls -l -a", "ls  -la ", "ls -a  -l"]}
+        assert forms == {"ls -al"}
+
+    def test_flags_with_arguments_kept(self):
+        """带参数的短选项不参与合并"""
+        assert canonicalize("tail -f -n 20 app.log") == "tail -f -n <NUM1> <PATH1>"
+        assert canonicalize("tar -xzf x.tar.gz") == "tar -xzf <PATH1>"
+
+    def test_unknown_command_flags_untouched(self):
+        """不在选项表中的命令不重排选项"""
+        assert canonicalize("git commit -m 'fix bug'") == "git commit -m 'fix bug'"
+
+    def test_placeholders_roundtrip(self):
+        """路径和数字替换为占位符，渲染时还原"""
+        normalized = normalize_command("head -n 5 /var/log/syslog")
+        assert normalized.canonical == "head -n <NUM1> <PATH1>"
+        assert normalized.render("显示 <PATH1> 的前 <NUM1> 行") == "显示 /var/log/syslog 的前 5 行"
+
+    def test_same_shape_shares_canonical(self):
+        """只有路径不同的命令共享规范形式"""
+        assert canonicalize("du -sh /var") == canonicalize("du -h -s ~/src")
+
+    def test_meaningful_numbers_kept(self):
+        """chmod 等命令中的数字保留原样"""
+        assert canonicalize("chmod 755 run.sh") == "chmod 755 <PATH1>"
+
+    def test_pipeline(self):
+        """管道两侧分别规范化"""
+        assert canonicalize("ps aux |  grep -i -v python") == "ps aux | grep -iv python"
+
+    def test_numeric_flags_kept(self):
+        """-20 这类数字选项不当作字母合并排序"""
+        assert canonicalize("head -20 a.txt") == "head -20 <PATH1>"
+        assert canonicalize("tail -100 x.log") == "tail -100 <PATH1>"
+        assert canonicalize("tail -10 x.log") != canonicalize("tail -100 x.log")
+        assert canonicalize("tail -n 100 x.log") == "tail -n <NUM1> <PATH1>"
+        assert canonicalize("tail -n20 -f a.log") == "tail -f -n20 <PATH1>"
+
+    def test_fd_redirections(self):
+        """2>、2>&1 等重定向保持完整，不拆成数字参数"""
+        assert canonicalize("grep -n foo file.txt 2>/dev/null") == "grep -n foo <PATH1> 2> /dev/null"
+        assert canonicalize("make 2>&1 | tee build.log") == "make 2>&1 | tee <PATH1>"
+        assert canonicalize("cmd >&2") == "cmd >&2"
+        assert canonicalize("cmd &>/dev/null") == "cmd &> /dev/null"
+        assert canonicalize("echo 2 > out.txt") == "echo <NUM1> > <PATH1>"
+        assert canonicalize('echo "2">x') == "echo <NUM1> > x"
+
+    def test_redirect_targets_are_paths(self):
+        """重定向目标与普通参数一样替换为占位符"""
+        normalized = normalize_command("cat a.txt b.txt > out.txt")
+        assert normalized.canonical == "cat <PATH1> <PATH2> > <PATH3>"
+        assert normalized.placeholders["<PATH3>"] == "out.txt"
+        assert canonicalize("sort < /tmp/in > /tmp/out") == "sort < <PATH1> > <PATH2>"
+        assert canonicalize("cat <<EOF") == "cat << EOF"
+
+    def test_sed_awk_grep_patterns_kept(self):
+        """sed/awk/grep 的脚本和模式不当作路径"""
+        assert canonicalize("sed -i s/a/b/ f.txt") == "sed -i s/a/b/ <PATH1>"
+        assert canonicalize("sed -e s/x/y/ -e 1d src/a.txt") == "sed -e s/x/y/ -e 1d <PATH1>"
+        assert canonicalize("awk -F: '{print $1}' /etc/passwd") == "awk -F: '{print $1}' <PATH1>"
+        assert canonicalize("grep -rn -e foo/bar src/") == "grep -nr -e foo/bar <PATH1>"
+        assert canonicalize("grep 42 src/lib") == "grep 42 <PATH1>"
+
+    def test_git_refs_kept(self):
+        """git 的引用和分支名不当作路径"""
+        assert canonicalize("git checkout origin/main") == "git checkout origin/main"
+        assert canonicalize("git checkout -b feature/x") == "git checkout -b feature/x"
+        assert canonicalize("git add src/app.py") == "git add <PATH1>"
+        assert canonicalize("git diff HEAD -- src/app") == "git diff HEAD -- <PATH1>"
+
+    def test_comments_dropped(self):
+        """行尾注释不参与规范化"""
+        assert canonicalize("ls -l -a  # 列出所有文件") == "ls -al"
+
+    def test_unbalanced_quotes(self):
+        """引号不成对时不抛异常"""
+        assert canonicalize('echo "oops')
+
+
+class TestLocalKnowledgeBase:
+    """测试本地知识库使用规范化查找"""
+
+    def test_lookup_equivalent_forms(self):
+        """等价写法命中同一条目"""
+        from fuling.fuling_ai import LocalProvider
+
+        provider = LocalProvider({"name": "local"})
+        assert provider.explain_command("ls -l -a") == provider.explain_command("ls -la")
+        assert "量地符" in provider.explain_command("df  -h")
+
+    def test_unknown_command_not_substring_matched(self):
+        """未知命令不会因子串误命中"""
+        from fuling.fuling_ai import LocalProvider
+
+        provider = LocalProvider({"name": "local"})
+        assert "未找到" in provider.explain_command("unknown_command_xyz")
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+跨调用性能统计测试
+"""
+
+import json
+import sys
+import time
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+# 添加父目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fuling import fuling_ai, perf
+from fuling.fuling_cli_enhanced import cli
+from fuling.metrics import LogHistogram
+from fuling.perf import MetricsRing, aggregate, append_snapshot, load_snapshots, parse_since
+from fuling.tracing import span
+
+
+def histogram(*values):
+    result = LogHistogram()
+    for value in values:
+        result.record(value)
+    return result
+
+
+@pytest.fixture
+def ring(tmp_path, monkeypatch):
+    path = tmp_path / "metrics.ring"
+    monkeypatch.setattr(perf, "default_ring_path", lambda: path)
+    monkeypatch.setattr(perf, "get_perf_config", lambda: dict(perf.DEFAULT_PERF_CONFIG, slots=8, slot_size=1024))
+    return MetricsRing(path, slots=8, slot_size=1024)
+
+
+def test_ring_wraps_with_fixed_size(ring):
+    for i in range(20):
+        assert ring.append(f"record-{i}".encode(), timestamp=1000 + i)
+
+    assert ring.path.stat().st_size == perf.HEADER_SIZE + 8 * 1024
+    records = list(ring.records())
+    assert [payload for _, payload in records] == [f"record-{i}".encode() for i in range(12, 20)]
+    assert [timestamp for timestamp, _ in records] == list(range(1012, 1020))
+
+
+def test_ring_rejects_oversized_and_rebuilds_on_layout_change(ring):
+    assert not ring.append(b"x" * 2000)
+    ring.append(b"kept")
+    assert len(list(ring.records())) == 1
+
+    resized = MetricsRing(ring.path, slots=4, slot_size=512)
+    resized.append(b"new")
+    assert [payload for _, payload in resized.records()] == [b"new"]
+
+
+def test_missing_or_corrupt_file(tmp_path):
+    assert list(MetricsRing(tmp_path / "absent.ring").records()) == []
+    corrupt = tmp_path / "corrupt.ring"
+    corrupt.write_bytes(b"garbage" * 100)
+    assert list(MetricsRing(corrupt).records()) == []
+
+
+def test_aggregate_merges_runs(ring):
+    now = time.time()
+    append_snapshot({"provider.openai": histogram(0.1, 0.2)}, "explain")
+    append_snapshot({"provider.openai": histogram(0.3), "command.explain": histogram(0.5)}, "explain")
+    append_snapshot({"provider.openai": histogram(0.0)}, "explain")  # 空直方图不写入
+    ring.append(perf.encode_snapshot({"provider.openai": histogram(9.0)}), timestamp=now - 30 * 86400)
+
+    records = load_snapshots(ring, since=now - parse_since("7d"))
+    assert len(records) == 3
+    report = aggregate(records)
+    provider = report["provider.openai"]
+    assert provider["runs"] == 3
+    assert provider["count"] == 4
+    assert provider["max"] == pytest.approx(0.3)
+    assert provider["p50"] == pytest.approx(0.1, rel=0.02)
+    assert report["command.explain"]["runs"] == 1
+
+    daily = aggregate(records, daily=True)
+    assert all(row["day"] for row in daily.values())
+
+
+def test_oversized_snapshot_drops_largest_metric(ring):
+    small = MetricsRing(ring.path, slots=8, slot_size=256)
+    wide = histogram(*[1.05 ** i for i in range(500)])
+    assert append_snapshot({"wide": wide, "narrow": histogram(0.1)}, "explain", ring=small)
+    (record,) = load_snapshots(small)
+    assert list(record["metrics"]) == ["narrow"]
+
+
+def test_parse_since():
+    assert parse_since("7d") == 7 * 86400
+    assert parse_since("1.5h") == 5400
+    with pytest.raises(ValueError):
+        parse_since("week")
+
+
+def test_cli_records_and_reports(ring, monkeypatch):
+    def explain(command, context=None):
+        with span("provider.completion", provider="moonshot"):
+            return "解释"
+    monkeypatch.setattr(fuling_ai, "explain_command", explain)
+
+    runner = CliRunner()
+    for _ in range(3):
+        assert runner.invoke(cli, ["explain", "ls"]).exit_code == 0
+
+    result = runner.invoke(cli, ["perf", "report", "--since", "1h", "--json"])
+    assert result.exit_code == 0, result.output
+    data = json.loads(result.output)
+    assert data["invocations"] == 3
+    assert data["metrics"]["provider.moonshot"]["count"] == 3
+    assert data["metrics"]["command.explain"]["runs"] == 3
+
+    result = runner.invoke(cli, ["perf", "report", "--metric", "provider."])
+    assert "provider.moonshot" in result.output
+    assert "command.explain" not in result.output
+
+    result = runner.invoke(cli, ["perf", "report", "--since", "soon"])
+    assert result.exit_code != 0
@@ -46,7 +46,7 @@ class TestPerformanceMonitor:
         # 验证指标记录
         assert "test_operation" in monitor.metrics
         assert len(monitor.metrics["test_operation"]) == 1
-        assert monitor.metrics["test_operation"][0] == elapsed
+        assert monitor.get_stats("test_operation")["last"] == elapsed
     
     def test_stop_nonexistent_timer(self):
         """测试停止不存在的计时器"""
@@ -69,7 +69,9 @@ class TestPerformanceMonitor:
         monitor.record_metric("test_metric", 2.5)
         
         assert "test_metric" in monitor.metrics
-        assert monitor.metrics["test_metric"] == [1.5, 2.5]
+        stats = monitor.get_stats("test_metric")
+        assert stats["count"] == 2
+        assert (stats["min"], stats["max"], stats["last"]) == (1.5, 2.5, 2.5)
     
     def test_get_stats(self):
         """测试获取统计信息"""
@@ -90,7 +92,33 @@ class TestPerformanceMonitor:
         assert stats["min"] == 1.0
         assert stats["max"] == 3.0
         assert stats["last"] == 3.0
-    
+
+    def test_percentiles_bounded_memory(self):
+        """测试分位数精度和固定内存"""
+        from ai_cli.core.performance import PerformanceMonitor
+
+        monitor = PerformanceMonitor()
+        for i in range(1, 100001):
+            monitor.record_metric("latency", i / 1000)
+
+        stats = monitor.get_stats("latency")
+        assert stats["count"] == 100000
+        assert abs(stats["p50"] - 50.0) / 50.0 < 0.02
+        assert abs(stats["p99"] - 99.0) / 99.0 < 0.02
+        assert len(monitor.metrics["latency"].positive) < 1000
+
+    def test_merge_snapshot(self):
+        """测试合并快照"""
+        from ai_cli.core.performance import PerformanceMonitor
+
+        first, second = PerformanceMonitor(), PerformanceMonitor()
+        first.record_metric("op", 1.0)
+        second.record_metric("op", 3.0)
+
+        first.merge(second.snapshot())
+        stats = first.get_stats("op")
+        assert (stats["count"], stats["min"], stats["max"]) == (2, 1.0, 3.0)
+
     def test_get_stats_empty(self):
         """测试获取空指标的统计信息"""
         from ai_cli.core.performance import PerformanceMonitor
@@ -158,7 +186,7 @@ class TestPerformanceDecorators:
         # 验证指标记录
         assert "decorated_function" in monitor.metrics
         assert len(monitor.metrics["decorated_function"]) == 1
-        assert monitor.metrics["decorated_function"][0] > 0
+        assert monitor.get_stats("decorated_function")["last"] > 0
         
         # 清理
         monitor.metrics = original_metrics
@@ -219,6 +247,32 @@ class TestPerformanceDecorators:
         result3 = test_function()
         assert result3 == 2
         assert call_count == 2
+    
+    def test_cache_bounded_with_unhashable_kwargs(self):
+        """测试缓存有上限且支持不可哈希参数"""
+        from ai_cli.core.performance import cache_result, monitor
+        
+        call_count = 0
+        
+        @cache_result(ttl=60, maxsize=4)
+        def lookup(x, options=None):
+            nonlocal call_count
+            call_count += 1
+            return x
+        
+        assert lookup(1, options={"flags": ["-l"]}) == 1
+        assert lookup(1, options={"flags": ["-l"]}) == 1
+        assert call_count == 1
+        
+        for x in range(100):
+            lookup(x)
+        assert len(lookup.cache) <= 4
+        
+        info = lookup.cache_info()
+        assert info["hits"] == 1
+        assert info["evictions"] > 0
+        name = f"{lookup.__module__}.{lookup.__qualname__}"
+        assert monitor.get_cache_stats()[name] == info
 
 class TestProgressManager:
     """测试进度管理器"""
@@ -461,6 +515,25 @@ def test_performance_benchmark():
     # 清理
     monitor.metrics = original_metrics
 
+def test_persist_failure_keeps_exit_code(monkeypatch):
+    """指标写入失败时保留命令本身的退出码"""
+    from ai_cli import cli as cli_module
+    from ai_cli.core import performance
+    
+    def failing_cli():
+        sys.exit(3)
+    
+    def broken_persist(command=None):
+        raise OSError("cache dir is read-only")
+    
+    monkeypatch.setattr(cli_module, "cli", failing_cli)
+    monkeypatch.setattr(performance, "persist_metrics", broken_persist)
+    monkeypatch.setattr(sys, "argv", ["ai", "explain"])
+    
+    with pytest.raises(SystemExit) as exit_info:
+        cli_module.main()
+    assert exit_info.value.code == 3
+
 if __name__ == "__main__":
     # 直接运行测试
     import sys
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+跨进程限流器测试
+"""
+
+import multiprocessing
+import sys
+from pathlib import Path
+
+import pytest
+
+# 添加父目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fuling.ratelimit import RateLimiter, limiter_key
+
+
+class FakeClock:
+    """可手动推进的时钟"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _reserve(path, queue):
+    queue.put(RateLimiter(path, requests_per_minute=60, burst=2).reserve("moonshot|abc"))
+
+
+class TestRateLimiter:
+    """测试令牌桶限流"""
+
+    def test_burst_then_queue(self, tmp_path):
+        """突发额度用完后按速率排队"""
+        clock = FakeClock()
+        limiter = RateLimiter(tmp_path / "rl.json", requests_per_minute=60, burst=2, clock=clock)
+
+        waits = [limiter.reserve("k") for _ in range(4)]
+        assert waits == pytest.approx([0, 0, 1, 2])
+
+    def test_refill_over_time(self, tmp_path):
+        """令牌随时间恢复，且不超过突发上限"""
+        clock = FakeClock()
+        limiter = RateLimiter(tmp_path / "rl.json", requests_per_minute=60, burst=2, clock=clock)
+        for _ in range(3):
+            limiter.reserve("k")
+
+        assert limiter.current_wait("k") == pytest.approx(2)
+        clock.now += 60
+        assert limiter.current_wait("k") == 0
+        assert limiter.reserve("k") == 0
+
+    def test_keys_are_independent(self, tmp_path):
+        """不同提供商或密钥各自计数"""
+        clock = FakeClock()
+        limiter = RateLimiter(tmp_path / "rl.json", requests_per_minute=60, burst=1, clock=clock)
+
+        assert limiter.reserve(limiter_key("moonshot", "a")) == 0
+        assert limiter.reserve(limiter_key("moonshot", "b")) == 0
+        assert limiter.reserve(limiter_key("deepseek", "a")) == 0
+        assert limiter.reserve(limiter_key("moonshot", "a")) > 0
+
+    def test_acquire_sleeps(self, tmp_path):
+        """acquire 等待而不是失败"""
+        sleeps = []
+        clock = FakeClock()
+        limiter = RateLimiter(tmp_path / "rl.json", requests_per_minute=30, burst=1,
+                              sleep=sleeps.append, clock=clock)
+
+        limiter.acquire("k")
+        limiter.acquire("k")
+        assert sleeps == [pytest.approx(2)]
+
+    def test_shared_across_processes(self, tmp_path):
+        """多个进程共享同一个令牌桶"""
+        path = str(tmp_path / "rl.json")
+        ctx = multiprocessing.get_context("fork")
+        queue = ctx.Queue()
+        workers = [ctx.Process(target=_reserve, args=(path, queue)) for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(10)
+
+        waits = sorted(queue.get(timeout=5) for _ in workers)
+        assert waits[:2] == [0, 0]
+        assert waits[2] == pytest.approx(1, abs=0.3)
+        assert waits[3] == pytest.approx(2, abs=0.3)
+
+
+def test_openai_sdk_calls_are_throttled(monkeypatch):
+    """通过openai SDK发出的请求同样占用限流配额"""
+    from types import SimpleNamespace
+    from fuling import ratelimit
+    from fuling.openai_provider import OpenAIProvider
+
+    acquired = []
+    monkeypatch.setattr(ratelimit, "get_config", lambda: {})
+    monkeypatch.setattr(ratelimit.RateLimiter, "acquire", lambda self, key: acquired.append(key) or 0.0)
+
+    def create(**kwargs):
+        if kwargs["stream"]:
+            delta = SimpleNamespace(delta=SimpleNamespace(content="流式"))
+            return iter([SimpleNamespace(choices=[delta])])
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="回复"))])
+
+    provider = OpenAIProvider({"name": "gpt-4o-mini", "api_key": "sk-test"})
+    provider._client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    messages = [{"role": "user", "content": "hi"}]
+
+    assert provider.chat_completion(messages) == "回复"
+    assert list(provider.stream_chat_completion(messages)) == ["流式"]
+    assert acquired == [limiter_key("openai", "sk-test")] * 2
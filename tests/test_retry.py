@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+重试策略测试
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import pytest
+import requests
+
+# 添加父目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fuling.retry import RetryPolicy, parse_retry_after, retry_stats
+
+
+class FakeResponse:
+    """只包含状态码和响应头的假响应"""
+
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def scripted(*outcomes):
+    """按顺序返回响应或抛出异常的请求函数"""
+    outcomes = list(outcomes)
+    calls = []
+
+    def send():
+        calls.append(1)
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    send.calls = calls
+    return send
+
+
+@pytest.fixture(autouse=True)
+def clean_stats():
+    retry_stats.reset()
+    yield
+    retry_stats.reset()
+
+
+class TestRetryPolicy:
+    """测试重试策略"""
+
+    def test_retries_429_then_succeeds(self):
+        """限流后重试成功"""
+        sleeps = []
+        policy = RetryPolicy(attempts=3, base_delay=1, sleep=sleeps.append)
+        send = scripted(FakeResponse(429), FakeResponse(503), FakeResponse(200))
+
+        assert policy.call(send, key="moonshot").status_code == 200
+        assert len(send.calls) == 3
+        assert len(sleeps) == 2
+        assert retry_stats.snapshot()["moonshot"] == {"retries": 2, "recovered": 1, "exhausted": 0}
+
+    def test_honors_retry_after(self):
+        """按 Retry-After 指定的时间等待"""
+        sleeps = []
+        policy = RetryPolicy(attempts=2, base_delay=0.01, sleep=sleeps.append)
+        send = scripted(FakeResponse(429, {"Retry-After": "3"}), FakeResponse(200))
+
+        policy.call(send)
+        assert sleeps == [3.0]
+
+    def test_full_jitter_bounds(self):
+        """退避时间在 [0, min(max_delay, base*2^n)] 之间"""
+        policy = RetryPolicy(base_delay=1, max_delay=5)
+        for attempt in range(6):
+            delay = policy.backoff(attempt)
+            assert 0 <= delay <= min(5, 2 ** attempt)
+
+    def test_non_retryable_status_returned(self):
+        """401等非临时错误不重试"""
+        sleeps = []
+        policy = RetryPolicy(sleep=sleeps.append)
+        send = scripted(FakeResponse(401))
+
+        assert policy.call(send).status_code == 401
+        assert sleeps == []
+
+    def test_exhausted_returns_last_response(self):
+        """重试用尽后返回最后一次响应"""
+        policy = RetryPolicy(attempts=2, base_delay=0, sleep=lambda s: None)
+        last = FakeResponse(503)
+        send = scripted(FakeResponse(503), FakeResponse(503), last)
+
+        assert policy.call(send, key="p") is last
+        assert retry_stats.snapshot()["p"]["exhausted"] == 1
+
+    def test_connect_timeout_reraised(self):
+        """建立连接超时可以重试，用尽后抛出"""
+        policy = RetryPolicy(attempts=1, base_delay=0, sleep=lambda s: None)
+        send = scripted(requests.exceptions.ConnectTimeout(), requests.exceptions.ConnectTimeout())
+
+        with pytest.raises(requests.exceptions.ConnectTimeout):
+            policy.call(send)
+        assert len(send.calls) == 2
+
+    def test_new_connection_error_retried(self):
+        """请求发出前的连接失败可以重试"""
+        from urllib3.exceptions import MaxRetryError, NewConnectionError
+
+        reason = NewConnectionError(None, "Failed to establish a new connection")
+        error = requests.exceptions.ConnectionError(MaxRetryError(None, "/v1", reason))
+        policy = RetryPolicy(attempts=2, base_delay=0, sleep=lambda s: None)
+        send = scripted(error, FakeResponse(200))
+
+        assert policy.call(send).status_code == 200
+
+    def test_non_idempotent_failures_not_retried(self):
+        """请求可能已被处理时（读超时、连接中断、500/502/504）不重试，避免重复计费"""
+        for outcome in (requests.exceptions.ReadTimeout(), requests.exceptions.ConnectionError(),
+                        FakeResponse(500), FakeResponse(502), FakeResponse(504)):
+            sleeps = []
+            policy = RetryPolicy(attempts=3, base_delay=0, sleep=sleeps.append)
+            send = scripted(outcome, FakeResponse(200))
+            if isinstance(outcome, Exception):
+                with pytest.raises(type(outcome)):
+                    policy.call(send)
+            else:
+                assert policy.call(send) is outcome
+            assert len(send.calls) == 1 and sleeps == []
+
+    def test_idempotent_provider_retries_read_failures(self):
+        """标记为幂等的提供商重试读超时和5xx"""
+        policy = RetryPolicy.from_config({"retry_idempotent": True, "retry_delay": 0})
+        policy._sleep = lambda s: None
+        send = scripted(requests.exceptions.ReadTimeout(), FakeResponse(502), FakeResponse(200))
+
+        assert policy.call(send).status_code == 200
+        assert len(send.calls) == 3
+
+    def test_connection_refused_not_retried(self):
+        """连接被拒绝立即失败，不做无意义的等待"""
+        sleeps = []
+        policy = RetryPolicy(sleep=sleeps.append)
+
+        def send():
+            return requests.post("http://127.0.0.1:9/v1/chat/completions", timeout=1)
+
+        with pytest.raises(requests.exceptions.ConnectionError):
+            policy.call(send)
+        assert sleeps == []
+
+    def test_deadline_stops_retry(self):
+        """等待时间超出总时长时不再重试"""
+        sleeps = []
+        policy = RetryPolicy(attempts=5, deadline=1, sleep=sleeps.append)
+        send = scripted(FakeResponse(429, {"Retry-After": "10"}))
+
+        assert policy.call(send).status_code == 429
+        assert sleeps == []
+
+    def test_attempt_timeout_capped_by_deadline(self):
+        """每次尝试的超时不超过剩余总时长"""
+        timeouts = []
+
+        def send(timeout):
+            timeouts.append(timeout)
+            time.sleep(0.05)
+            return FakeResponse(503)
+
+        policy = RetryPolicy(attempts=5, base_delay=0, deadline=0.12, sleep=lambda s: None)
+        assert policy.call(send, timeout=60).status_code == 503
+        assert len(timeouts) == 3
+        assert timeouts[0] == pytest.approx(0.12, abs=0.01)
+        assert all(b < a for a, b in zip(timeouts, timeouts[1:]))
+        assert all(t <= 0.12 for t in timeouts)
+
+        tuples = []
+        RetryPolicy(deadline=5).call(lambda timeout: tuples.append(timeout) or FakeResponse(200), timeout=(3, 60))
+        assert tuples[0][0] == 3 and tuples[0][1] <= 5
+
+    def test_from_config(self):
+        """从模型配置读取参数"""
+        policy = RetryPolicy.from_config({"retry_attempts": 5, "retry_delay": 0.5})
+        assert policy.attempts == 5
+        assert policy.base_delay == 0.5
+        assert policy.deadline == 60
+
+
+def test_parse_retry_after_http_date():
+    """解析HTTP日期格式的 Retry-After"""
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:10 GMT", now=1445412480) == 10
+    assert parse_retry_after("soon") is None
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Shell history reader tests
+"""
+
+import builtins
+import io
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+# 添加父目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from ai_cli.core import context, shell_history
+from ai_cli.core.shell_history import HistoryEntry, iter_lines_reverse, read_recent_entries, unmetafy
+
+
+def test_lines_reverse_across_blocks(tmp_path):
+    rng = random.Random(7)
+    path = tmp_path / "lines"
+    for _ in range(200):
+        data = b"".join(rng.choice([b"a", b"bc", b"\n", b"\r\n", b"\n\n"]) for _ in range(rng.randint(0, 30)))
+        path.write_bytes(data)
+        expected = [line.rstrip(b"\r") for line in data.split(b"\n")]
+        if expected[-1] == b"":
+            expected.pop()
+        for block_size in (1, 2, 5, 64):
+            assert list(iter_lines_reverse(str(path), block_size)) == expected[::-1]
+
+
+def test_zsh_extended_multiline(tmp_path):
+    path = tmp_path / ".zsh_history"
+    path.write_bytes(
+        b": 1700000000:0;ls -la\n"
+        b": 1700000010:2;for f in *; do\\\n"
+        b"  echo $f\\\n"
+        b"done\n"
+        b": 1700000020:0;git status\n"
+    )
+    assert read_recent_entries(str(path), 10) == [
+        HistoryEntry("ls -la", 1700000000),
+        HistoryEntry("for f in *; do\n  echo $f\ndone", 1700000010),
+        HistoryEntry("git status", 1700000020),
+    ]
+    assert [e.command for e in read_recent_entries(str(path), 1)] == ["git status"]
+
+
+def test_zsh_metafied_bytes(tmp_path):
+    raw = "echo 你好".encode("utf-8")
+    meta = bytearray()
+    for byte in raw:
+        if byte >= 0x83:
+            meta += bytes([0x83, byte ^ 0x20])
+        else:
+            meta.append(byte)
+    assert unmetafy(bytes(meta)) == raw
+
+    path = tmp_path / ".zsh_history"
+    path.write_bytes(b": 1700000000:0;" + bytes(meta) + b"\n")
+    assert read_recent_entries(str(path), 5) == [HistoryEntry("echo 你好", 1700000000)]
+
+
+def test_bash_timestamps_and_older_plain_lines(tmp_path):
+    path = tmp_path / ".bash_history"
+    older = b"".join(b"old%d\n" % i for i in range(300))
+    path.write_bytes(
+        older
+        + b"#1700000000\n"
+        + b"cat <<EOF\nhello\nEOF\n"
+        + b"#1700000100\n"
+        + b"make test\n"
+    )
+    entries = read_recent_entries(str(path), 4, "bash")
+    assert entries == [
+        HistoryEntry("old298"),
+        HistoryEntry("old299"),
+        HistoryEntry("cat <<EOF\nhello\nEOF", 1700000000),
+        HistoryEntry("make test", 1700000100),
+    ]
+    assert len(read_recent_entries(str(path), 1000)) == 302
+
+
+def test_bash_few_untimestamped_lines_split_per_command(tmp_path):
+    path = tmp_path / ".bash_history"
+    path.write_text("old1\nold2\nold3\n#1700000000\nnew1\n#1700000100\nnew2\n")
+    assert read_recent_entries(str(path), 10, "bash") == [
+        HistoryEntry("old1"),
+        HistoryEntry("old2"),
+        HistoryEntry("old3"),
+        HistoryEntry("new1", 1700000000),
+        HistoryEntry("new2", 1700000100),
+    ]
+
+
+def test_plain_history_skips_blank_lines(tmp_path):
+    path = tmp_path / ".history"
+    path.write_text("ls\n\npwd\r\n   \ngit log\n")
+    assert [e.command for e in read_recent_entries(str(path), 10)] == ["ls", "pwd", "git log"]
+    assert read_recent_entries(str(path), 0) == []
+    empty = tmp_path / "empty"
+    empty.write_bytes(b"")
+    assert read_recent_entries(str(empty), 10) == []
+
+
+def test_reads_only_the_tail(tmp_path, monkeypatch):
+    path = tmp_path / ".bash_history"
+    with open(path, "wb") as f:
+        for i in range(200000):
+            f.write(b"#%d\ncommand number %d\n" % (1700000000 + i, i))
+    size = path.stat().st_size
+
+    read = []
+    real_open = builtins.open
+
+    class Counting(io.BufferedReader):
+        def read(self, n=-1):
+            data = super().read(n)
+            read.append(len(data))
+            return data
+
+    def counting_open(file, mode="r", *args, **kwargs):
+        if str(file) == str(path):
+            return Counting(real_open(file, "rb", buffering=0))
+        return real_open(file, mode, *args, **kwargs)
+
+    monkeypatch.setattr(builtins, "open", counting_open)
+    entries = read_recent_entries(str(path), 10)
+    assert [e.command for e in entries][-1] == "command number 199999"
+    assert len(entries) == 10
+    assert sum(read) <= shell_history.BLOCK_SIZE < size // 10
+
+
+def test_get_recent_commands_uses_entries(tmp_path, monkeypatch):
+    path = tmp_path / ".zsh_history"
+    path.write_bytes(b": 1700000000:0;echo one\\\ntwo\n: 1700000001:0;pwd\n")
+    monkeypatch.setattr(context, "get_history_files", lambda: [str(tmp_path / "missing"), str(path)])
+    assert context.get_recent_commands(5) == ["echo one\ntwo", "pwd"]
+    assert context.get_recent_commands(1) == ["pwd"]
+
+
+def test_load_history_formats_timestamps(tmp_path, monkeypatch):
+    history_command = pytest.importorskip("ai_cli.commands.history")
+    monkeypatch.setenv("HOME", str(tmp_path))
+    (tmp_path / ".bash_history").write_text("#1700000000\nls\n#1700003600\nmake\n")
+
+    history = history_command.load_history()
+    commands = [command for command, _ in history]
+    assert commands == ["make", "ls"]
+    assert all(len(timestamp) == len("2023-11-14 22:13") for _, timestamp in history)
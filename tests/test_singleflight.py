@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+在途请求合并测试
+"""
+
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+# 添加父目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fuling import fuling_ai
+from fuling.singleflight import SingleFlight
+
+
+def run_concurrently(count, target):
+    """同时启动多个线程执行 target，返回各自的结果"""
+    barrier = threading.Barrier(count)
+    results = [None] * count
+
+    def worker(index):
+        barrier.wait()
+        results[index] = target()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    return results
+
+
+class TestSingleFlight:
+    """测试合并器"""
+
+    def test_concurrent_calls_share_result(self):
+        """同键并发调用只执行一次"""
+        flight = SingleFlight()
+        calls = []
+
+        def slow():
+            calls.append(1)
+            time.sleep(0.2)
+            return "结果"
+
+        results = run_concurrently(8, lambda: flight.do("k", slow))
+
+        assert calls == [1]
+        assert {result for result, _ in results} == {"结果"}
+        assert sum(shared for _, shared in results) == 7
+        assert flight.stats() == {"calls": 1, "coalesced": 7, "in_flight": 0}
+
+    def test_different_keys_not_merged(self):
+        """不同键各自执行"""
+        flight = SingleFlight()
+        assert flight.do("a", lambda: 1) == (1, False)
+        assert flight.do("b", lambda: 2) == (2, False)
+
+    def test_sequential_calls_not_merged(self):
+        """完成后再次调用会重新执行"""
+        flight = SingleFlight()
+        calls = []
+        flight.do("k", lambda: calls.append(1))
+        flight.do("k", lambda: calls.append(1))
+        assert len(calls) == 2
+
+    def test_error_shared_with_waiters(self):
+        """首个调用的异常同样抛给等待者"""
+        flight = SingleFlight()
+
+        def failing():
+            time.sleep(0.2)
+            raise ValueError("失败")
+
+        def call():
+            try:
+                flight.do("k", failing)
+            except ValueError as e:
+                return str(e)
+
+        assert run_concurrently(4, call) == ["失败"] * 4
+        assert flight.in_flight() == 0
+
+
+class SlowProvider(fuling_ai.AIProvider):
+    """慢速并计数的提供商"""
+
+    def __init__(self):
+        super().__init__({"name": "fake", "model": "m"})
+        self.calls = 0
+
+    def chat_completion(self, messages, **kwargs):
+        self.calls += 1
+        time.sleep(0.2)
+        return "回复"
+
+
+def test_identical_completions_coalesced(monkeypatch):
+    """相同的并发补全请求只调用一次提供商"""
+    monkeypatch.setattr(fuling_ai, "_get_cache", lambda provider: None)
+    provider = SlowProvider()
+    messages = [{"role": "user", "content": "ls -al"}]
+
+    results = run_concurrently(6, lambda: fuling_ai._cached_completion(provider, messages))
+
+    assert results == ["回复"] * 6
+    assert provider.calls == 1
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+调用链追踪测试
+"""
+
+import json
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+# 添加父目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fuling import fuling_ai
+from fuling.fuling_cli_enhanced import cli
+from fuling.tracing import span, traced, tracer, current_span
+
+
+@pytest.fixture
+def tracing():
+    tracer.clear()
+    tracer.enable()
+    yield tracer
+    tracer.disable()
+    tracer.clear()
+
+
+def by_name(spans):
+    return {item.name: item for item in spans}
+
+
+def test_nested_spans_record_parent(tracing):
+    with span("outer", kind="test") as outer:
+        with span("inner") as inner:
+            assert current_span() is inner
+        assert current_span() is outer
+    assert current_span() is None
+
+    spans = by_name(tracing.spans())
+    assert spans["inner"].parent_id == spans["outer"].span_id
+    assert spans["outer"].parent_id is None
+    assert spans["outer"].attributes == {"kind": "test"}
+    assert spans["outer"].duration >= spans["inner"].duration
+
+
+def test_spans_not_stored_when_disabled():
+    tracer.clear()
+    with span("ignored") as item:
+        pass
+    assert item.end is not None
+    assert tracer.spans() == []
+
+
+def test_threads_have_independent_stacks(tracing):
+    def worker(index):
+        with span(f"worker.{index}"):
+            with span(f"child.{index}"):
+                pass
+
+    with span("main"):
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    spans = by_name(tracing.spans())
+    for index in range(3):
+        # 新线程不继承调用方的上下文
+        assert spans[f"worker.{index}"].parent_id is None
+        assert spans[f"child.{index}"].parent_id == spans[f"worker.{index}"].span_id
+        assert spans[f"worker.{index}"].thread_id != spans["main"].thread_id
+
+
+def test_traced_decorator_records_errors(tracing):
+    @traced("decorated")
+    def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        fail()
+
+    (item,) = tracing.spans()
+    assert item.name == "decorated"
+    assert item.attributes["error"] == "ValueError"
+
+
+def test_chrome_trace_format(tracing):
+    with span("provider.completion", model=object()):
+        with span("http.request", status=200):
+            pass
+
+    trace = tracing.to_chrome_trace()
+    json.dumps(trace)
+    events = [event for event in trace["traceEvents"] if event["ph"] == "X"]
+    assert [event["name"] for event in events] == ["provider.completion", "http.request"]
+    assert events[0]["cat"] == "provider"
+    assert events[1]["args"]["parent_id"] == events[0]["args"]["span_id"]
+    assert events[0]["ts"] <= events[1]["ts"]
+    assert events[0]["dur"] >= events[1]["dur"]
+    assert any(event["ph"] == "M" and event["name"] == "thread_name" for event in trace["traceEvents"])
+
+
+def test_batch_explain_keeps_parent(tracing, monkeypatch):
+    import asyncio
+
+    def explain(command, context=None):
+        with span("explain.one"):
+            return command
+    monkeypatch.setattr(fuling_ai, "explain_command", explain)
+
+    with span("batch"):
+        assert asyncio.run(fuling_ai.aexplain_batch(["ls", "pwd"])) == ["ls", "pwd"]
+
+    spans = tracing.spans()
+    root = next(item for item in spans if item.name == "batch")
+    children = [item for item in spans if item.name == "explain.one"]
+    assert len(children) == 2
+    assert all(item.parent_id == root.span_id for item in children)
+
+
+def test_cli_trace_writes_file(tmp_path, monkeypatch):
+    def explain(command, context=None):
+        with span("provider.completion"):
+            return f"解释: {command}"
+    monkeypatch.setattr(fuling_ai, "explain_command", explain)
+
+    trace_file = tmp_path / "trace.json"
+    result = CliRunner().invoke(cli, ["--trace", str(trace_file), "explain", "ls -la"])
+    assert result.exit_code == 0, result.output
+    assert not tracer.enabled
+
+    events = json.loads(trace_file.read_text(encoding="utf-8"))["traceEvents"]
+    spans = {event["name"]: event for event in events if event["ph"] == "X"}
+    assert {"fl explain", "provider.completion", "cli.render"} <= set(spans)
+    root_id = spans["fl explain"]["args"]["span_id"]
+    assert spans["provider.completion"]["args"]["parent_id"] == root_id
+    assert spans["cli.render"]["args"]["parent_id"] == root_id
+    tracer.clear()
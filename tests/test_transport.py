@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+传输层测试
+"""
+
+import json
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+# 添加父目录到路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fuling.transport import HTTPTransport
+
+
+class _EchoHandler(BaseHTTPRequestHandler):
+    """返回固定JSON的测试处理器"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if request.get("stream"):
+            self._stream()
+            return
+        body = json.dumps({"port": self.client_address[1]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream(self):
+        """按SSE格式逐段返回"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        for piece in ["符", "灵", " ok"]:
+            chunk = {"choices": [{"delta": {"content": piece}}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    """启动本地测试服务器"""
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _EchoHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+class TestHTTPTransport:
+    """测试共享传输层"""
+
+    def test_session_reused_per_base_url(self):
+        """同一base_url复用同一会话"""
+        transport = HTTPTransport()
+        first = transport.get_session("https://api.example.com/v1")
+        second = transport.get_session("https://api.example.com/v1")
+        other = transport.get_session("https://api.other.com/v1")
+
+        assert first is second
+        assert first is not other
+        transport.close()
+
+    def test_keep_alive_reuses_connection(self, server):
+        """长连接下多次请求使用同一客户端端口"""
+        transport = HTTPTransport()
+        ports = {
+            transport.post(f"{server}/v1/chat/completions", base_url=server, json={}).json()["port"]
+            for _ in range(3)
+        }
+        assert len(ports) == 1
+        transport.close()
+
+    def test_latency_metrics(self, server):
+        """记录每个base_url的请求延迟"""
+        transport = HTTPTransport()
+        for _ in range(2):
+            transport.post(f"{server}/v1/chat/completions", json={})
+
+        metrics = transport.get_metrics()
+        assert metrics[server]["count"] == 2
+        assert metrics[server]["errors"] == 0
+        assert metrics[server]["p50"] > 0
+        transport.close()
+
+    def test_connection_error_counted(self):
+        """连接失败计入错误数"""
+        import requests
+
+        transport = HTTPTransport()
+        with pytest.raises(requests.exceptions.ConnectionError):
+            transport.post("http://127.0.0.1:9/v1/chat/completions", json={}, timeout=1)
+
+        metrics = transport.get_metrics()
+        assert metrics["http://127.0.0.1:9"]["errors"] == 1
+        transport.close()
+
+
+class TestStreaming:
+    """测试流式输出"""
+
+    def test_iter_openai_deltas(self, server):
+        """解析SSE文本增量"""
+        from fuling.transport import iter_openai_deltas
+
+        transport = HTTPTransport()
+        response = transport.post(f"{server}/v1/chat/completions", json={"stream": True}, stream=True)
+        assert list(iter_openai_deltas(response)) == ["符", "灵", " ok"]
+        transport.close()
+
+    def test_provider_stream_chat_completion(self, server):
+        """提供商逐段产出回复"""
+        from fuling.fuling_ai import MoonshotProvider
+
+        provider = MoonshotProvider({"name": "test", "api_key": "key", "base_url": f"{server}/v1"})
+        deltas = list(provider.stream_chat_completion([{"role": "user", "content": "hi"}]))
+        assert deltas == ["符", "灵", " ok"]